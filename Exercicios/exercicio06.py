@@ -1,19 +1,305 @@
+import csv
+import json
+import os
+import sys
+
 PRIORIDADES = ("baixa", "média", "alta")  # tupla
-tarefas = []  # lista de tarefas (cada tarefa é um dicionário)
-categorias_usadas = set()  # conjunto de categorias já usadas
+ARQUIVO_TAREFAS = "tarefas.jsonl"  # diário das alterações (uma linha JSON por operação)
+COMPACTAR_A_CADA = 1000  # operações no diário antes de tentar compactar
+LINHAS_POR_ESCRITA = 10000  # importação: linhas do diário gravadas de uma vez
+CAMPOS = ("id", "nome", "descricao", "prioridade", "categoria", "concluida")
+
+
+class Tarefa:
+    """
+    Uma tarefa. Com __slots__ não existe um dicionário por objeto: cada
+    tarefa ocupa só os seis campos. Prioridade e categoria passam por
+    sys.intern, então tarefas da mesma categoria apontam para a mesma string.
+    """
+
+    __slots__ = CAMPOS
+
+    def __init__(self, id, nome, descricao, prioridade, categoria, concluida=False):
+        self.id = id
+        self.nome = nome
+        self.descricao = descricao
+        self.prioridade = sys.intern(prioridade)
+        self.categoria = sys.intern(categoria)
+        self.concluida = concluida
+
+    def para_dict(self):
+        return {
+            "id": self.id,
+            "nome": self.nome,
+            "descricao": self.descricao,
+            "prioridade": self.prioridade,
+            "categoria": self.categoria,
+            "concluida": self.concluida
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(dados["id"], dados["nome"], dados["descricao"], dados["prioridade"],
+                   dados["categoria"], dados["concluida"])
+
+
+def _sim(valor):
+    """Lê o campo concluida de um CSV/JSON (1/0, true/false, sim/não)."""
+    if isinstance(valor, str):
+        return valor.strip().lower() in ("1", "true", "sim", "s", "concluida", "concluída")
+    return bool(valor)
+
+
+def _texto(valor):
+    """Campo de texto de um CSV/JSON: vazio se ausente, str(...) se não for texto."""
+    if valor is None:
+        return ""
+    return valor if isinstance(valor, str) else str(valor)
+
+
+class RepositorioTarefas:
+    """
+    Guarda as tarefas (objetos Tarefa) com índices:
+    - por id (busca direta);
+    - por prioridade, por categoria e por situação (pendente/concluída),
+      para os filtros devolverem só o que interessa sem varrer tudo.
+
+    Cada índice secundário é um dicionário id -> tarefa, que mantém a ordem
+    de inserção (a mesma ordem de listar_tarefas) e remove em O(1).
+
+    Com `arquivo`, cada alteração vira uma linha no final do diário. Ao abrir,
+    o diário é reaplicado; quando ele passa de `compactar_a_cada` linhas e
+    tem mais que o dobro de linhas do que tarefas, é reescrito só com o
+    estado atual (uma linha por tarefa).
+    """
+
+    def __init__(self, arquivo=None, compactar_a_cada=COMPACTAR_A_CADA):
+        self.arquivo = arquivo
+        self.compactar_a_cada = compactar_a_cada
+        self.proximo_id = 1
+        self._por_id = {}
+        self._por_prioridade = {p: {} for p in PRIORIDADES}
+        self._por_categoria = {}
+        self._por_situacao = {False: {}, True: {}}
+        self._diario = None
+        self._linhas_diario = 0
+
+        if arquivo:
+            if os.path.exists(arquivo) and not self._reaplicar():
+                # linha cortada no fim: reescreve antes de voltar a acrescentar
+                self.compactar()
+            if self._diario is None:
+                self._diario = open(arquivo, "a", encoding="utf-8")
+            self._compactar_se_preciso()
+
+    # ----- consultas -----
+
+    def obter(self, tarefa_id):
+        return self._por_id.get(tarefa_id)
+
+    def todas(self):
+        return list(self._por_id.values())
+
+    def por_prioridade(self, prioridade):
+        return list(self._por_prioridade.get(prioridade, {}).values())
+
+    def por_categoria(self, categoria):
+        return list(self._por_categoria.get(categoria, {}).values())
+
+    def pendentes(self):
+        return list(self._por_situacao[False].values())
+
+    def concluidas(self):
+        return list(self._por_situacao[True].values())
+
+    def categorias(self):
+        return list(self._por_categoria)
+
+    def __len__(self):
+        return len(self._por_id)
+
+    # ----- alterações -----
+
+    def adicionar(self, nome, descricao, prioridade, categoria):
+        tarefa = Tarefa(self.proximo_id, nome, descricao, prioridade, categoria)
+        self._indexar(tarefa)
+        self._registrar({"op": "adicionar", "tarefa": tarefa.para_dict()})
+        return tarefa
+
+    def concluir(self, tarefa_id):
+        """Marca a tarefa como concluída. Devolve False se ela não existe ou já estava concluída."""
+        tarefa = self._por_id.get(tarefa_id)
+        if tarefa is None or tarefa.concluida:
+            return False
+        self._marcar_concluida(tarefa)
+        self._registrar({"op": "concluir", "id": tarefa_id})
+        return True
+
+    def _indexar(self, tarefa):
+        tarefa_id = tarefa.id
+        self._por_id[tarefa_id] = tarefa
+        self._por_prioridade.setdefault(tarefa.prioridade, {})[tarefa_id] = tarefa
+        self._por_categoria.setdefault(tarefa.categoria, {})[tarefa_id] = tarefa
+        self._por_situacao[tarefa.concluida][tarefa_id] = tarefa
+        if tarefa_id >= self.proximo_id:
+            self.proximo_id = tarefa_id + 1
+
+    def _marcar_concluida(self, tarefa):
+        del self._por_situacao[False][tarefa.id]
+        tarefa.concluida = True
+        self._por_situacao[True][tarefa.id] = tarefa
+
+    # ----- importação e exportação -----
+
+    def importar(self, caminho):
+        """
+        Importa tarefas de um CSV (com cabeçalho) ou de um arquivo JSON lines
+        (.jsonl), lendo linha a linha. As colunas são as de CAMPOS; `id` e
+        `concluida` são opcionais. Um id já usado (ou ausente) recebe o
+        próximo id livre; prioridade inválida vira "baixa", como no menu.
+        Uma linha que não é um objeto levanta ValueError com o número dela
+        (as linhas anteriores ficam importadas).
+        Devolve quantas tarefas foram importadas.
+        """
+        total = 0
+        pendentes = []
+        try:
+            with open(caminho, encoding="utf-8", newline="") as f:
+                for numero, dados in self._ler(caminho, f):
+                    tarefa = self._tarefa_importada(numero, dados)
+                    self._indexar(tarefa)
+                    total += 1
+                    if self._diario is not None:
+                        pendentes.append(json.dumps({"op": "adicionar", "tarefa": tarefa.para_dict()},
+                                                    ensure_ascii=False) + "\n")
+                        if len(pendentes) >= LINHAS_POR_ESCRITA:
+                            self._diario.writelines(pendentes)
+                            pendentes.clear()
+        finally:
+            # mesmo se uma linha do arquivo estiver quebrada, o diário fica
+            # com tudo o que já entrou na memória
+            if self._diario is not None and total:
+                self._diario.writelines(pendentes)
+                self._diario.flush()
+                self._linhas_diario += total
+                self._compactar_se_preciso()
+        return total
+
+    @staticmethod
+    def _ler(caminho, arquivo):
+        """Gera (número da linha no arquivo, dados) para cada tarefa."""
+        if caminho.lower().endswith(".csv"):
+            leitor = csv.DictReader(arquivo)
+            for dados in leitor:
+                yield leitor.line_num, dados
+            return
+        for numero, linha in enumerate(arquivo, 1):
+            if not linha.strip():
+                continue
+            try:
+                yield numero, json.loads(linha)
+            except ValueError as erro:
+                raise ValueError(f"linha {numero}: JSON inválido ({erro})") from None
+
+    def _tarefa_importada(self, numero, dados):
+        if not isinstance(dados, dict):
+            raise ValueError(f"linha {numero}: esperado um objeto JSON, veio {type(dados).__name__}")
+        try:
+            tarefa_id = int(dados.get("id") or 0)
+        except (TypeError, ValueError):
+            tarefa_id = 0
+        if tarefa_id <= 0 or tarefa_id in self._por_id:
+            tarefa_id = self.proximo_id
+        # JSON pode trazer número, lista... onde o CSV sempre traz texto
+        prioridade = _texto(dados.get("prioridade")).strip().lower()
+        if prioridade not in PRIORIDADES:
+            prioridade = "baixa"
+        return Tarefa(tarefa_id, _texto(dados.get("nome")), _texto(dados.get("descricao")),
+                      prioridade, _texto(dados.get("categoria")), _sim(dados.get("concluida")))
+
+    def exportar(self, caminho):
+        """Grava todas as tarefas em CSV ou JSON lines (.jsonl), conforme a extensão."""
+        with open(caminho, "w", encoding="utf-8", newline="") as f:
+            if caminho.lower().endswith(".csv"):
+                escritor = csv.writer(f)
+                escritor.writerow(CAMPOS)
+                escritor.writerows(
+                    (t.id, t.nome, t.descricao, t.prioridade, t.categoria, int(t.concluida))
+                    for t in self._por_id.values()
+                )
+            else:
+                f.writelines(json.dumps(t.para_dict(), ensure_ascii=False) + "\n"
+                             for t in self._por_id.values())
+        return len(self._por_id)
+
+    # ----- diário -----
+
+    def _registrar(self, operacao):
+        if self._diario is None:
+            return
+        self._diario.write(json.dumps(operacao, ensure_ascii=False) + "\n")
+        self._diario.flush()
+        self._linhas_diario += 1
+        self._compactar_se_preciso()
+
+    def _reaplicar(self):
+        """Reaplica o diário. Devolve False se alguma linha estava incompleta."""
+        integro = True
+        with open(self.arquivo, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    operacao = json.loads(linha)
+                except ValueError:
+                    # última linha cortada (o programa parou no meio da escrita)
+                    integro = False
+                    continue
+                self._linhas_diario += 1
+                if operacao["op"] == "adicionar":
+                    self._indexar(Tarefa.de_dict(operacao["tarefa"]))
+                elif operacao["op"] == "concluir":
+                    tarefa = self._por_id.get(operacao["id"])
+                    if tarefa is not None and not tarefa.concluida:
+                        self._marcar_concluida(tarefa)
+        return integro
+
+    def _compactar_se_preciso(self):
+        if self._linhas_diario >= self.compactar_a_cada and self._linhas_diario > 2 * len(self._por_id):
+            self.compactar()
+
+    def compactar(self):
+        """Reescreve o diário só com o estado atual (arquivo novo + troca atômica)."""
+        if not self.arquivo:
+            return
+        temporario = self.arquivo + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            for tarefa in self._por_id.values():
+                f.write(json.dumps({"op": "adicionar", "tarefa": tarefa.para_dict()},
+                                   ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._diario is not None:
+            self._diario.close()
+        os.replace(temporario, self.arquivo)
+        self._diario = open(self.arquivo, "a", encoding="utf-8")
+        self._linhas_diario = len(self._por_id)
+
+    def fechar(self):
+        if self._diario is not None:
+            self._diario.close()
+            self._diario = None
 
 
 def exibir_tarefa(tarefa):
-    status = "✅ Concluída" if tarefa["concluida"] else "⏳ Pendente"
-    print(f"\nID: {tarefa['id']}")
-    print(f"Nome: {tarefa['nome']}")
-    print(f"Descrição: {tarefa['descricao']}")
-    print(f"Prioridade: {tarefa['prioridade']}")
-    print(f"Categoria: {tarefa['categoria']}")
+    status = "✅ Concluída" if tarefa.concluida else "⏳ Pendente"
+    print(f"\nID: {tarefa.id}")
+    print(f"Nome: {tarefa.nome}")
+    print(f"Descrição: {tarefa.descricao}")
+    print(f"Prioridade: {tarefa.prioridade}")
+    print(f"Categoria: {tarefa.categoria}")
     print(f"Status: {status}")
 
 
-def adicionar_tarefa(tarefas, proximo_id):
+def adicionar_tarefa(repo):
     print("\n=== Adicionar nova tarefa ===")
     nome = input("Nome da tarefa: ")
     descricao = input("Descrição da tarefa: ")
@@ -26,33 +312,22 @@ def adicionar_tarefa(tarefas, proximo_id):
 
     categoria = input("Categoria da tarefa: ")
 
-    tarefa = {
-        "id": proximo_id,
-        "nome": nome,
-        "descricao": descricao,
-        "prioridade": prioridade,
-        "categoria": categoria,
-        "concluida": False
-    }
-
-    tarefas.append(tarefa)
-    categorias_usadas.add(categoria)
+    tarefa = repo.adicionar(nome, descricao, prioridade, categoria)
 
-    print(f"\nTarefa '{nome}' adicionada com sucesso com ID {proximo_id}!")
-    return proximo_id + 1
+    print(f"\nTarefa '{nome}' adicionada com sucesso com ID {tarefa.id}!")
 
 
-def listar_tarefas(tarefas):
+def listar_tarefas(repo):
     print("\n=== Lista de tarefas ===")
-    if not tarefas:
+    if not len(repo):
         print("Nenhuma tarefa cadastrada.")
         return
 
-    for tarefa in tarefas:
+    for tarefa in repo.todas():
         exibir_tarefa(tarefa)
 
 
-def listar_por_prioridade(tarefas):
+def listar_por_prioridade(repo):
     print("\n=== Filtrar tarefas por prioridade ===")
     print("Prioridades possíveis: baixa, média, alta")
     prioridade = input("Digite a prioridade desejada: ").strip().lower()
@@ -61,7 +336,7 @@ def listar_por_prioridade(tarefas):
         print("Prioridade inválida.")
         return
 
-    encontradas = [t for t in tarefas if t["prioridade"] == prioridade]
+    encontradas = repo.por_prioridade(prioridade)
 
     if not encontradas:
         print(f"Nenhuma tarefa com prioridade '{prioridade}'.")
@@ -71,19 +346,20 @@ def listar_por_prioridade(tarefas):
         exibir_tarefa(tarefa)
 
 
-def listar_por_categoria(tarefas):
+def listar_por_categoria(repo):
     print("\n=== Filtrar tarefas por categoria ===")
-    if not categorias_usadas:
+    categorias = repo.categorias()
+    if not categorias:
         print("Nenhuma categoria cadastrada ainda.")
         return
 
     print("Categorias existentes:")
-    for cat in categorias_usadas:
+    for cat in categorias:
         print(f"- {cat}")
 
     categoria = input("Digite a categoria desejada: ")
 
-    encontradas = [t for t in tarefas if t["categoria"] == categoria]
+    encontradas = repo.por_categoria(categoria)
 
     if not encontradas:
         print(f"Nenhuma tarefa na categoria '{categoria}'.")
@@ -93,9 +369,9 @@ def listar_por_categoria(tarefas):
         exibir_tarefa(tarefa)
 
 
-def marcar_concluida(tarefas):
+def marcar_concluida(repo):
     print("\n=== Marcar tarefa como concluída ===")
-    if not tarefas:
+    if not len(repo):
         print("Nenhuma tarefa cadastrada.")
         return
 
@@ -105,21 +381,19 @@ def marcar_concluida(tarefas):
         print("ID inválido.")
         return
 
-    for tarefa in tarefas:
-        if tarefa["id"] == id_busca:
-            if tarefa["concluida"]:
-                print("Essa tarefa já está concluída.")
-            else:
-                tarefa["concluida"] = True
-                print(f"Tarefa '{tarefa['nome']}' marcada como concluída!")
-            return
+    tarefa = repo.obter(id_busca)
+    if tarefa is None:
+        print("Nenhuma tarefa encontrada com esse ID.")
+    elif tarefa.concluida:
+        print("Essa tarefa já está concluída.")
+    else:
+        repo.concluir(id_busca)
+        print(f"Tarefa '{tarefa.nome}' marcada como concluída!")
 
-    print("Nenhuma tarefa encontrada com esse ID.")
 
-
-def listar_pendentes(tarefas):
+def listar_pendentes(repo):
     print("\n=== Tarefas pendentes ===")
-    pendentes = [t for t in tarefas if not t["concluida"]]
+    pendentes = repo.pendentes()
 
     if not pendentes:
         print("Não há tarefas pendentes.")
@@ -129,6 +403,28 @@ def listar_pendentes(tarefas):
         exibir_tarefa(tarefa)
 
 
+def importar_tarefas(repo):
+    print("\n=== Importar tarefas (CSV ou JSONL) ===")
+    caminho = input("Arquivo: ").strip()
+    try:
+        total = repo.importar(caminho)
+    except (OSError, ValueError) as erro:
+        print(f"Não foi possível importar: {erro}")
+        return
+    print(f"{total} tarefa(s) importada(s).")
+
+
+def exportar_tarefas(repo):
+    print("\n=== Exportar tarefas (CSV ou JSONL) ===")
+    caminho = input("Arquivo (.csv ou .jsonl): ").strip()
+    try:
+        total = repo.exportar(caminho)
+    except OSError as erro:
+        print(f"Não foi possível exportar: {erro}")
+        return
+    print(f"{total} tarefa(s) exportada(s) para {caminho}.")
+
+
 def mostrar_menu():
     print("\n=== GERENCIADOR DE TAREFAS ===")
     print("1 - Adicionar tarefa")
@@ -137,29 +433,36 @@ def mostrar_menu():
     print("4 - Listar tarefas por prioridade")
     print("5 - Listar tarefas por categoria")
     print("6 - Listar apenas tarefas pendentes")
+    print("7 - Importar tarefas de arquivo")
+    print("8 - Exportar tarefas para arquivo")
     print("0 - Sair")
 
 
 def main():
-    proximo_id = 1
+    repo = RepositorioTarefas(ARQUIVO_TAREFAS)
 
     while True:
         mostrar_menu()
         opcao = input("Escolha uma opção: ")
 
         if opcao == "1":
-            proximo_id = adicionar_tarefa(tarefas, proximo_id)
+            adicionar_tarefa(repo)
         elif opcao == "2":
-            listar_tarefas(tarefas)
+            listar_tarefas(repo)
         elif opcao == "3":
-            marcar_concluida(tarefas)
+            marcar_concluida(repo)
         elif opcao == "4":
-            listar_por_prioridade(tarefas)
+            listar_por_prioridade(repo)
         elif opcao == "5":
-            listar_por_categoria(tarefas)
+            listar_por_categoria(repo)
         elif opcao == "6":
-            listar_pendentes(tarefas)
+            listar_pendentes(repo)
+        elif opcao == "7":
+            importar_tarefas(repo)
+        elif opcao == "8":
+            exportar_tarefas(repo)
         elif opcao == "0":
+            repo.fechar()
             print("Saindo... Até mais!")
             break
         else:
@@ -1,59 +1,282 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from contextlib import ExitStack
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+CENTAVOS = Decimal("0.01")
+
+
+class SaldoInsuficiente(ValueError):
+    pass
+
+
+def _valor(valor):
+    """
+    Converte um valor em dinheiro para Decimal com 2 casas.
+    Float passa por repr: 0.1 vira 0.10, e não 0.1000000000000000055...
+    Aceita vírgula como separador decimal ("10,50").
+    """
+    if isinstance(valor, float):
+        valor = repr(valor)
+    elif isinstance(valor, str):
+        valor = valor.strip().replace(",", ".")
+    try:
+        valor = Decimal(valor)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f"Valor inválido: {valor!r}") from None
+    if not valor.is_finite():
+        raise ValueError(f"Valor inválido: {valor}")
+    try:
+        return valor.quantize(CENTAVOS, rounding=ROUND_HALF_EVEN)
+    except InvalidOperation:
+        # mais dígitos do que o contexto decimal comporta (ex.: 1e30)
+        raise ValueError(f"Valor inválido: {valor}") from None
+
+
+class LogTransacoes:
+    """
+    Registro só de acréscimo das movimentações: (seq, tipo, origem, destino, valor).
+    Fica em memória e, com `arquivo`, também numa linha JSON por movimentação.
+
+    registrar() não tem trava própria: o número de sequência vem de um
+    itertools.count (next() é atômico) e a gravação no arquivo fica com uma
+    thread escritora, que recebe as entradas por uma fila e faz flush a cada
+    `intervalo_flush` segundos e no fechar().
+    """
+
+    def __init__(self, arquivo=None, intervalo_flush=1.0):
+        self._entradas = []
+        self._seq = itertools.count(1)
+        self._fila = None
+        if arquivo:
+            self._fila = queue.SimpleQueue()
+            self._escritor = threading.Thread(
+                target=self._escrever, args=(open(arquivo, "a", encoding="utf-8"), intervalo_flush),
+                daemon=True,
+            )
+            self._escritor.start()
+
+    def registrar(self, tipo, origem, destino, valor):
+        # chamado com as contas envolvidas travadas: para cada conta, a ordem
+        # dos números de sequência é a ordem em que o saldo mudou
+        entrada = (next(self._seq), tipo, origem, destino, valor)
+        self._entradas.append(entrada)
+        if self._fila is not None:
+            self._fila.put(entrada)
+        return entrada
+
+    def _escrever(self, arquivo, intervalo_flush):
+        proximo_flush = time.monotonic() + intervalo_flush
+        with arquivo:
+            while True:
+                try:
+                    entrada = self._fila.get(timeout=max(proximo_flush - time.monotonic(), 0))
+                except queue.Empty:
+                    entrada = False
+                if entrada is None:
+                    break
+                if entrada:
+                    seq, tipo, origem, destino, valor = entrada
+                    arquivo.write(json.dumps({
+                        "seq": seq, "tipo": tipo, "origem": origem,
+                        "destino": destino, "valor": str(valor),
+                    }) + "\n")
+                if time.monotonic() >= proximo_flush:
+                    arquivo.flush()
+                    proximo_flush = time.monotonic() + intervalo_flush
+        # o `with` fecha (e grava) o arquivo
+
+    def __iter__(self):
+        # as threads anexam fora de ordem: a cópia volta ordenada pela sequência
+        return iter(sorted(list(self._entradas)))
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def fechar(self):
+        """Espera a thread escritora gravar tudo o que já foi registrado."""
+        if self._fila is not None:
+            self._fila.put(None)
+            self._escritor.join()
+            self._fila = None
+
+
 class ContaBancaria:
-    def __init__(self, titular, saldo_inicial=0):
+    def __init__(self, titular, saldo_inicial=0, numero=0, log=None):
         self._titular = titular
-        self._saldo = saldo_inicial
+        self._saldo = _valor(saldo_inicial)
+        self._numero = numero
+        self._log = log
+        self._lock = threading.Lock()
+        if log is not None:
+            log.registrar("abertura", None, numero, self._saldo)
 
-    def depositar(self, valor):
-        if valor > 0:
+    @property
+    def numero(self):
+        return self._numero
+
+    @property
+    def saldo(self):
+        return self._saldo
+
+    # ----- operações (sem mensagens; erros viram exceção) -----
+
+    def creditar(self, valor):
+        valor = _valor(valor)
+        if valor <= 0:
+            raise ValueError("O valor do depósito deve ser positivo.")
+        with self._lock:
             self._saldo += valor
-            print(f"Depósito de R$ {valor:.2f} realizado com sucesso!")
-        else:
-            print("O valor do depósito deve ser positivo.")
+            if self._log is not None:
+                self._log.registrar("deposito", None, self._numero, valor)
+        return valor
 
-    def sacar(self, valor):
+    def debitar(self, valor):
+        valor = _valor(valor)
         if valor <= 0:
-            print("O valor do saque deve ser positivo.")
-        elif valor > self._saldo:
-            print("Saldo insuficiente para realizar o saque.")
-        else:
+            raise ValueError("O valor do saque deve ser positivo.")
+        with self._lock:
+            if valor > self._saldo:
+                raise SaldoInsuficiente("Saldo insuficiente para realizar o saque.")
             self._saldo -= valor
-            print(f"Saque de R$ {valor:.2f} realizado com sucesso!")
+            if self._log is not None:
+                self._log.registrar("saque", self._numero, None, valor)
+        return valor
+
+    # ----- menu -----
+
+    def depositar(self, valor):
+        try:
+            valor = self.creditar(valor)
+        except ValueError as erro:
+            print(erro)
+            return
+        print(f"Depósito de R$ {valor:.2f} realizado com sucesso!")
+
+    def sacar(self, valor):
+        try:
+            valor = self.debitar(valor)
+        except ValueError as erro:
+            print(erro)
+            return
+        print(f"Saque de R$ {valor:.2f} realizado com sucesso!")
 
     def exibir_saldo(self):
         print(f"Titular: {self._titular} | Saldo atual: R$ {self._saldo:.2f}")
 
 
+class Livro:
+    """
+    Conjunto de contas com um log de transações comum.
+
+    Cada conta tem a sua trava: operações em contas diferentes rodam em
+    paralelo. A transferência trava as duas contas sempre na ordem do número
+    da conta, então duas transferências opostas (A->B e B->A) nunca ficam
+    esperando uma pela outra.
+    """
+
+    def __init__(self, arquivo_log=None):
+        self.log = LogTransacoes(arquivo_log)
+        self._contas = {}
+        self._numeros = itertools.count(1)
+        self._lock = threading.Lock()  # só para abrir contas
+
+    def abrir_conta(self, titular, saldo_inicial=0):
+        with self._lock:
+            numero = next(self._numeros)
+            conta = ContaBancaria(titular, saldo_inicial, numero=numero, log=self.log)
+            self._contas[numero] = conta
+        return conta
+
+    def conta(self, numero):
+        try:
+            return self._contas[numero]
+        except KeyError:
+            raise ValueError(f"Conta {numero} não existe.") from None
+
+    def depositar(self, numero, valor):
+        return self.conta(numero).creditar(valor)
+
+    def sacar(self, numero, valor):
+        return self.conta(numero).debitar(valor)
+
+    def transferir(self, origem, destino, valor):
+        valor = _valor(valor)
+        if valor <= 0:
+            raise ValueError("O valor da transferência deve ser positivo.")
+        if origem == destino:
+            raise ValueError("Origem e destino são a mesma conta.")
+        de, para = self.conta(origem), self.conta(destino)
+        primeira, segunda = (de, para) if de.numero < para.numero else (para, de)
+        with primeira._lock, segunda._lock:
+            if valor > de._saldo:
+                raise SaldoInsuficiente("Saldo insuficiente para a transferência.")
+            de._saldo -= valor
+            para._saldo += valor
+            self.log.registrar("transferencia", origem, destino, valor)
+        return valor
+
+    def total(self):
+        """Soma dos saldos, com todas as contas travadas (na mesma ordem da transferência)."""
+        with ExitStack() as travas:
+            contas = [self._contas[n] for n in sorted(self._contas)]
+            for conta in contas:
+                travas.enter_context(conta._lock)
+            return sum((c._saldo for c in contas), Decimal("0.00"))
+
+    def saldos_pelo_log(self):
+        """Recalcula o saldo de cada conta só a partir do log."""
+        saldos = {}
+        for _, _, origem, destino, valor in self.log:
+            if origem is not None:
+                saldos[origem] = saldos.get(origem, Decimal("0.00")) - valor
+            if destino is not None:
+                saldos[destino] = saldos.get(destino, Decimal("0.00")) + valor
+        return saldos
+
+    def fechar(self):
+        self.log.fechar()
+
+
 # --------------------------
 #  SISTEMA DE INTERAÇÃO
 # --------------------------
-print("=== SISTEMA BANCÁRIO ===")
+def main():
+    print("=== SISTEMA BANCÁRIO ===")
+
+    livro = Livro()
+    nome = input("Digite o nome do titular da conta: ")
+    conta = livro.abrir_conta(nome)
 
-nome = input("Digite o nome do titular da conta: ")
-conta = ContaBancaria(nome)
+    while True:
+        print("\n--- MENU ---")
+        print("1 - Depositar")
+        print("2 - Sacar")
+        print("3 - Exibir saldo")
+        print("4 - Sair")
 
-while True:
-    print("\n--- MENU ---")
-    print("1 - Depositar")
-    print("2 - Sacar")
-    print("3 - Exibir saldo")
-    print("4 - Sair")
+        opcao = input("Escolha uma opção: ")
 
-    opcao = input("Escolha uma opção: ")
+        if opcao == "1":
+            conta.depositar(input("Valor do depósito: R$ "))
 
-    if opcao == "1":
-        valor = float(input("Valor do depósito: R$ "))
-        conta.depositar(valor)
+        elif opcao == "2":
+            conta.sacar(input("Valor do saque: R$ "))
 
-    elif opcao == "2":
-        valor = float(input("Valor do saque: R$ "))
-        conta.sacar(valor)
+        elif opcao == "3":
+            conta.exibir_saldo()
 
-    elif opcao == "3":
-        conta.exibir_saldo()
+        elif opcao == "4":
+            print("Encerrando o sistema. Até mais!")
+            livro.fechar()
+            break
+
+        else:
+            print("Opção inválida. Tente novamente.")
 
-    elif opcao == "4":
-        print("Encerrando o sistema. Até mais!")
-        break
 
-    else:
-        print("Opção inválida. Tente novamente.")
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 class Produto:
@@ -19,11 +19,65 @@ class Venda:
         self.data_venda = data_venda or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
+class FalhaVenda:
+    def __init__(self, linha, venda, motivo):
+        self.linha = linha  # posição da venda no lote (começando em 1)
+        self.venda = venda
+        self.motivo = motivo
+
+
+class ResultadoLote:
+    def __init__(self):
+        self.registradas = 0
+        self.falhas = []
+
+
+# WAL: leituras não bloqueiam a escrita e cada commit grava só no fim do log;
+# com synchronous=NORMAL o fsync do commit fica para o checkpoint.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA busy_timeout = 5000;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -16000;",
+)
+
+# máximo de ids por "IN (...)" (o SQLite limita o número de parâmetros)
+IDS_POR_CONSULTA = 500
+
+EPOCH = datetime(1970, 1, 1)
+
+# agrupamentos aceitos por receita_por_periodo()
+PERIODOS = {
+    "dia": "%Y-%m-%d",
+    "semana": "%Y-S%W",
+    "mes": "%Y-%m",
+    "ano": "%Y",
+}
+
+
+def epoch(valor):
+    """
+    Data/hora da venda em segundos desde 1970, como inteiro.
+
+    O horário de data_venda não tem fuso: ele é convertido como se fosse UTC,
+    igual ao strftime('%s', ...) do SQLite, então date(epoch, 'unixepoch')
+    devolve o mesmo dia que está escrito em data_venda.
+    """
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    elif not isinstance(valor, datetime):  # date
+        valor = datetime(valor.year, valor.month, valor.day)
+    return (valor.replace(tzinfo=None) - EPOCH) // timedelta(seconds=1)
+
+
 class BancoDeDados:
     def __init__(self, nome_banco="estoque.db"):
         self.nome_banco = nome_banco
         self.conn = sqlite3.connect(self.nome_banco)
-        self.conn.execute("PRAGMA foreign_keys = ON;")
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
         self.criar_tabelas()
 
     def criar_tabelas(self):
@@ -48,13 +102,41 @@ class BancoDeDados:
                 produto_id INTEGER NOT NULL,
                 quantidade INTEGER NOT NULL,
                 data_venda TEXT NOT NULL,
+                data_venda_epoch INTEGER,
                 FOREIGN KEY (produto_id) REFERENCES Produtos(id)
             );
             """
         )
 
+        self._migrar_data_epoch(cursor)
+
+        # relatórios filtram por período e agrupam por produto: os dois
+        # índices evitam ler a tabela inteira e ordenar em memória
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_vendas_data ON Vendas (data_venda_epoch)"
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_vendas_produto
+            ON Vendas (produto_id, data_venda_epoch, quantidade)
+            """
+        )
+
         self.conn.commit()
 
+    def _migrar_data_epoch(self, cursor):
+        """Bancos criados antes de data_venda_epoch: cria a coluna e preenche."""
+        colunas = [linha[1] for linha in cursor.execute("PRAGMA table_info(Vendas)")]
+        if "data_venda_epoch" not in colunas:
+            cursor.execute("ALTER TABLE Vendas ADD COLUMN data_venda_epoch INTEGER")
+        cursor.execute(
+            """
+            UPDATE Vendas
+            SET data_venda_epoch = CAST(strftime('%s', data_venda) AS INTEGER)
+            WHERE data_venda_epoch IS NULL
+            """
+        )
+
    
     def cadastrar_produto(self, produto: Produto):
         cursor = self.conn.cursor()
@@ -125,57 +207,226 @@ class BancoDeDados:
 
     
     def registrar_venda(self, venda: Venda):
-       
-        produto = self.buscar_produto_por_id(venda.produto_id)
-        if not produto:
-            print("⚠️ Produto não encontrado. Venda não realizada.")
-            return
+        resultado = self.registrar_vendas_em_lote([venda])
+        if resultado.falhas:
+            print(f"⚠️ {resultado.falhas[0].motivo}. Venda não realizada.")
+        else:
+            print("✅ Venda registrada com sucesso!")
+
+    def registrar_vendas_em_lote(self, vendas):
+        """
+        Registra várias vendas numa transação só (um commit para o lote).
+
+        As vendas são validadas na ordem em que chegam, descontando do estoque
+        as vendas anteriores do mesmo lote. As inválidas vão para
+        resultado.falhas (com a linha e o motivo) e as demais são gravadas
+        juntas. Se a gravação falhar, nada do lote é gravado.
+        """
+        vendas = list(vendas)
+        resultado = ResultadoLote()
+        if not vendas:
+            return resultado
 
-        if venda.quantidade <= 0:
-            print("⚠️ Quantidade de venda deve ser maior que zero.")
-            return
+        cursor = self.conn.cursor()
+        try:
+            # IMMEDIATE: ninguém altera o estoque entre a leitura e a baixa
+            if not self.conn.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+            estoque = self._quantidades(cursor, {v.produto_id for v in vendas})
+
+            baixas = {}
+            aceitas = []
+            datas = {}
+            for linha, venda in enumerate(vendas, 1):
+                disponivel = estoque.get(venda.produto_id)
+                # vendas do mesmo lote costumam repetir o horário
+                segundos = datas.get(venda.data_venda)
+                if segundos is None:
+                    try:
+                        segundos = datas[venda.data_venda] = epoch(venda.data_venda)
+                    except (TypeError, ValueError):
+                        pass
+                if disponivel is None:
+                    motivo = "Produto não encontrado"
+                elif venda.quantidade <= 0:
+                    motivo = "Quantidade de venda deve ser maior que zero"
+                elif disponivel < venda.quantidade:
+                    motivo = "Quantidade insuficiente em estoque"
+                elif segundos is None:
+                    motivo = "Data da venda inválida (use AAAA-MM-DD HH:MM:SS)"
+                else:
+                    estoque[venda.produto_id] = disponivel - venda.quantidade
+                    baixas[venda.produto_id] = baixas.get(venda.produto_id, 0) + venda.quantidade
+                    aceitas.append((venda.produto_id, venda.quantidade, venda.data_venda, segundos))
+                    continue
+                resultado.falhas.append(FalhaVenda(linha, venda, motivo))
+
+            # baixa com guarda: o estoque nunca fica negativo
+            cursor.executemany(
+                "UPDATE Produtos SET quantidade = quantidade - ? WHERE id = ? AND quantidade >= ?",
+                [(qtd, produto_id, qtd) for produto_id, qtd in baixas.items()],
+            )
+            if baixas and cursor.rowcount != len(baixas):
+                raise sqlite3.IntegrityError("Estoque alterado durante o registro do lote.")
+
+            cursor.executemany(
+                """
+                INSERT INTO Vendas (produto_id, quantidade, data_venda, data_venda_epoch)
+                VALUES (?, ?, ?, ?)
+                """,
+                aceitas,
+            )
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+        resultado.registradas = len(aceitas)
+        return resultado
+
+    def _quantidades(self, cursor, ids):
+        """Estoque atual dos produtos em `ids` ({id: quantidade}; ids inexistentes ficam de fora)."""
+        ids = [i for i in ids if i is not None]
+        estoque = {}
+        for inicio in range(0, len(ids), IDS_POR_CONSULTA):
+            parte = ids[inicio:inicio + IDS_POR_CONSULTA]
+            cursor.execute(
+                f"SELECT id, quantidade FROM Produtos WHERE id IN ({', '.join('?' * len(parte))})",
+                parte,
+            )
+            estoque.update(cursor.fetchall())
+        return estoque
 
-        if produto.quantidade < venda.quantidade:
-            print("⚠️ Quantidade insuficiente em estoque. Venda não realizada.")
-            return
+    def listar_vendas(self):
+        vazio = True
+        for v in self.vendas():
+            if vazio:
+                print("\n=== VENDAS REGISTRADAS ===")
+                vazio = False
+            print(
+                f"ID Venda: {v[0]} | Produto: {v[1]} | Quantidade: {v[2]} | Data: {v[3]}"
+            )
+
+        if vazio:
+            print("⚠️ Nenhuma venda registrada.")
 
-        
-        nova_quantidade = produto.quantidade - venda.quantidade
-        self.atualizar_quantidade(produto.id, nova_quantidade)
+    # =========================
+    # RELATÓRIOS
+    # =========================
+    # Todos são geradores: as linhas saem do cursor conforme são lidas.
+    # `inicio` e `fim` (datetime, date, "AAAA-MM-DD" ou "AAAA-MM-DD HH:MM:SS")
+    # limitam o período como [inicio, fim). A receita usa o preço atual do
+    # produto (o preço da venda não é guardado).
 
-        
+    def _consulta(self, sql, params=()):
         cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO Vendas (produto_id, quantidade, data_venda)
-            VALUES (?, ?, ?)
+        try:
+            cursor.execute(sql, params)
+            yield from cursor
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _periodo(inicio, fim):
+        condicoes, params = [], []
+        if inicio is not None:
+            condicoes.append("v.data_venda_epoch >= ?")
+            params.append(epoch(inicio))
+        if fim is not None:
+            condicoes.append("v.data_venda_epoch < ?")
+            params.append(epoch(fim))
+        return (" AND ".join(condicoes) or "1 = 1"), params
+
+    def vendas(self, inicio=None, fim=None):
+        """(id, produto, quantidade, data_venda), das mais recentes para as mais antigas."""
+        filtro, params = self._periodo(inicio, fim)
+        return self._consulta(
+            f"""
+            SELECT v.id, p.nome, v.quantidade, v.data_venda
+            FROM Vendas v
+            JOIN Produtos p ON v.produto_id = p.id
+            WHERE {filtro}
+            ORDER BY v.data_venda_epoch DESC, v.id DESC
             """,
-            (venda.produto_id, venda.quantidade, venda.data_venda),
+            params,
         )
-        self.conn.commit()
-        print("✅ Venda registrada com sucesso!")
 
-    def listar_vendas(self):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            SELECT Vendas.id, Produtos.nome, Vendas.quantidade, Vendas.data_venda
-            FROM Vendas
-            JOIN Produtos ON Vendas.produto_id = Produtos.id
-            ORDER BY Vendas.data_venda DESC
-            """
+    def vendas_por_produto(self, inicio=None, fim=None):
+        """(produto_id, nome, vendas, quantidade, receita) de cada produto vendido, por id."""
+        filtro, params = self._periodo(inicio, fim)
+        return self._consulta(
+            f"""
+            SELECT t.produto_id, p.nome, t.vendas, t.quantidade, t.quantidade * p.preco
+            FROM (
+                SELECT v.produto_id, COUNT(*) AS vendas, SUM(v.quantidade) AS quantidade
+                FROM Vendas v
+                WHERE {filtro}
+                GROUP BY v.produto_id
+            ) t
+            JOIN Produtos p ON p.id = t.produto_id
+            ORDER BY t.produto_id
+            """,
+            params,
         )
-        vendas = cursor.fetchall()
 
-        if not vendas:
-            print("⚠️ Nenhuma venda registrada.")
-            return
+    def vendas_por_dia(self, inicio=None, fim=None):
+        """(dia "AAAA-MM-DD", vendas, quantidade, receita), em ordem de data."""
+        filtro, params = self._periodo(inicio, fim)
+        return self._consulta(
+            f"""
+            SELECT date(v.data_venda_epoch, 'unixepoch') AS dia,
+                   COUNT(*), SUM(v.quantidade), SUM(v.quantidade * p.preco)
+            FROM Vendas v
+            JOIN Produtos p ON p.id = v.produto_id
+            WHERE {filtro}
+            GROUP BY dia
+            ORDER BY dia
+            """,
+            params,
+        )
 
-        print("\n=== VENDAS REGISTRADAS ===")
-        for v in vendas:
-            print(
-                f"ID Venda: {v[0]} | Produto: {v[1]} | Quantidade: {v[2]} | Data: {v[3]}"
-            )
+    def top_produtos(self, n=10, inicio=None, fim=None, por="quantidade"):
+        """
+        Os `n` produtos que mais venderam, como vendas_por_produto(),
+        ordenados por "quantidade" ou por "receita".
+        """
+        if por not in ("quantidade", "receita"):
+            raise ValueError('por deve ser "quantidade" ou "receita"')
+        filtro, params = self._periodo(inicio, fim)
+        return self._consulta(
+            f"""
+            SELECT t.produto_id, p.nome, t.vendas, t.quantidade,
+                   t.quantidade * p.preco AS receita
+            FROM (
+                SELECT v.produto_id, COUNT(*) AS vendas, SUM(v.quantidade) AS quantidade
+                FROM Vendas v
+                WHERE {filtro}
+                GROUP BY v.produto_id
+            ) t
+            JOIN Produtos p ON p.id = t.produto_id
+            ORDER BY {"t.quantidade" if por == "quantidade" else "receita"} DESC, t.produto_id
+            LIMIT ?
+            """,
+            params + [n],
+        )
+
+    def receita_por_periodo(self, periodo="mes", inicio=None, fim=None):
+        """(período, vendas, quantidade, receita) agrupado por dia, semana, mes ou ano."""
+        if periodo not in PERIODOS:
+            raise ValueError(f"periodo deve ser um de: {', '.join(PERIODOS)}")
+        filtro, params = self._periodo(inicio, fim)
+        return self._consulta(
+            f"""
+            SELECT strftime(?, v.data_venda_epoch, 'unixepoch') AS periodo,
+                   COUNT(*), SUM(v.quantidade), SUM(v.quantidade * p.preco)
+            FROM Vendas v
+            JOIN Produtos p ON p.id = v.produto_id
+            WHERE {filtro}
+            GROUP BY periodo
+            ORDER BY periodo
+            """,
+            [PERIODOS[periodo]] + params,
+        )
 
     def fechar(self):
         self.conn.close()
@@ -190,6 +441,7 @@ def menu():
     print("4 - Remover produto")
     print("5 - Registrar venda")
     print("6 - Listar vendas")
+    print("7 - Relatórios de vendas")
     print("0 - Sair")
 
 
@@ -249,6 +501,15 @@ def registrar_venda_menu(db: BancoDeDados):
     db.registrar_venda(venda)
 
 
+def relatorios_menu(db: BancoDeDados):
+    print("\n=== TOP 5 PRODUTOS (QUANTIDADE) ===")
+    for produto_id, nome, vendas, quantidade, receita in db.top_produtos(5):
+        print(f"ID: {produto_id} | {nome} | {quantidade} un. em {vendas} venda(s) | R$ {receita:.2f}")
+
+    print("\n=== RECEITA POR MÊS ===")
+    for periodo, vendas, quantidade, receita in db.receita_por_periodo("mes"):
+        print(f"{periodo} | {vendas} venda(s) | {quantidade} un. | R$ {receita:.2f}")
+
 
 def main():
     db = BancoDeDados()
@@ -269,6 +530,8 @@ def main():
             registrar_venda_menu(db)
         elif opcao == "6":
             db.listar_vendas()
+        elif opcao == "7":
+            relatorios_menu(db)
         elif opcao == "0":
             print("Encerrando o sistema. Até mais!")
             db.fechar()
@@ -1,20 +1,59 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, has_request_context, send_from_directory, stream_template
 from werkzeug.security import generate_password_hash, check_password_hash
+from jinja2 import FileSystemBytecodeCache
 from functools import wraps
-from db import get_connection
+from db import get_connection, carregar_env, ConsultaEmLotes
+import metricas
+import log_consultas
+import eventos
+import estaticos
+import compressao
+import fragmentos
+import idempotencia
+import limites
+import jobs
+import estoque
+import relatorios
+import resumos
 import os
-import requests
-from dotenv import load_dotenv
 from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from urllib.parse import urlencode
+import hashlib
 import time
 
 app = Flask(__name__)
 app.secret_key = "batcaverna_super_secreta"  # troque em produção
+metricas.init_app(app)
+log_consultas.init_app(app)
+estaticos.init_app(app)
+compressao.init_app(app)
+idempotencia.init_app(app)
+limites.init_app(app)
 
 # ===== Carregar vari?veis de ambiente (.env) =====
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-dotenv_path = os.path.join(BASE_DIR, ".env")
-load_dotenv(dotenv_path, override=True)
+carregar_env(override=True)
+
+# ===== Cache de bytecode dos templates =====
+# Os templates compilados ficam em disco e são reaproveitados por todos os
+# workers e reinícios (o Jinja regrava o arquivo se o template mudar).
+# WAYNE_JINJA_CACHE_DIR=0 desliga.
+JINJA_CACHE_DIR = os.getenv("WAYNE_JINJA_CACHE_DIR") or os.path.join(BASE_DIR, ".cache", "jinja")
+if JINJA_CACHE_DIR != "0":
+    try:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    except OSError:
+        # diretório sem permissão de escrita: segue compilando em memória
+        pass
+
+
+def precompilar_templates():
+    """Carrega todos os templates (usado pelo servidor antes de criar os workers)."""
+    for nome in app.jinja_env.list_templates(extensions=("html",)):
+        app.jinja_env.get_template(nome)
 
 def _clean_key(value):
     if not value:
@@ -28,6 +67,7 @@ def _clean_key(value):
     return key
 
 UNSPLASH_ACCESS_KEY = _clean_key(os.getenv("UNSPLASH_ACCESS_KEY"))
+UNSPLASH_API_URL = (os.getenv("UNSPLASH_API_URL") or "https://api.unsplash.com").rstrip("/")
 UNSPLASH_APP_NAME = "industrias_wayne_security_tools"
 UNSPLASH_UTM_PARAMS = f"utm_source={UNSPLASH_APP_NAME}&utm_medium=referral&utm_campaign=api-credit"
 
@@ -48,12 +88,15 @@ def _normalize_query(q):
 def _cache_get(key):
     item = _unsplash_cache.get(key)
     if not item:
+        metricas.contar_cache("unsplash", False)
         return None
     ts, data = item
     if time.time() - ts > UNSPLASH_CACHE_TTL:
         _unsplash_cache.pop(key, None)
+        metricas.contar_cache("unsplash", False)
         return None
     _unsplash_cache.move_to_end(key)
+    metricas.contar_cache("unsplash", True)
     return data
 
 def _cache_set(key, data):
@@ -85,22 +128,23 @@ def inject_pendencias():
     pendentes_baixas = 0
 
     if "user_role" in session and session["user_role"] in ["gerente", "admin"]:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with metricas.medir("pendencias"):
+            conn = get_connection()
+            cursor = conn.cursor()
 
-        if session["user_role"] == "gerente":
-            # gerente vê apenas pendentes
-            cursor.execute("SELECT COUNT(*) FROM resource_requests WHERE status = 'pendente'")
-        else:
-            # admin vê pendentes e aprovados pelo gerente
-            cursor.execute("""
-                SELECT COUNT(*) FROM resource_requests
-                WHERE status IN ('pendente', 'aprovado_gerente')
-            """)
+            if session["user_role"] == "gerente":
+                # gerente vê apenas pendentes
+                cursor.execute("SELECT COUNT(*) FROM resource_requests WHERE status = 'pendente'")
+            else:
+                # admin vê pendentes e aprovados pelo gerente
+                cursor.execute("""
+                    SELECT COUNT(*) FROM resource_requests
+                    WHERE status IN ('pendente', 'aprovado_gerente')
+                """)
 
-        pendentes_baixas = cursor.fetchone()[0]
-        cursor.close()
-        conn.close()
+            pendentes_baixas = cursor.fetchone()[0]
+            cursor.close()
+            conn.close()
 
     return dict(pendentes_baixas=pendentes_baixas)
 
@@ -132,17 +176,56 @@ def role_required(*roles):
     return wrapper
 
 
-def log_action(user_id, action, details=None):
+def log_action(user_id, action, details=None, entidade=None, entidade_id=None,
+               quantidade=None, valor=None):
+    """
+    Grava o log de auditoria. `details` é o texto para leitura; entidade
+    ("recurso", "usuario", "job"), entidade_id, quantidade e valor vão em
+    colunas próprias, indexadas, usadas pelos filtros de /logs.
+    """
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO access_logs (user_id, action, details) VALUES (%s, %s, %s)",
-        (user_id, action, details)
-    )
+    cursor.execute("""
+        INSERT INTO access_logs
+            (user_id, action, details, entity_type, entity_id, quantity, value)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (user_id, action, details, entidade, entidade_id, quantidade,
+          float(valor) if valor is not None else None))
     conn.commit()
     cursor.close()
     conn.close()
 
+    user_name = session.get("user_name") if has_request_context() else None
+    eventos.publicar("log", {
+        "user_name": user_name,
+        "action": action,
+        "details": details,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+
+# =========================
+# EVENTOS AO VIVO (SSE)
+# =========================
+
+def _publicar_status_recursos(conn):
+    """Envia aos clientes do stream a contagem de recursos por status."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, COUNT(*) FROM resources GROUP BY status")
+    por_status = dict(cursor.fetchall())
+    cursor.close()
+    eventos.publicar("status", {"total": sum(por_status.values()), "por_status": por_status})
+
+
+@app.route("/eventos")
+@login_required
+def eventos_stream():
+    return Response(
+        eventos.stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # =========================
 # ROTAS BÁSICAS
 # =========================
@@ -154,12 +237,29 @@ def index():
     return redirect(url_for("login"))
 
 
+# tentativas de login: por IP e por usuário (cada uma custa um check_password_hash)
+LOGIN_POR_IP = (10, 1 / 6)
+LOGIN_POR_USUARIO = (5, 1 / 30)
+
+
+def _login_limitado(espera):
+    flash(f"Muitas tentativas de login. Tente novamente em {limites.retry_after(espera)} segundos.", "danger")
+    resposta = app.make_response((render_template("login.html"), 429))
+    resposta.headers["Retry-After"] = str(limites.retry_after(espera))
+    return resposta
+
+
 @app.route("/login", methods=["GET", "POST"])
+@limites.limitar("login", *LOGIN_POR_IP, ao_exceder=_login_limitado, metodos=("POST",))
 def login():
     if request.method == "POST":
         username = request.form.get("username")
         password = request.form.get("password")
 
+        espera = limites.consumir("login_usuario", (username or "").strip().lower(), *LOGIN_POR_USUARIO)
+        if espera:
+            return _login_limitado(espera)
+
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
         cursor.execute("""
@@ -234,6 +334,38 @@ def dashboard():
         ultimos_logs=ultimos_logs
     )
 
+# =========================
+# LISTAGENS EM STREAM
+# =========================
+# As listagens grandes não montam a página inteira na memória: as linhas vêm
+# do banco em lotes (ConsultaEmLotes) e o HTML vai para o navegador em
+# blocos enquanto a leitura continua.
+STREAM_BLOCO = 16 * 1024
+
+
+def _em_blocos(pedacos, tamanho=STREAM_BLOCO):
+    """Junta os pedaços pequenos gerados pelo Jinja em blocos de ~`tamanho` caracteres."""
+    buffer, n = [], 0
+    for pedaco in pedacos:
+        buffer.append(pedaco)
+        n += len(pedaco)
+        if n >= tamanho:
+            yield "".join(buffer)
+            buffer, n = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _pagina_em_stream(template, consulta, **contexto):
+    """
+    Renderiza `template` em stream. A conexão de `consulta` volta ao pool
+    quando a resposta termina, mesmo se o cliente desconectar no meio.
+    """
+    resposta = Response(_em_blocos(stream_template(template, **contexto)))
+    resposta.call_on_close(consulta.fechar)
+    return resposta
+
+
 # =========================
 # GESTÃO DE RECURSOS
 # =========================
@@ -241,9 +373,7 @@ def dashboard():
 @app.route("/recursos")
 @login_required
 def recursos_list():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
+    recursos = ConsultaEmLotes("""
         SELECT r.id,
                r.name,
                r.description,
@@ -252,20 +382,31 @@ def recursos_list():
                r.price,
                r.quantity,
                r.image_url,
+               r.version,
                rt.name AS type_name
         FROM resources r
         JOIN resource_types rt ON r.type_id = rt.id
         ORDER BY r.created_at DESC
     """)
-    recursos = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return render_template("recursos_list.html", recursos=recursos)
+
+    # só as linhas que mudaram (version nova) ou nunca vistas são renderizadas
+    role = session.get("user_role")
+    linhas = fragmentos.renderizar(
+        fragmentos.linhas_recursos,
+        app.jinja_env.get_template("_recurso_linha.html"),
+        recursos,
+        chave=lambda r: (r.id, r.version, role),
+        nome="r",
+        nome_cache="recursos_linhas",
+        role=role,
+    )
+    return _pagina_em_stream("recursos_list.html", recursos, linhas=linhas)
 
 
 @app.route("/recursos/novo", methods=["GET", "POST"])
 @login_required
 @role_required("gerente", "admin")
+@idempotencia.idempotente
 def recurso_novo():
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -286,9 +427,13 @@ def recurso_novo():
             INSERT INTO resources (name, description, type_id, location, status, price, quantity, image_url)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """, (name, description, type_id, location, status, price, quantity, image_url))
+        recurso_id = cursor.lastrowid
+        estoque.registrar_inicial(cursor, recurso_id, quantity, session["user_id"])
         conn.commit()
 
-        log_action(session["user_id"], "criou recurso", f"Recurso: {name}")
+        log_action(session["user_id"], "criou recurso", f"Recurso: {name}",
+                   entidade="recurso", entidade_id=recurso_id, quantidade=int(quantity))
+        _publicar_status_recursos(conn)
 
         cursor.close()
         conn.close()
@@ -303,6 +448,7 @@ def recurso_novo():
 @app.route("/recursos/editar/<int:recurso_id>", methods=["GET", "POST"])
 @login_required
 @role_required("gerente", "admin")
+@idempotencia.idempotente
 def recurso_editar(recurso_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -337,13 +483,18 @@ def recurso_editar(recurso_id):
                 location = %s,
                 status = %s,
                 price = %s,
-                quantity = %s,
-                image_url = %s
+                image_url = %s,
+                version = version + 1
             WHERE id = %s
-        """, (name, description, type_id, location, status, price, quantity, image_url, recurso_id))
+        """, (name, description, type_id, location, status, price, image_url, recurso_id))
+        # a quantidade passa pelo razão de estoque (movimentação de ajuste)
+        estoque.ajustar(cursor, recurso_id, quantity, session["user_id"])
         conn.commit()
+        fragmentos.invalidar_recurso(recurso_id)
 
-        log_action(session["user_id"], "editou recurso", f"Recurso: {name} (ID {recurso_id})")
+        log_action(session["user_id"], "editou recurso", f"Recurso: {name} (ID {recurso_id})",
+                   entidade="recurso", entidade_id=recurso_id)
+        _publicar_status_recursos(conn)
 
         cursor.close()
         conn.close()
@@ -358,6 +509,7 @@ def recurso_editar(recurso_id):
 @app.route("/recursos/remover/<int:recurso_id>", methods=["POST"])
 @login_required
 @role_required("admin")
+@idempotencia.idempotente
 def recurso_remover(recurso_id):
     conn = get_connection()
     cursor = conn.cursor()
@@ -374,14 +526,51 @@ def recurso_remover(recurso_id):
 
     cursor.execute("DELETE FROM resources WHERE id = %s", (recurso_id,))
     conn.commit()
+    fragmentos.invalidar_recurso(recurso_id)
 
-    log_action(session["user_id"], "removeu recurso", f"Recurso: {name} (ID {recurso_id})")
+    log_action(session["user_id"], "removeu recurso", f"Recurso: {name} (ID {recurso_id})",
+               entidade="recurso", entidade_id=recurso_id)
+    _publicar_status_recursos(conn)
 
     cursor.close()
     conn.close()
     flash("Recurso removido com sucesso!", "success")
     return redirect(url_for("recursos_list"))
 
+@app.route("/recursos/<int:recurso_id>/estoque")
+@login_required
+def recurso_estoque(recurso_id):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id, name, quantity FROM resources WHERE id = %s", (recurso_id,))
+    recurso = cursor.fetchone()
+    cursor.close()
+    conn.close()
+
+    if not recurso:
+        flash("Recurso não encontrado.", "danger")
+        return redirect(url_for("recursos_list"))
+
+    # ?em=AAAA-MM-DD (fim do dia) ou AAAA-MM-DDTHH:MM
+    em = request.args.get("em") or ""
+    quando = None
+    try:
+        if len(em) == 10:
+            quando = datetime.strptime(em, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+        elif em:
+            quando = datetime.strptime(em[:16], "%Y-%m-%dT%H:%M")
+    except ValueError:
+        flash("Data inválida.", "danger")
+
+    return render_template(
+        "recurso_estoque.html",
+        recurso=recurso,
+        em=em,
+        quando=quando,
+        estoque_na_data=estoque.estoque_em(recurso_id, quando) if quando else None,
+        movimentos=estoque.movimentos(recurso_id, ate=quando),
+    )
+
 # =========================
 # SOLICITAÇÕES DE BAIXA DE ESTOQUE
 # =========================
@@ -389,6 +578,7 @@ def recurso_remover(recurso_id):
 @app.route("/recursos/<int:recurso_id>/baixa", methods=["GET", "POST"])
 @login_required
 @role_required("funcionario", "gerente", "admin")
+@idempotencia.idempotente
 def recurso_baixa_solicitar(recurso_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -432,15 +622,14 @@ def recurso_baixa_solicitar(recurso_id):
                 INSERT INTO resource_requests (resource_id, requested_by, quantity, total_value, status)
                 VALUES (%s, %s, %s, %s, 'pendente')
             """, (recurso_id, session["user_id"], qty, total_value))
+            solicitacao_id = cursor.lastrowid
 
             # 2) já retira do estoque (reserva)
-            cursor.execute("""
-                UPDATE resources
-                SET quantity = quantity - %s
-                WHERE id = %s
-            """, (qty, recurso_id))
+            estoque.movimentar(cursor, recurso_id, -qty, "baixa", session["user_id"], solicitacao_id)
+            resumos.registrar_solicitacao(cursor, solicitacao_id)
 
             conn.commit()
+            fragmentos.invalidar_recurso(recurso_id)
         except Exception as e:
             conn.rollback()
             cursor.close()
@@ -451,8 +640,10 @@ def recurso_baixa_solicitar(recurso_id):
         log_action(
             session["user_id"],
             "solicitou baixa",
-            f"Recurso ID {recurso_id}, qtd {qty}, valor total {total_value}"
+            f"Recurso ID {recurso_id}, qtd {qty}, valor total {total_value}",
+            entidade="recurso", entidade_id=recurso_id, quantidade=qty, valor=total_value,
         )
+        eventos.publicar_pendencias(conn)
 
         cursor.close()
         conn.close()
@@ -467,6 +658,7 @@ def recurso_baixa_solicitar(recurso_id):
 @app.route("/recursos/<int:recurso_id>/entrada", methods=["GET", "POST"])
 @login_required
 @role_required("funcionario", "gerente", "admin")
+@idempotencia.idempotente
 def recurso_entrada(recurso_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -496,19 +688,15 @@ def recurso_entrada(recurso_id):
             conn.close()
             return render_template("entrada_form.html", recurso=recurso)
 
-        novo_estoque = recurso["quantity"] + qty
-
-        cursor.execute("""
-            UPDATE resources
-            SET quantity = %s
-            WHERE id = %s
-        """, (novo_estoque, recurso_id))
+        novo_estoque = estoque.movimentar(cursor, recurso_id, qty, "entrada", session["user_id"])
         conn.commit()
+        fragmentos.invalidar_recurso(recurso_id)
 
         log_action(
             session["user_id"],
             "entrada estoque",
-            f"Recurso ID {recurso_id}, qtd adicionada {qty}, novo estoque {novo_estoque}"
+            f"Recurso ID {recurso_id}, qtd adicionada {qty}, novo estoque {novo_estoque}",
+            entidade="recurso", entidade_id=recurso_id, quantidade=qty,
         )
 
         cursor.close()
@@ -526,10 +714,7 @@ def recurso_entrada(recurso_id):
 @login_required
 @role_required("gerente", "admin")
 def baixas_list():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("""
+    solicitacoes = ConsultaEmLotes("""
         SELECT rr.id, rr.resource_id, rr.quantity, rr.total_value, rr.status,
                rr.created_at, rr.manager_id, rr.admin_id,
                r.name AS resource_name,
@@ -539,36 +724,37 @@ def baixas_list():
         JOIN users u ON u.id = rr.requested_by
         ORDER BY rr.created_at DESC
     """)
-    requests = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
-    return render_template("baixas_list.html", requests=requests)
+    return _pagina_em_stream("baixas_list.html", solicitacoes, requests=solicitacoes)
 
 
 def _executar_baixa(conn, cursor, request_row, approver_role, approver_id):
     """
     Conclui a aprovação da baixa.
     O estoque já foi reservado na criação da solicitação,
-    então aqui só atualizamos o status e quem aprovou.
+    então aqui só atualizamos o status, quem aprovou e o resumo diário.
     """
     if approver_role == "gerente":
         cursor.execute("""
             UPDATE resource_requests
-            SET status = 'aprovado', manager_id = %s
-            WHERE id = %s
-        """, (approver_id, request_row["id"]))
+            SET status = 'aprovado', manager_id = %s, decided_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = %s
+        """, (approver_id, request_row["id"], request_row["status"]))
     else:  # admin
         cursor.execute("""
             UPDATE resource_requests
-            SET status = 'aprovado', admin_id = %s
-            WHERE id = %s
-        """, (approver_id, request_row["id"]))
+            SET status = 'aprovado', admin_id = %s, decided_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = %s
+        """, (approver_id, request_row["id"], request_row["status"]))
+    if cursor.rowcount == 0:
+        # expirada (reservas.py) ou decidida por outra pessoa depois da leitura
+        raise ValueError("Solicitação já processada.")
+    resumos.registrar_aprovacao(cursor, request_row["id"])
 
 
 @app.route("/baixas/<int:request_id>/aprovar", methods=["POST"])
 @login_required
 @role_required("gerente", "admin")
+@idempotencia.idempotente
 def baixa_aprovar(request_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -598,12 +784,16 @@ def baixa_aprovar(request_id):
                 cursor.execute("""
                     UPDATE resource_requests
                     SET status = 'aprovado_gerente', manager_id = %s
-                    WHERE id = %s
+                    WHERE id = %s AND status = 'pendente'
                 """, (session["user_id"], request_id))
+                if cursor.rowcount == 0:
+                    raise ValueError("Solicitação já processada.")
             else:
                 # gerente pode concluir a baixa
                 _executar_baixa(conn, cursor, req, "gerente", session["user_id"])
         else:  # admin
+            if req["status"] not in ("pendente", "aprovado_gerente"):
+                raise ValueError("Solicitação já processada.")
             if total_value > 10000:
                 if req["status"] != "aprovado_gerente":
                     raise ValueError("Solicitação acima de 10.000 precisa da aprovação prévia do gerente.")
@@ -613,7 +803,10 @@ def baixa_aprovar(request_id):
                 _executar_baixa(conn, cursor, req, "admin", session["user_id"])
 
         conn.commit()
-        log_action(session["user_id"], "aprovou baixa", f"Solicitação ID {request_id}, valor {total_value}")
+        log_action(session["user_id"], "aprovou baixa", f"Solicitação ID {request_id}, valor {total_value}",
+                   entidade="recurso", entidade_id=req["resource_id"],
+                   quantidade=req["quantity"], valor=total_value)
+        eventos.publicar_pendencias(conn)
         flash("Baixa aprovada com sucesso.", "success")
 
     except Exception as e:
@@ -628,12 +821,13 @@ def baixa_aprovar(request_id):
 @app.route("/baixas/<int:request_id>/rejeitar", methods=["POST"])
 @login_required
 @role_required("gerente", "admin")
+@idempotencia.idempotente
 def baixa_rejeitar(request_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
 
     cursor.execute("""
-        SELECT id, resource_id, quantity, status
+        SELECT id, resource_id, quantity, status, decided_at
         FROM resource_requests
         WHERE id = %s
     """, (request_id,))
@@ -645,27 +839,31 @@ def baixa_rejeitar(request_id):
         flash("Solicitação não encontrada.", "danger")
         return redirect(url_for("baixas_list"))
 
-    if req["status"] == "rejeitado":
+    if req["status"] in ("rejeitado", "expirado"):
         cursor.close()
         conn.close()
-        flash("Solicitação já foi rejeitada.", "warning")
+        if req["status"] == "expirado":
+            flash("Solicitação expirou e o estoque já foi devolvido.", "warning")
+        else:
+            flash("Solicitação já foi rejeitada.", "warning")
         return redirect(url_for("baixas_list"))
 
     try:
-        # devolve a quantidade para o estoque
-        cursor.execute("""
-            UPDATE resources
-            SET quantity = quantity + %s
-            WHERE id = %s
-        """, (req["quantity"], req["resource_id"]))
-
         cursor.execute("""
             UPDATE resource_requests
-            SET status = 'rejeitado'
-            WHERE id = %s
-        """, (request_id,))
+            SET status = 'rejeitado', decided_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = %s
+        """, (request_id, req["status"]))
+        if cursor.rowcount == 0:
+            raise ValueError("a solicitação mudou de status; recarregue a página")
+
+        # devolve a quantidade para o estoque
+        estoque.movimentar(cursor, req["resource_id"], req["quantity"], "devolucao",
+                           session["user_id"], request_id)
+        resumos.registrar_rejeicao(cursor, request_id, req["status"], req["decided_at"])
 
         conn.commit()
+        fragmentos.invalidar_recurso(req["resource_id"])
     except Exception as e:
         conn.rollback()
         cursor.close()
@@ -673,7 +871,9 @@ def baixa_rejeitar(request_id):
         flash(f"Erro ao rejeitar solicitação: {e}", "danger")
         return redirect(url_for("baixas_list"))
 
-    log_action(session["user_id"], "rejeitou baixa", f"Solicitação ID {request_id}")
+    log_action(session["user_id"], "rejeitou baixa", f"Solicitação ID {request_id}",
+               entidade="recurso", entidade_id=req["resource_id"], quantidade=req["quantity"])
+    eventos.publicar_pendencias(conn)
     cursor.close()
     conn.close()
     flash("Solicitação rejeitada e estoque devolvido.", "success")
@@ -688,25 +888,19 @@ def baixa_rejeitar(request_id):
 @login_required
 @role_required("gerente", "admin")
 def usuarios_list():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("""
+    usuarios = ConsultaEmLotes("""
         SELECT u.id, u.name, u.username, u.approved, r.name AS role_name, u.created_at
         FROM users u
         JOIN roles r ON r.id = u.role_id
         ORDER BY u.created_at DESC
     """)
-    usuarios = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
-    return render_template("usuarios_list.html", usuarios=usuarios)
+    return _pagina_em_stream("usuarios_list.html", usuarios, usuarios=usuarios)
 
 
 @app.route("/usuarios/novo", methods=["GET", "POST"])
 @login_required
 @role_required("gerente", "admin")
+@idempotencia.idempotente
 def usuario_novo():
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -736,6 +930,7 @@ def usuario_novo():
                 INSERT INTO users (name, username, password_hash, role_id, approved)
                 VALUES (%s, %s, %s, %s, %s)
             """, (name, username, password_hash, role_id, approved))
+            novo_id = cursor.lastrowid
             conn.commit()
 
             if approved:
@@ -743,7 +938,8 @@ def usuario_novo():
             else:
                 msg = "Usuário criado, aguardando aprovação do Admin."
 
-            log_action(session["user_id"], "criou usuario", f"Usuário: {username}")
+            log_action(session["user_id"], "criou usuario", f"Usuário: {username}",
+                       entidade="usuario", entidade_id=novo_id)
             flash(msg, "success")
             cursor.close()
             conn.close()
@@ -763,6 +959,7 @@ def usuario_novo():
 @app.route("/usuarios/aprovar/<int:usuario_id>", methods=["POST"])
 @login_required
 @role_required("admin")
+@idempotencia.idempotente
 def usuario_aprovar(usuario_id):
     conn = get_connection()
     cursor = conn.cursor()
@@ -784,7 +981,8 @@ def usuario_aprovar(usuario_id):
     """, (usuario_id,))
     conn.commit()
 
-    log_action(session["user_id"], "aprovou usuario", f"Usuário: {username} (ID {usuario_id})")
+    log_action(session["user_id"], "aprovou usuario", f"Usuário: {username} (ID {usuario_id})",
+               entidade="usuario", entidade_id=usuario_id)
 
     cursor.close()
     conn.close()
@@ -795,6 +993,7 @@ def usuario_aprovar(usuario_id):
 @app.route("/usuarios/editar/<int:usuario_id>", methods=["GET", "POST"])
 @login_required
 @role_required("admin")
+@idempotencia.idempotente
 def usuario_editar(usuario_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
@@ -842,7 +1041,8 @@ def usuario_editar(usuario_id):
             """, (name, username, role_id, usuario_id))
 
         conn.commit()
-        log_action(session["user_id"], "editou usuario", f"Usuário: {username} (ID {usuario_id})")
+        log_action(session["user_id"], "editou usuario", f"Usuário: {username} (ID {usuario_id})",
+                   entidade="usuario", entidade_id=usuario_id)
         cursor.close()
         conn.close()
 
@@ -857,6 +1057,7 @@ def usuario_editar(usuario_id):
 @app.route("/usuarios/remover/<int:usuario_id>", methods=["POST"])
 @login_required
 @role_required("admin")
+@idempotencia.idempotente
 def usuario_remover(usuario_id):
     if usuario_id == session.get("user_id"):
         flash("Você não pode remover o próprio usuário logado.", "danger")
@@ -878,15 +1079,454 @@ def usuario_remover(usuario_id):
     cursor.execute("DELETE FROM users WHERE id = %s", (usuario_id,))
     conn.commit()
 
-    log_action(session["user_id"], "removeu usuario", f"Usuário: {username} (ID {usuario_id})")
+    log_action(session["user_id"], "removeu usuario", f"Usuário: {username} (ID {usuario_id})",
+               entidade="usuario", entidade_id=usuario_id)
 
     cursor.close()
     conn.close()
     flash("Usuário removido com sucesso!", "success")
     return redirect(url_for("usuarios_list"))
 
+# =========================
+# RELATÓRIOS
+# =========================
+
+@app.route("/relatorios")
+@login_required
+@role_required("gerente", "admin")
+def relatorios_view():
+    return render_template("relatorios.html", rel=relatorios.valorizacao())
+
+
+@app.route("/api/relatorios/valorizacao")
+@login_required
+@role_required("gerente", "admin")
+def api_relatorio_valorizacao():
+    return _api_condicional(relatorios.TABELAS, lambda cursor: _json_valor(relatorios.valorizacao()))
+
+
+@app.route("/relatorios/tendencias")
+@login_required
+@role_required("gerente", "admin")
+def relatorios_tendencias():
+    try:
+        dias = min(max(int(request.args.get("dias") or 30), 1), 366)
+    except ValueError:
+        dias = 30
+    return render_template("tendencias.html", t=resumos.tendencias(dias))
+
+# =========================
+# LOGS DE AUDITORIA
+# =========================
+
+LOGS_POR_PAGINA = 50
+ENTIDADES_LOG = ("recurso", "usuario", "job")
+ACOES_LOG = (
+    "login", "logout",
+    "criou recurso", "editou recurso", "removeu recurso",
+    "solicitou baixa", "entrada estoque", "aprovou baixa", "rejeitou baixa", "expirou reservas",
+    "criou usuario", "aprovou usuario", "editou usuario", "removeu usuario",
+    "agendou tarefa",
+)
+
+
+def _data_param(nome):
+    try:
+        return date.fromisoformat(request.args.get(nome) or "")
+    except ValueError:
+        return None
+
+
+def _id_limite_log(cursor, sql, data):
+    """Primeiro/último id de uma data, pelo índice de created_at (uma busca só)."""
+    cursor.execute(sql, (data,))
+    linha = cursor.fetchone()
+    return linha["id"] if linha else None
+
+
+@app.route("/logs")
+@login_required
+@role_required("gerente", "admin")
+def logs_list():
+    """
+    Explorador dos logs de auditoria, do mais recente para o mais antigo.
+    Paginação por chave (`antes` = menor id da página anterior): cada página
+    é uma faixa do índice do filtro escolhido, sem OFFSET nem LIKE.
+    """
+    filtros = {
+        "usuario": request.args.get("usuario", type=int),
+        "acao": request.args.get("acao") if request.args.get("acao") in ACOES_LOG else None,
+        "entidade": request.args.get("entidade") if request.args.get("entidade") in ENTIDADES_LOG else None,
+        "entidade_id": request.args.get("entidade_id", type=int),
+        "de": _data_param("de"),
+        "ate": _data_param("ate"),
+    }
+    antes = request.args.get("antes", type=int)
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    where, params = [], []
+    if filtros["usuario"]:
+        where.append("l.user_id = %s")
+        params.append(filtros["usuario"])
+    if filtros["acao"]:
+        where.append("l.action = %s")
+        params.append(filtros["acao"])
+    if filtros["entidade"]:
+        where.append("l.entity_type = %s")
+        params.append(filtros["entidade"])
+        if filtros["entidade_id"]:
+            where.append("l.entity_id = %s")
+            params.append(filtros["entidade_id"])
+
+    # o intervalo de datas vira um intervalo de ids, que combina com qualquer
+    # índice (user_id, id), (action, id), (entity_type, entity_id, id)
+    vazio = False
+    if filtros["de"]:
+        primeiro = _id_limite_log(cursor, """
+            SELECT id FROM access_logs WHERE created_at >= %s
+            ORDER BY created_at, id LIMIT 1
+        """, filtros["de"].isoformat())
+        vazio = primeiro is None
+        where.append("l.id >= %s")
+        params.append(primeiro or 0)
+    if filtros["ate"]:
+        ultimo = _id_limite_log(cursor, """
+            SELECT id FROM access_logs WHERE created_at < %s
+            ORDER BY created_at DESC, id DESC LIMIT 1
+        """, (filtros["ate"] + timedelta(days=1)).isoformat())
+        vazio = vazio or ultimo is None
+        where.append("l.id <= %s")
+        params.append(ultimo or 0)
+    if antes:
+        where.append("l.id < %s")
+        params.append(antes)
+
+    logs = []
+    if not vazio:
+        cursor.execute(f"""
+            SELECT l.id, l.action, l.details, l.created_at, l.entity_type, l.entity_id,
+                   l.quantity, l.value, u.name AS user_name
+            FROM access_logs l
+            LEFT JOIN users u ON u.id = l.user_id
+            {("WHERE " + " AND ".join(where)) if where else ""}
+            ORDER BY l.id DESC
+            LIMIT %s
+        """, params + [LOGS_POR_PAGINA + 1])
+        logs = cursor.fetchall()
+
+    cursor.execute("SELECT id, name FROM users ORDER BY name")
+    usuarios = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    proxima = logs[LOGS_POR_PAGINA - 1]["id"] if len(logs) > LOGS_POR_PAGINA else None
+    ativos = {k: (v.isoformat() if isinstance(v, date) else v) for k, v in filtros.items() if v}
+    return render_template(
+        "logs_list.html",
+        logs=logs[:LOGS_POR_PAGINA],
+        filtros=ativos,
+        proxima=proxima,
+        primeira_pagina=not antes,
+        usuarios=usuarios,
+        acoes=ACOES_LOG,
+        entidades=ENTIDADES_LOG,
+    )
+
+# =========================
+# TAREFAS EM SEGUNDO PLANO
+# =========================
+
+EXPORTACOES = {
+    "logs": ("exportar_logs", "Exportação dos logs de acesso"),
+    "recursos": ("exportar_recursos", "Exportação dos recursos"),
+}
+
+
+def _job_visivel(job_id):
+    """Devolve o job se o usuário logado pode vê-lo (dono ou admin)."""
+    job = jobs.obter(job_id)
+    if job and (session.get("user_role") == "admin" or job["created_by"] == session.get("user_id")):
+        return job
+    return None
+
+
+@app.route("/jobs")
+@login_required
+@role_required("gerente", "admin")
+def jobs_list():
+    dono = None if session["user_role"] == "admin" else session["user_id"]
+    return render_template("jobs_list.html", lista=jobs.listar(dono), exportacoes=EXPORTACOES)
+
+
+@app.route("/jobs/exportar/<tipo>", methods=["POST"])
+@login_required
+@role_required("gerente", "admin")
+@idempotencia.idempotente
+def job_exportar(tipo):
+    if tipo not in EXPORTACOES:
+        flash("Exportação desconhecida.", "danger")
+        return redirect(url_for("jobs_list"))
+
+    tarefa, descricao = EXPORTACOES[tipo]
+    params = {}
+    if tipo == "logs":
+        params = {"inicio": request.form.get("inicio") or None, "fim": request.form.get("fim") or None}
+    job_id = jobs.enfileirar(tarefa, params, criado_por=session["user_id"])
+    log_action(session["user_id"], "agendou tarefa", f"{descricao} (job {job_id})",
+               entidade="job", entidade_id=job_id)
+    flash(f"{descricao} agendada. Acompanhe o andamento abaixo.", "success")
+    return redirect(url_for("jobs_list"))
+
+
+@app.route("/jobs/<int:job_id>/cancelar", methods=["POST"])
+@login_required
+@role_required("gerente", "admin")
+@idempotencia.idempotente
+def job_cancelar(job_id):
+    if not _job_visivel(job_id):
+        flash("Tarefa não encontrada.", "danger")
+    elif jobs.cancelar(job_id):
+        flash("Cancelamento solicitado.", "success")
+    else:
+        flash("A tarefa já terminou.", "warning")
+    return redirect(url_for("jobs_list"))
+
+
+@app.route("/jobs/<int:job_id>/arquivo")
+@login_required
+@role_required("gerente", "admin")
+def job_arquivo(job_id):
+    job = _job_visivel(job_id)
+    if not job or job["status"] != "concluido" or not (job["result"] or {}).get("arquivo"):
+        flash("Arquivo não disponível.", "danger")
+        return redirect(url_for("jobs_list"))
+    return send_from_directory(jobs.EXPORT_DIR, job["result"]["arquivo"], as_attachment=True)
+
+
+@app.route("/api/jobs/<int:job_id>")
+@login_required
+def api_job(job_id):
+    job = _job_visivel(job_id)
+    if not job:
+        return jsonify({"erro": "Tarefa não encontrada."}), 404
+    campos = ("id", "type", "status", "progress", "message", "result", "attempts", "max_attempts",
+              "created_at", "started_at", "finished_at")
+    return jsonify({c: _json_valor(job[c]) for c in campos})
+
+# =========================
+# API JSON (SOMENTE LEITURA)
+# =========================
+
+API_POR_PAGINA_PADRAO = 50
+API_POR_PAGINA_MAX = 500
+
+# campo exposto -> expressão SQL
+API_CAMPOS_RECURSO = OrderedDict([
+    ("id", "r.id"),
+    ("name", "r.name"),
+    ("description", "r.description"),
+    ("type_name", "rt.name"),
+    ("location", "r.location"),
+    ("status", "r.status"),
+    ("price", "r.price"),
+    ("quantity", "r.quantity"),
+    ("image_url", "r.image_url"),
+    ("created_at", "r.created_at"),
+])
+
+API_CAMPOS_BAIXA = OrderedDict([
+    ("id", "rr.id"),
+    ("resource_id", "rr.resource_id"),
+    ("resource_name", "r.name"),
+    ("requester_name", "u.name"),
+    ("quantity", "rr.quantity"),
+    ("total_value", "rr.total_value"),
+    ("status", "rr.status"),
+    ("manager_id", "rr.manager_id"),
+    ("admin_id", "rr.admin_id"),
+    ("created_at", "rr.created_at"),
+])
+
+
+class _ErroApi(Exception):
+    pass
+
+
+def _json_valor(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, dict):
+        return {k: _json_valor(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_json_valor(v) for v in valor]
+    return valor
+
+
+def _json_linhas(linhas):
+    return [{k: _json_valor(v) for k, v in linha.items()} for linha in linhas]
+
+
+def _api_paginacao():
+    try:
+        pagina = int(request.args.get("pagina", 1))
+        por_pagina = int(request.args.get("por_pagina", API_POR_PAGINA_PADRAO))
+    except ValueError:
+        raise _ErroApi("pagina e por_pagina devem ser inteiros.")
+    if pagina < 1 or por_pagina < 1:
+        raise _ErroApi("pagina e por_pagina devem ser maiores que zero.")
+    return pagina, min(por_pagina, API_POR_PAGINA_MAX)
+
+
+def _api_campos(permitidos):
+    pedidos = request.args.get("campos")
+    if not pedidos:
+        return list(permitidos)
+    campos = [c.strip() for c in pedidos.split(",") if c.strip()]
+    invalidos = [c for c in campos if c not in permitidos]
+    if invalidos:
+        raise _ErroApi(f"Campos inválidos: {', '.join(invalidos)}.")
+    return campos
+
+
+def _api_condicional(tabelas, gerar):
+    """
+    Responde 304 se o ETag enviado pelo cliente ainda vale; senão chama
+    gerar(cursor) e devolve o JSON. O ETag (fraco) vem das versões das
+    tabelas envolvidas + parâmetros da URL, então a checagem custa
+    uma leitura por chave primária em table_versions.
+    """
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        marcadores = ", ".join(["%s"] * len(tabelas))
+        cursor.execute(f"SELECT name, version FROM table_versions WHERE name IN ({marcadores})", tabelas)
+        versoes = {row["name"]: row["version"] for row in cursor.fetchall()}
+        chave = "|".join([
+            request.endpoint,
+            ".".join(str(versoes.get(t, 0)) for t in tabelas),
+            urlencode(sorted(request.args.items(multi=True))),
+        ])
+        etag = hashlib.sha1(chave.encode()).hexdigest()[:24]
+
+        if request.if_none_match.contains_weak(etag):
+            metricas.contar_cache("api_etag", True)
+            resp = app.response_class(status=304)
+        else:
+            metricas.contar_cache("api_etag", False)
+            try:
+                resp = jsonify(gerar(cursor))
+            except _ErroApi as e:
+                return jsonify({"ok": False, "error": str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+@app.route("/api/recursos")
+@login_required
+def api_recursos():
+    def gerar(cursor):
+        pagina, por_pagina = _api_paginacao()
+        campos = _api_campos(API_CAMPOS_RECURSO)
+        colunas = ", ".join(f"{API_CAMPOS_RECURSO[c]} AS {c}" for c in campos)
+        cursor.execute(f"""
+            SELECT {colunas}
+            FROM resources r
+            JOIN resource_types rt ON r.type_id = rt.id
+            ORDER BY r.created_at DESC, r.id DESC
+            LIMIT %s OFFSET %s
+        """, (por_pagina + 1, (pagina - 1) * por_pagina))
+        itens = cursor.fetchall()
+        return {
+            "ok": True,
+            "pagina": pagina,
+            "por_pagina": por_pagina,
+            "tem_mais": len(itens) > por_pagina,
+            "itens": _json_linhas(itens[:por_pagina]),
+        }
+
+    return _api_condicional(("resources", "resource_types"), gerar)
+
+
+@app.route("/api/baixas")
+@login_required
+@role_required("gerente", "admin")
+def api_baixas():
+    def gerar(cursor):
+        pagina, por_pagina = _api_paginacao()
+        campos = _api_campos(API_CAMPOS_BAIXA)
+        colunas = ", ".join(f"{API_CAMPOS_BAIXA[c]} AS {c}" for c in campos)
+        filtro = ""
+        params = []
+        status = request.args.get("status")
+        if status:
+            filtro = "WHERE rr.status = %s"
+            params.append(status)
+        cursor.execute(f"""
+            SELECT {colunas}
+            FROM resource_requests rr
+            JOIN resources r ON r.id = rr.resource_id
+            JOIN users u ON u.id = rr.requested_by
+            {filtro}
+            ORDER BY rr.created_at DESC, rr.id DESC
+            LIMIT %s OFFSET %s
+        """, (*params, por_pagina + 1, (pagina - 1) * por_pagina))
+        itens = cursor.fetchall()
+        return {
+            "ok": True,
+            "pagina": pagina,
+            "por_pagina": por_pagina,
+            "tem_mais": len(itens) > por_pagina,
+            "itens": _json_linhas(itens[:por_pagina]),
+        }
+
+    return _api_condicional(("resource_requests", "resources", "users"), gerar)
+
+
+@app.route("/api/dashboard")
+@login_required
+def api_dashboard():
+    def gerar(cursor):
+        cursor.execute("SELECT COUNT(*) AS total FROM resources")
+        total_recursos = cursor.fetchone()["total"]
+
+        cursor.execute("""
+            SELECT status, COUNT(*) AS total
+            FROM resources
+            GROUP BY status
+        """)
+        recursos_por_status = {row["status"]: row["total"] for row in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT status, COUNT(*) AS total
+            FROM resource_requests
+            GROUP BY status
+        """)
+        solicitacoes_por_status = {row["status"]: row["total"] for row in cursor.fetchall()}
+
+        return {
+            "ok": True,
+            "total_recursos": total_recursos,
+            "recursos_por_status": recursos_por_status,
+            "solicitacoes_por_status": solicitacoes_por_status,
+        }
+
+    return _api_condicional(("resources", "resource_requests"), gerar)
+
+
 @app.route("/api/unsplash_suggest")
 @login_required
+@limites.limitar("unsplash_suggest", 15, 1, chave=limites.por_usuario,
+                 ao_exceder=lambda espera: limites.resposta_429(
+                     espera, "Muitas buscas seguidas; aguarde um instante."))
 def unsplash_suggest():
     """
     Retorna uma sugest?o de imagem do Unsplash com base no par?metro ?q=...
@@ -910,21 +1550,24 @@ def unsplash_suggest():
     if cached:
         return jsonify(cached)
 
+    import requests  # só quem chama o Unsplash paga a importação (~30 ms)
+
     try:
-        resp = requests.get(
-            "https://api.unsplash.com/search/photos",
-            params={
-                "query": query,
-                "per_page": 1,
-                "orientation": "landscape",
-            },
-            headers={
-                "Accept-Version": "v1",
-                "Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}",
-                "User-Agent": "wayne-security-tools/1.0",
-            },
-            timeout=5
-        )
+        with metricas.medir_http("unsplash"):
+            resp = requests.get(
+                f"{UNSPLASH_API_URL}/search/photos",
+                params={
+                    "query": query,
+                    "per_page": 1,
+                    "orientation": "landscape",
+                },
+                headers={
+                    "Accept-Version": "v1",
+                    "Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}",
+                    "User-Agent": "wayne-security-tools/1.0",
+                },
+                timeout=5
+            )
 
         data = resp.json()
 
@@ -965,6 +1608,7 @@ def unsplash_suggest():
 
 @app.route("/api/unsplash_download", methods=["POST"])
 @login_required
+@idempotencia.idempotente
 def unsplash_download():
     if not UNSPLASH_ACCESS_KEY:
         return jsonify({
@@ -981,22 +1625,25 @@ def unsplash_download():
             "error": "download_location n?o informado."
         }), 400
 
-    if not download_location.startswith("https://api.unsplash.com/"):
+    if not download_location.startswith(f"{UNSPLASH_API_URL}/"):
         return jsonify({
             "ok": False,
             "error": "download_location inv?lido."
         }), 400
 
+    import requests  # só quem chama o Unsplash paga a importação (~30 ms)
+
     try:
-        resp = requests.get(
-            download_location,
-            headers={
-                "Accept-Version": "v1",
-                "Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}",
-                "User-Agent": "wayne-security-tools/1.0",
-            },
-            timeout=5
-        )
+        with metricas.medir_http("unsplash"):
+            resp = requests.get(
+                download_location,
+                headers={
+                    "Accept-Version": "v1",
+                    "Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}",
+                    "User-Agent": "wayne-security-tools/1.0",
+                },
+                timeout=5
+            )
 
         if resp.status_code != 200:
             return jsonify({
@@ -1013,5 +1660,25 @@ def unsplash_download():
             "ok": False,
             "error": "Erro ao comunicar com o Unsplash."
         }), 500
+
+
+# =========================
+# FÁBRICA DO APP (PRODUÇÃO)
+# =========================
+
+def create_app(config=None):
+    """
+    Devolve o app configurado para rodar atrás de um servidor WSGI
+    (wsgi.py / servidor.py). As rotas continuam registradas neste módulo;
+    aqui entram só a chave de sessão vinda do ambiente e overrides em `config`.
+    """
+    secret_key = os.getenv("WAYNE_SECRET_KEY")
+    if secret_key:
+        app.secret_key = secret_key
+    app.config.update(config or {})
+    return app
+
+
+# Servidor de desenvolvimento (em produção use servidor.py ou wsgi.py)
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,157 @@
+# auditoria.py
+"""
+Preenchimento dos campos estruturados dos logs de auditoria antigos.
+
+As colunas entity_type, entity_id, quantity e value de `access_logs` só são
+gravadas pelo log_action a partir da migração 007; os filtros de /logs por
+entidade não encontram as linhas anteriores. preencher() lê essas linhas
+em lotes (pela chave primária), extrai os campos do texto de `details` (o
+formato que cada rota sempre gravou) e completa as colunas. Ações sem
+entidade (login, logout) e textos fora do formato ficam como estão.
+
+Uso (uma vez, depois da migração; pode ser repetido):
+    python auditoria.py preencher
+ou enfileirar a tarefa `preencher_logs` em jobs.py.
+"""
+import re
+import sys
+from decimal import Decimal, InvalidOperation
+
+import jobs
+from db import get_connection
+
+LOTE = 1000
+
+_NUMERO = r"(\d+(?:\.\d+)?)"
+
+# ação -> (entidade, expressão sobre `details`, grupos: id, quantidade, valor)
+FORMATOS = {
+    "criou recurso": ("recurso", re.compile(r"^Recurso: (?P<nome>.+)$")),
+    "editou recurso": ("recurso", re.compile(r"\(ID (?P<id>\d+)\)$")),
+    "removeu recurso": ("recurso", re.compile(r"\(ID (?P<id>\d+)\)$")),
+    "solicitou baixa": ("recurso", re.compile(
+        rf"^Recurso ID (?P<id>\d+), qtd (?P<qtd>\d+), valor total (?P<valor>{_NUMERO})")),
+    "entrada estoque": ("recurso", re.compile(
+        r"^Recurso ID (?P<id>\d+), qtd adicionada (?P<qtd>\d+)")),
+    "aprovou baixa": ("recurso", re.compile(
+        rf"^Solicitação ID (?P<solicitacao>\d+), valor (?P<valor>{_NUMERO})")),
+    "rejeitou baixa": ("recurso", re.compile(r"^Solicitação ID (?P<solicitacao>\d+)")),
+    "expirou reservas": (None, re.compile(r"(?P<qtd>\d+) unidade\(s\) devolvida\(s\)")),
+    "criou usuario": ("usuario", re.compile(r"^Usuário: (?P<nome>.+)$")),
+    "aprovou usuario": ("usuario", re.compile(r"\(ID (?P<id>\d+)\)$")),
+    "editou usuario": ("usuario", re.compile(r"\(ID (?P<id>\d+)\)$")),
+    "removeu usuario": ("usuario", re.compile(r"\(ID (?P<id>\d+)\)$")),
+    "agendou tarefa": ("job", re.compile(r"\(job (?P<id>\d+)\)$")),
+}
+
+
+def _inteiro(texto):
+    return int(texto) if texto else None
+
+
+def _valor(texto):
+    try:
+        return float(Decimal(texto)) if texto else None
+    except InvalidOperation:
+        return None
+
+
+def _em(cursor, sql, chaves):
+    """Executa `sql` com um IN (...) de `chaves` e devolve as linhas."""
+    if not chaves:
+        return []
+    cursor.execute(sql.format(", ".join(["%s"] * len(chaves))), list(chaves))
+    return cursor.fetchall()
+
+
+def _interpretar(cursor, linhas):
+    """(id, ação, details) -> lista de (entidade, entidade_id, qtd, valor, id) para o UPDATE."""
+    lidas = []
+    for log_id, acao, details in linhas:
+        entidade, expressao = FORMATOS[acao]
+        achou = expressao.search(details or "")
+        if achou:
+            lidas.append((log_id, acao, entidade, achou.groupdict()))
+
+    # campos que só existem em outras tabelas: uma consulta por lote
+    solicitacoes = {int(g["solicitacao"]) for _, _, _, g in lidas if g.get("solicitacao")}
+    por_solicitacao = {i: (r, q) for i, r, q in _em(
+        cursor, "SELECT id, resource_id, quantity FROM resource_requests WHERE id IN ({})", solicitacoes)}
+    recursos = {g["nome"] for _, a, _, g in lidas if a == "criou recurso"}
+    # nome de recurso não é único: só resolve quando há exatamente um
+    por_recurso = {n: i for n, i, total in _em(
+        cursor, "SELECT name, MIN(id), COUNT(*) FROM resources WHERE name IN ({}) GROUP BY name", recursos)
+        if total == 1}
+    usuarios = {g["nome"] for _, a, _, g in lidas if a == "criou usuario"}
+    por_usuario = dict(_em(cursor, "SELECT username, id FROM users WHERE username IN ({})", usuarios))
+
+    atualizacoes = []
+    for log_id, acao, entidade, g in lidas:
+        entidade_id, qtd = _inteiro(g.get("id")), _inteiro(g.get("qtd"))
+        if g.get("solicitacao"):
+            entidade_id, qtd = por_solicitacao.get(int(g["solicitacao"]), (None, None))
+        elif acao == "criou recurso":
+            entidade_id = por_recurso.get(g["nome"])
+        elif acao == "criou usuario":
+            entidade_id = por_usuario.get(g["nome"])
+        atualizacoes.append((entidade, entidade_id, qtd, _valor(g.get("valor")), log_id))
+    return atualizacoes
+
+
+def preencher(lote=LOTE, job=None):
+    """
+    Completa os campos estruturados dos logs que ainda não os têm.
+    Cada lote é uma transação curta. Devolve {"lidas": n, "preenchidas": n}.
+    """
+    acoes = tuple(FORMATOS)
+    marcadores = ", ".join(["%s"] * len(acoes))
+    conn = get_connection()
+    cursor = conn.cursor()
+    lidas = preenchidas = 0
+    try:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM access_logs")
+        maior = cursor.fetchone()[0]
+        ultimo = 0
+        while True:
+            cursor.execute(f"""
+                SELECT id, action, details FROM access_logs
+                WHERE id > %s AND entity_type IS NULL AND quantity IS NULL
+                  AND action IN ({marcadores})
+                ORDER BY id
+                LIMIT %s
+            """, (ultimo, *acoes, lote))
+            linhas = [tuple(l) for l in cursor.fetchall()]
+            if not linhas:
+                break
+            ultimo = linhas[-1][0]
+            atualizacoes = _interpretar(cursor, linhas)
+            if atualizacoes:
+                cursor.executemany("""
+                    UPDATE access_logs
+                    SET entity_type = %s, entity_id = %s, quantity = %s, value = %s
+                    WHERE id = %s
+                """, atualizacoes)
+            conn.commit()
+            lidas += len(linhas)
+            preenchidas += len(atualizacoes)
+            if job is not None:
+                job.progresso(ultimo, maior, f"{preenchidas} log(s) preenchido(s)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return {"lidas": lidas, "preenchidas": preenchidas}
+
+
+@jobs.tarefa("preencher_logs", tentativas=1)
+def _tarefa_preencher(job):
+    return preencher(job.params.get("lote") or LOTE, job=job)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["preencher"]:
+        sys.exit("uso: python auditoria.py preencher")
+    r = preencher()
+    print(f"{r['preenchidas']} de {r['lidas']} log(s) antigo(s) preenchido(s)")
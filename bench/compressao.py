@@ -0,0 +1,90 @@
+# bench/compressao.py
+"""
+Benchmark da compressão de respostas: bytes e custo de CPU por página.
+
+Renderiza as páginas de listagem (e a API JSON) sobre a massa do benchmark
+e, para cada algoritmo disponível e nível, mede o tamanho comprimido e o
+tempo de CPU gasto para comprimir uma página.
+
+Uso:
+    python bench/compressao.py --recursos 50000 --solicitacoes 500000 --logs 0
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import massa
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS = os.path.join(AQUI, "resultados")
+
+PAGINAS = (
+    ("recursos", "/recursos"),
+    ("baixas", "/baixas"),
+    ("usuarios", "/usuarios"),
+    ("api_recursos", "/api/recursos?por_pagina=500"),
+)
+NIVEIS = {"gzip": (1, 6, 9), "br": (1, 4, 9), "zstd": (1, 3, 9)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo e ganho da compressão por página")
+    parser.add_argument("--banco", default=os.path.join(AQUI, "bench.db"))
+    parser.add_argument("--recursos", type=int, default=50000)
+    parser.add_argument("--solicitacoes", type=int, default=500000)
+    parser.add_argument("--logs", type=int, default=5000000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    massa.usar_sqlite(args.banco)
+    massa.popular(args.banco, args.recursos, args.solicitacoes, args.logs, args.semente)
+
+    import compressao
+    from app import app
+
+    client = app.test_client()
+    client.post("/login", data={"username": "bench_admin", "password": massa.SENHA_BENCH})
+
+    resultado = {
+        "meta": {"data": datetime.now().isoformat(timespec="seconds"), "repeticoes": args.repeticoes},
+        "paginas": {},
+    }
+
+    for nome, url in PAGINAS:
+        # sem Accept-Encoding o app devolve a página sem comprimir
+        corpo = client.get(url).data
+        linhas = {"original_bytes": len(corpo), "algoritmos": {}}
+        print(f"\n{nome}: {len(corpo):,} bytes sem compressão")
+
+        for algoritmo in compressao.disponiveis():
+            for nivel in NIVEIS[algoritmo]:
+                inicio = time.process_time()
+                for _ in range(args.repeticoes):
+                    comprimido = compressao.comprimir(corpo, algoritmo, nivel)
+                cpu_ms = (time.process_time() - inicio) / args.repeticoes * 1000
+                razao = len(comprimido) / len(corpo) if corpo else 0.0
+                linhas["algoritmos"][f"{algoritmo}-{nivel}"] = {
+                    "bytes": len(comprimido),
+                    "razao": round(razao, 4),
+                    "cpu_ms": round(cpu_ms, 3),
+                }
+                print(f"  {algoritmo:5} nível {nivel:2}: {len(comprimido):>10,} bytes "
+                      f"({razao:6.1%})  {cpu_ms:8.2f} ms de CPU")
+
+        resultado["paginas"][nome] = linhas
+
+    saida = args.saida
+    if not saida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        saida = os.path.join(RESULTADOS, datetime.now().strftime("compressao-%Y%m%d-%H%M%S.json"))
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
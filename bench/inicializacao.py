@@ -0,0 +1,210 @@
+# bench/inicializacao.py
+"""
+Mede quanto custa subir um processo do app (worker novo, reinício, script).
+
+Uso:
+    python bench/inicializacao.py
+    python bench/inicializacao.py --repeticoes 9 --comparar bench/resultados/inicializacao-anterior.json
+
+Cada medição roda num processo Python novo, como um worker recém-criado:
+- importacao_db_ms: `import db` (o que create_admin.py e os scripts pagam);
+- importacao_app_ms: `import app`;
+- primeira_resposta_ms: do início do `import app` até a resposta de GET /login;
+- templates: primeira carga de cada template com o cache de bytecode vazio
+  (compilação) e já preenchido (leitura do disco).
+
+Sai com código 1 se algum valor passar dos limites (--max-*), se piorar além
+da tolerância em relação a --comparar, ou se a inicialização importar
+dependências que deveriam ser preguiçosas (requests; dotenv sem .env).
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+import massa
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS = os.path.join(AQUI, "resultados")
+
+# código executado em cada processo novo; imprime um JSON na última linha
+FILHO = r"""
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+modo = {modo!r}
+saida = {{}}
+if modo == "db":
+    t = time.perf_counter()
+    import db
+    saida["ms"] = (time.perf_counter() - t) * 1000
+elif modo == "app":
+    t = time.perf_counter()
+    from app import app
+    saida["importacao_ms"] = (time.perf_counter() - t) * 1000
+    resposta = app.test_client().get("/login")
+    saida["primeira_resposta_ms"] = (time.perf_counter() - t) * 1000
+    saida["status"] = resposta.status_code
+else:
+    from app import app
+    saida["templates"] = {{}}
+    for nome in app.jinja_env.list_templates(extensions=("html",)):
+        t = time.perf_counter()
+        app.jinja_env.get_template(nome)
+        saida["templates"][nome] = (time.perf_counter() - t) * 1000
+saida["modulos"] = sorted(m for m in ("requests", "dotenv", "multiprocessing") if m in sys.modules)
+print(json.dumps(saida))
+"""
+
+
+def _rodar(modo, ambiente):
+    saida = subprocess.run(
+        [sys.executable, "-c", FILHO.format(raiz=massa.RAIZ, modo=modo)],
+        env=ambiente, cwd=massa.RAIZ, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def _mediana(valores):
+    return round(statistics.median(valores), 2)
+
+
+def medir(repeticoes, ambiente, cache_dir):
+    db_ms, import_ms, resposta_ms, modulos = [], [], [], set()
+    frio, quente = {}, {}
+
+    for _ in range(repeticoes):
+        r = _rodar("db", ambiente)
+        db_ms.append(r["ms"])
+        modulos.update(f"db:{m}" for m in r["modulos"])
+
+        r = _rodar("app", ambiente)
+        if r["status"] != 200:
+            raise RuntimeError(f"GET /login respondeu {r['status']}")
+        import_ms.append(r["importacao_ms"])
+        resposta_ms.append(r["primeira_resposta_ms"])
+        modulos.update(f"app:{m}" for m in r["modulos"])
+
+        # cache vazio: o primeiro processo compila e grava; o segundo só lê
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        for destino in (frio, quente):
+            for nome, ms in _rodar("templates", ambiente)["templates"].items():
+                destino.setdefault(nome, []).append(ms)
+
+    templates = {
+        nome: {"compilacao_ms": _mediana(frio[nome]), "cache_ms": _mediana(quente[nome])}
+        for nome in sorted(frio)
+    }
+    return {
+        "importacao_db_ms": _mediana(db_ms),
+        "importacao_app_ms": _mediana(import_ms),
+        "primeira_resposta_ms": _mediana(resposta_ms),
+        "templates_compilacao_ms": round(sum(t["compilacao_ms"] for t in templates.values()), 2),
+        "templates_cache_ms": round(sum(t["cache_ms"] for t in templates.values()), 2),
+        "templates": templates,
+        "modulos_carregados": sorted(modulos),
+    }
+
+
+METRICAS = ("importacao_db_ms", "importacao_app_ms", "primeira_resposta_ms",
+            "templates_compilacao_ms", "templates_cache_ms")
+
+
+def verificar(resultado, limites, anterior, tolerancia, com_env):
+    """Devolve a lista de problemas (limites estourados, regressões, imports indevidos)."""
+    problemas = []
+    for nome, limite in limites.items():
+        if limite and resultado[nome] > limite:
+            problemas.append(f"{nome}: {resultado[nome]}ms > limite {limite}ms")
+
+    proibidos = {"db:requests", "app:requests", "db:multiprocessing"}
+    if not com_env:
+        proibidos |= {"db:dotenv", "app:dotenv"}
+    for m in sorted(proibidos & set(resultado["modulos_carregados"])):
+        problemas.append(f"importação preguiçosa quebrada: {m}")
+
+    if anterior:
+        base = anterior.get("resultado", {})
+        for nome in METRICAS:
+            if base.get(nome) and resultado[nome] > base[nome] * (1 + tolerancia):
+                problemas.append(f"{nome}: {base[nome]}ms -> {resultado[nome]}ms")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do Wayne Security Tools")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--max-importacao-db-ms", type=float, default=60)
+    parser.add_argument("--max-importacao-app-ms", type=float, default=400)
+    parser.add_argument("--max-primeira-resposta-ms", type=float, default=600)
+    parser.add_argument("--max-templates-cache-ms", type=float, default=25,
+                        help="soma da carga de todos os templates com o cache de bytecode pronto")
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    parser.add_argument("--comparar", help="resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    temp = tempfile.mkdtemp(prefix="wayne-inicializacao-")
+    cache_dir = os.path.join(temp, "jinja")
+    ambiente = dict(os.environ)
+    ambiente.update({
+        "WAYNE_DB_BACKEND": "sqlite",
+        "WAYNE_SQLITE_PATH": os.path.join(temp, "inicializacao.db"),
+        "WAYNE_JINJA_CACHE_DIR": cache_dir,
+    })
+    com_env = os.path.exists(os.path.join(massa.RAIZ, ".env"))
+
+    try:
+        _rodar("app", ambiente)  # cria o banco fora da medição
+        res = medir(args.repeticoes, ambiente, cache_dir)
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+
+    for nome in METRICAS:
+        print(f"{nome:26} {res[nome]:>9.2f} ms")
+    for nome, t in res["templates"].items():
+        print(f"  {nome:28} compilação {t['compilacao_ms']:>7.2f} ms   cache {t['cache_ms']:>6.2f} ms")
+    print("módulos opcionais carregados:", ", ".join(res["modulos_carregados"]) or "nenhum")
+
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": massa.commit_atual(),
+            "python": sys.version.split()[0],
+            "repeticoes": args.repeticoes,
+        },
+        "resultado": res,
+    }
+    saida = args.saida
+    if not saida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        saida = os.path.join(RESULTADOS, datetime.now().strftime("inicializacao-%Y%m%d-%H%M%S.json"))
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {saida}")
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+    limites = {
+        "importacao_db_ms": args.max_importacao_db_ms,
+        "importacao_app_ms": args.max_importacao_app_ms,
+        "primeira_resposta_ms": args.max_primeira_resposta_ms,
+        "templates_cache_ms": args.max_templates_cache_ms,
+    }
+    problemas = verificar(res, limites, anterior, args.tolerancia, com_env)
+    if problemas:
+        print("REGRESSÕES DETECTADAS:")
+        for p in problemas:
+            print(f"  - {p}")
+        sys.exit(1)
+    print("Inicialização dentro do orçamento.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# bench/massa.py
+"""
+Gera uma massa de dados reproduzível no backend SQLite para os benchmarks.
+
+O banco gerado fica ao lado de um arquivo <banco>.json com os parâmetros
+usados; se os parâmetros forem os mesmos, a massa é reaproveitada.
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SENHA_BENCH = "bench123"
+USUARIOS_BENCH = (
+    ("Bench Admin", "bench_admin", "admin"),
+    ("Bench Gerente", "bench_gerente", "gerente"),
+    ("Bench Funcionário", "bench_func", "funcionario"),
+)
+
+LOTE = 10000
+LOCAIS = ("Gotham Centro", "Ala Oeste", "Depósito 3", "Batcaverna", "Torre Wayne", "Porto de Gotham")
+STATUS_RECURSO = ("ativo", "inativo", "manutencao")
+STATUS_SOLICITACAO = ("aprovado", "aprovado", "rejeitado", "pendente", "aprovado_gerente")
+ACOES = ("login", "logout", "criou recurso", "editou recurso", "solicitou baixa", "entrada estoque", "aprovou baixa")
+
+
+def commit_atual():
+    """Hash curto do commit do repositório, para registrar nos resultados (None fora do git)."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def usar_sqlite(caminho):
+    """Aponta o db.py para o arquivo SQLite do benchmark (antes de importar o app)."""
+    os.environ["WAYNE_DB_BACKEND"] = "sqlite"
+    os.environ["WAYNE_SQLITE_PATH"] = os.path.abspath(caminho)
+    # o bench dispara centenas de logins e requisições por segundo do mesmo
+    # IP; com os limites de login/unsplash ligados, tudo viraria 429
+    os.environ["WAYNE_RATE_LIMIT"] = "0"
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _em_lotes(gerador, tamanho=LOTE):
+    lote = []
+    for item in gerador:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def popular(caminho, recursos=50000, solicitacoes=500000, logs=5000000, semente=42, log=print):
+    """
+    Cria (ou reaproveita) o banco em `caminho` com a massa pedida.
+    Devolve o dicionário de parâmetros gravado no arquivo .json.
+    """
+    params = {
+        "recursos": recursos,
+        "solicitacoes": solicitacoes,
+        "logs": logs,
+        "semente": semente,
+    }
+    meta_path = caminho + ".json"
+    if os.path.exists(caminho) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            if json.load(f) == params:
+                log(f"Reaproveitando massa existente em {caminho}")
+                return params
+
+    for sufixo in ("", "-wal", "-shm", ".json"):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+    usar_sqlite(caminho)
+    from db import get_connection
+    from werkzeug.security import generate_password_hash
+
+    rnd = random.Random(semente)
+    agora = datetime.now().replace(microsecond=0)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, name FROM roles")
+    papeis = {nome: id_ for id_, nome in cursor.fetchall()}
+    cursor.execute("SELECT id FROM resource_types")
+    tipos = [row[0] for row in cursor.fetchall()]
+
+    senha_hash = generate_password_hash(SENHA_BENCH)
+    cursor.executemany(
+        "INSERT INTO users (name, username, password_hash, role_id, approved) VALUES (%s, %s, %s, %s, 1)",
+        [(nome, usuario, senha_hash, papeis[papel]) for nome, usuario, papel in USUARIOS_BENCH],
+    )
+    cursor.execute("SELECT id FROM users")
+    usuarios = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+
+    log(f"Gerando {recursos} recursos...")
+
+    def gerar_recursos():
+        for i in range(recursos):
+            criado = agora - timedelta(seconds=rnd.randint(0, 365 * 86400))
+            yield (
+                f"Recurso {i + 1}",
+                f"Descrição do recurso {i + 1}",
+                rnd.choice(tipos),
+                rnd.choice(LOCAIS),
+                rnd.choice(STATUS_RECURSO),
+                round(rnd.uniform(10, 25000), 2),
+                rnd.randint(0, 500),
+                criado,
+            )
+
+    for lote in _em_lotes(gerar_recursos()):
+        cursor.executemany(
+            """
+            INSERT INTO resources (name, description, type_id, location, status, price, quantity, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            lote,
+        )
+        conn.commit()
+
+    log(f"Gerando {solicitacoes} solicitações de baixa...")
+
+    def gerar_solicitacoes():
+        for _ in range(solicitacoes):
+            qtd = rnd.randint(1, 5)
+            status = rnd.choice(STATUS_SOLICITACAO)
+            yield (
+                rnd.randint(1, recursos),
+                rnd.choice(usuarios),
+                qtd,
+                round(qtd * rnd.uniform(10, 2000), 2),
+                status,
+                agora - timedelta(seconds=rnd.randint(0, 365 * 86400)),
+            )
+
+    if recursos:
+        for lote in _em_lotes(gerar_solicitacoes()):
+            cursor.executemany(
+                """
+                INSERT INTO resource_requests (resource_id, requested_by, quantity, total_value, status, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                lote,
+            )
+            conn.commit()
+
+    log(f"Gerando {logs} logs de acesso...")
+
+    def gerar_logs():
+        for i in range(logs):
+            yield (
+                rnd.choice(usuarios),
+                rnd.choice(ACOES),
+                f"Registro sintético {i + 1}",
+                agora - timedelta(seconds=rnd.randint(0, 365 * 86400)),
+            )
+
+    for lote in _em_lotes(gerar_logs()):
+        cursor.executemany(
+            "INSERT INTO access_logs (user_id, action, details, created_at) VALUES (%s, %s, %s, %s)",
+            lote,
+        )
+        conn.commit()
+
+    cursor.execute("ANALYZE")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return params
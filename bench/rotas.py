@@ -0,0 +1,281 @@
+# bench/rotas.py
+"""
+Benchmark de carga das rotas principais, rodando o app em processo
+(test client do Flask) sobre o backend SQLite.
+
+Uso:
+    python bench/rotas.py --recursos 50000 --solicitacoes 500000 --logs 5000000
+    python bench/rotas.py --iteracoes 50 --threads 4 --comparar bench/resultados/anterior.json
+
+Para cada endpoint mede vazão (req/s), latência p50/p95/p99 e consultas
+ao banco por requisição. O resultado é salvo em JSON em bench/resultados/.
+Com --comparar, sai com código 1 se algum endpoint regredir além da tolerância.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import massa
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS = os.path.join(AQUI, "resultados")
+
+TERMOS_UNSPLASH = ("batmovel", "camera tatica", "sensor movimento", "drone noturno", "cinto utilidades",
+                   "radar portatil", "visor termico", "gancho retratil")
+
+
+# ===== Servidor falso do Unsplash =====
+class _UnsplashFalso(BaseHTTPRequestHandler):
+    def do_GET(self):
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        corpo = json.dumps({
+            "results": [{
+                "urls": {"regular": f"{base}/foto.jpg"},
+                "user": {"name": "Fotógrafo Bench", "links": {"html": f"{base}/@bench"}},
+                "links": {"html": f"{base}/photos/1", "download_location": f"{base}/photos/1/download"},
+            }]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_unsplash_falso():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _UnsplashFalso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+# ======================================
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+class Contador:
+    """Conta consultas ao banco por thread, via observador do db.py."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def __call__(self, evento, sql, duracao, n_params):
+        if evento == "execute":
+            self._local.total = getattr(self._local, "total", 0) + 1
+
+    def zerar(self):
+        self._local.total = 0
+
+    def valor(self):
+        return getattr(self._local, "total", 0)
+
+
+def _login(client, usuario):
+    resp = client.post("/login", data={"username": usuario, "password": massa.SENHA_BENCH})
+    if resp.status_code != 302:
+        raise RuntimeError(f"Login de {usuario} falhou ({resp.status_code})")
+
+
+def _pendentes_para_aprovar(limite):
+    from db import get_connection
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id FROM resource_requests
+        WHERE status = 'pendente' AND total_value <= 10000
+        ORDER BY id
+        LIMIT %s
+    """, (limite,))
+    ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return ids
+
+
+def montar_cenarios(iteracoes, threads, total_recursos):
+    """
+    Cada cenário: (nome, usuário, função que recebe (client, i) e devolve a resposta).
+    """
+    total = iteracoes * threads
+    aprovaveis = _pendentes_para_aprovar(total)
+    lock = threading.Lock()
+
+    def proximo_pendente():
+        with lock:
+            return aprovaveis.pop() if aprovaveis else None
+
+    def aprovar(client, i):
+        req_id = proximo_pendente()
+        if req_id is None:
+            return None
+        return client.post(f"/baixas/{req_id}/aprovar")
+
+    def recurso(i):
+        return (i * 7919) % max(total_recursos, 1) + 1
+
+    return [
+        ("login", "bench_func",
+         lambda c, i: c.post("/login", data={"username": "bench_func", "password": massa.SENHA_BENCH})),
+        ("dashboard", "bench_gerente", lambda c, i: c.get("/dashboard")),
+        ("recursos", "bench_gerente", lambda c, i: c.get("/recursos")),
+        ("baixas", "bench_gerente", lambda c, i: c.get("/baixas")),
+        ("aprovacao", "bench_gerente", aprovar),
+        ("entrada", "bench_func",
+         lambda c, i: c.post(f"/recursos/{recurso(i)}/entrada", data={"quantity": "1"})),
+        ("unsplash_suggest", "bench_func",
+         lambda c, i: c.get("/api/unsplash_suggest", query_string={
+             "q": f"{TERMOS_UNSPLASH[i % len(TERMOS_UNSPLASH)]} {i // len(TERMOS_UNSPLASH)}"})),
+    ]
+
+
+def medir(app, contador, nome, usuario, acao, iteracoes, threads):
+    latencias = []
+    consultas = []
+    erros = [0]
+    lock = threading.Lock()
+
+    def trabalhador(offset):
+        client = app.test_client()
+        _login(client, usuario)
+        for i in range(offset, offset + iteracoes):
+            contador.zerar()
+            inicio = time.perf_counter()
+            resp = acao(client, i)
+            dur = time.perf_counter() - inicio
+            if resp is None:
+                continue
+            _ = resp.data
+            with lock:
+                latencias.append(dur)
+                consultas.append(contador.valor())
+                if resp.status_code >= 400:
+                    erros[0] += 1
+
+    inicio = time.perf_counter()
+    ts = [threading.Thread(target=trabalhador, args=(t * iteracoes,)) for t in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    n = len(latencias)
+    return {
+        "requisicoes": n,
+        "erros": erros[0],
+        "vazao_rps": round(n / total, 2) if total else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "consultas_por_req": round(sum(consultas) / n, 2) if n else 0.0,
+    }
+
+
+def comparar(atual, anterior, tolerancia):
+    """Devolve a lista de regressões de `atual` em relação a `anterior`."""
+    regressoes = []
+    for nome, res in atual["endpoints"].items():
+        base = anterior.get("endpoints", {}).get(nome)
+        if not base or not base.get("requisicoes"):
+            continue
+        if res["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+            regressoes.append(f"{nome}: p95 {base['p95_ms']}ms -> {res['p95_ms']}ms")
+        if res["vazao_rps"] < base["vazao_rps"] * (1 - tolerancia):
+            regressoes.append(f"{nome}: vazão {base['vazao_rps']} -> {res['vazao_rps']} req/s")
+        if res["consultas_por_req"] > base["consultas_por_req"]:
+            regressoes.append(f"{nome}: consultas/req {base['consultas_por_req']} -> {res['consultas_por_req']}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga das rotas do Wayne Security Tools")
+    parser.add_argument("--banco", default=os.path.join(AQUI, "bench.db"))
+    parser.add_argument("--recursos", type=int, default=50000)
+    parser.add_argument("--solicitacoes", type=int, default=500000)
+    parser.add_argument("--logs", type=int, default=5000000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--iteracoes", type=int, default=20, help="requisições por thread e endpoint")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--endpoints", help="lista separada por vírgula (padrão: todos)")
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    parser.add_argument("--comparar", help="resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    massa.usar_sqlite(args.banco)
+    dataset = massa.popular(args.banco, args.recursos, args.solicitacoes, args.logs, args.semente)
+
+    unsplash = iniciar_unsplash_falso()
+    os.environ["UNSPLASH_API_URL"] = f"http://127.0.0.1:{unsplash.server_port}"
+    os.environ["UNSPLASH_ACCESS_KEY"] = "bench"
+
+    import db
+    from app import app
+
+    contador = Contador()
+    db.adicionar_observador(contador)
+
+    escolhidos = set(args.endpoints.split(",")) if args.endpoints else None
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": massa.commit_atual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "backend": "sqlite",
+            "massa": dataset,
+            "iteracoes": args.iteracoes,
+            "threads": args.threads,
+        },
+        "endpoints": {},
+    }
+
+    for nome, usuario, acao in montar_cenarios(args.iteracoes, args.threads, args.recursos):
+        if escolhidos and nome not in escolhidos:
+            continue
+        res = medir(app, contador, nome, usuario, acao, args.iteracoes, args.threads)
+        resultado["endpoints"][nome] = res
+        print(f"{nome:18} {res['vazao_rps']:>9.2f} req/s  p50 {res['p50_ms']:>9.2f}ms  "
+              f"p95 {res['p95_ms']:>9.2f}ms  p99 {res['p99_ms']:>9.2f}ms  "
+              f"{res['consultas_por_req']:>5} consultas/req  {res['erros']} erros")
+
+    unsplash.shutdown()
+
+    saida = args.saida
+    if not saida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        saida = os.path.join(RESULTADOS, datetime.now().strftime("rotas-%Y%m%d-%H%M%S.json"))
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        regressoes = comparar(resultado, anterior, args.tolerancia)
+        if regressoes:
+            print("REGRESSÕES DETECTADAS:")
+            for r in regressoes:
+                print(f"  - {r}")
+            sys.exit(1)
+        print("Nenhuma regressão em relação a", args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# bench/servidor.py
+"""
+Compara a vazão do servidor de desenvolvimento (`python app.py`) com o
+servidor de produção pré-forkado (servidor.py), por HTTP de verdade.
+
+Cada servidor sobe num subprocesso sobre a massa SQLite do benchmark; a
+carga vem de vários processos clientes (para o gerador de carga não ser o
+gargalo), cada um com algumas conexões keep-alive logadas como gerente.
+
+Uso:
+    python bench/servidor.py --workers 4 --threads 8 --clientes 4 --conexoes 8 --duracao 15
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import massa
+from rotas import percentil
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS = os.path.join(AQUI, "resultados")
+
+ENDPOINTS = (
+    ("login_pagina", "/login"),
+    ("dashboard", "/dashboard"),
+    ("api_recursos", "/api/recursos?por_pagina=50"),
+    ("baixas", "/baixas"),
+)
+
+DEV = "import sys; sys.path.insert(0, {raiz!r}); from app import app; " \
+      "app.run(host='127.0.0.1', port={porta}, debug=True, use_reloader=False)"
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _subir(modo, porta, args):
+    if modo == "dev":
+        cmd = [sys.executable, "-c", DEV.format(raiz=massa.RAIZ, porta=porta)]
+    else:
+        cmd = [sys.executable, os.path.join(massa.RAIZ, "servidor.py"), "--bind", f"127.0.0.1:{porta}",
+               "--workers", str(args.workers), "--threads", str(args.threads)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    import requests
+    prazo = time.monotonic() + 30
+    while time.monotonic() < prazo:
+        try:
+            if requests.get(f"http://127.0.0.1:{porta}/login", timeout=1).status_code == 200:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"servidor {modo} não respondeu na porta {porta}")
+
+
+def _parar(proc):
+    proc.send_signal(signal.SIGTERM if hasattr(signal, "SIGTERM") else signal.SIGINT)
+    try:
+        proc.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def _cliente(url_base, caminho, conexoes, duracao):
+    """Processo cliente: `conexoes` threads fazendo GET em laço por `duracao` s."""
+    import requests
+
+    latencias = []
+    erros = [0]
+    lock = threading.Lock()
+    fim = time.monotonic() + duracao
+
+    def conexao():
+        s = requests.Session()
+        s.post(f"{url_base}/login", data={"username": "bench_gerente", "password": massa.SENHA_BENCH},
+               allow_redirects=False)
+        locais = []
+        falhas = 0
+        while time.monotonic() < fim:
+            inicio = time.perf_counter()
+            try:
+                r = s.get(url_base + caminho, allow_redirects=False)
+                if r.status_code >= 400:
+                    falhas += 1
+            except requests.RequestException:
+                falhas += 1
+                continue
+            locais.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    ts = [threading.Thread(target=conexao) for _ in range(conexoes)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return latencias, erros[0]
+
+
+def medir(url_base, caminho, args):
+    with ProcessPoolExecutor(max_workers=args.clientes) as ex:
+        futuros = [ex.submit(_cliente, url_base, caminho, args.conexoes, args.duracao)
+                   for _ in range(args.clientes)]
+        latencias, erros = [], 0
+        for f in futuros:
+            lat, err = f.result()
+            latencias.extend(lat)
+            erros += err
+    n = len(latencias)
+    return {
+        "requisicoes": n,
+        "erros": erros,
+        "vazao_rps": round(n / args.duracao, 2),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de desenvolvimento x servidor.py")
+    parser.add_argument("--banco", default=os.path.join(AQUI, "bench.db"))
+    parser.add_argument("--recursos", type=int, default=50000)
+    parser.add_argument("--solicitacoes", type=int, default=500000)
+    parser.add_argument("--logs", type=int, default=5000000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--clientes", type=int, default=4, help="processos geradores de carga")
+    parser.add_argument("--conexoes", type=int, default=8, help="conexões por processo cliente")
+    parser.add_argument("--duracao", type=float, default=10, help="segundos por endpoint")
+    parser.add_argument("--endpoints", help="lista separada por vírgula (padrão: todos)")
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    massa.usar_sqlite(args.banco)
+    dataset = massa.popular(args.banco, args.recursos, args.solicitacoes, args.logs, args.semente)
+    os.environ["WAYNE_QUERY_LOG"] = "off"
+
+    escolhidos = set(args.endpoints.split(",")) if args.endpoints else None
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "massa": dataset,
+            "workers": args.workers,
+            "threads": args.threads,
+            "clientes": args.clientes,
+            "conexoes": args.conexoes,
+            "duracao": args.duracao,
+        },
+        "servidores": {},
+    }
+
+    for modo in ("dev", "servidor"):
+        porta = _porta_livre()
+        proc = _subir(modo, porta, args)
+        print(f"\n== {modo} ==")
+        try:
+            linhas = {}
+            for nome, caminho in ENDPOINTS:
+                if escolhidos and nome not in escolhidos:
+                    continue
+                res = medir(f"http://127.0.0.1:{porta}", caminho, args)
+                linhas[nome] = res
+                print(f"{nome:14} {res['vazao_rps']:>9.2f} req/s  p50 {res['p50_ms']:>8.2f}ms  "
+                      f"p95 {res['p95_ms']:>8.2f}ms  p99 {res['p99_ms']:>8.2f}ms  {res['erros']} erros")
+            resultado["servidores"][modo] = linhas
+        finally:
+            _parar(proc)
+
+    print("\nGanho de vazão (servidor.py / dev):")
+    for nome, res in resultado["servidores"]["servidor"].items():
+        base = resultado["servidores"]["dev"][nome]["vazao_rps"]
+        print(f"  {nome:14} {res['vazao_rps'] / base if base else 0:6.2f}x")
+
+    saida = args.saida
+    if not saida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        saida = os.path.join(RESULTADOS, datetime.now().strftime("servidor-%Y%m%d-%H%M%S.json"))
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
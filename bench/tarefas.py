@@ -0,0 +1,223 @@
+# bench/tarefas.py
+"""
+Memória e vazão das tarefas do Exercicios/exercicio06.py: o registro
+Tarefa (__slots__, prioridade e categoria internadas) contra o dicionário
+de seis chaves usado antes, e a importação/exportação em lote.
+
+Uso:
+    python bench/tarefas.py --tarefas 200000
+    python bench/tarefas.py --tarefas 1000000 --comparar bench/resultados/tarefas-AAAAMMDD-HHMMSS.json
+
+Medições:
+- registros: bytes por tarefa (tracemalloc, incluindo as strings) e tarefas/s
+  para criar N dicionários e N objetos Tarefa a partir dos mesmos campos,
+  como se viessem de um arquivo (cada linha com strings novas);
+- importacao_csv / importacao_jsonl: RepositorioTarefas.importar() de um
+  arquivo com N tarefas, sem diário e com diário;
+- exportacao_csv / exportacao_jsonl: RepositorioTarefas.exportar().
+
+Sai com código 1 se a Tarefa não economizar --economia-minima da memória do
+dicionário, ou se piorar além da tolerância em relação a --comparar.
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(AQUI)
+RESULTADOS = os.path.join(AQUI, "resultados")
+sys.path.insert(0, os.path.join(RAIZ, "Exercicios"))
+
+import exercicio06  # noqa: E402
+import massa  # noqa: E402
+
+CATEGORIAS = 50
+
+
+def _campos(n):
+    """Campos de cada tarefa; "".join força strings novas, como as lidas de um arquivo."""
+    prioridades = exercicio06.PRIORIDADES
+    for i in range(n):
+        yield (i + 1, f"Tarefa {i}", f"Descrição da tarefa {i}",
+               "".join(prioridades[i % 3]), "".join(f"categoria-{i % CATEGORIAS}"), i % 4 == 0)
+
+
+def _como_dict(i, nome, descricao, prioridade, categoria, concluida):
+    return {
+        "id": i,
+        "nome": nome,
+        "descricao": descricao,
+        "prioridade": prioridade,
+        "categoria": categoria,
+        "concluida": concluida
+    }
+
+
+def _cronometrar(funcao):
+    gc.collect()
+    inicio = time.perf_counter()
+    valor = funcao()
+    return valor, time.perf_counter() - inicio
+
+
+def _memoria(funcao):
+    """Bytes ainda alocados pelo que funcao() devolveu (o tracemalloc deixa tudo lento: medido à parte)."""
+    gc.collect()
+    tracemalloc.start()
+    valor = funcao()
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del valor
+    return memoria
+
+
+def medir_registros(n):
+    resultado = {}
+    for nome, fabrica in (("dict", _como_dict), ("tarefa", exercicio06.Tarefa)):
+        def criar():
+            return [fabrica(*campos) for campos in _campos(n)]
+        itens, duracao = _cronometrar(criar)
+        del itens
+        resultado[nome] = {
+            "bytes_por_tarefa": round(_memoria(criar) / n, 1),
+            "tarefas_por_segundo": round(n / duracao),
+        }
+    return resultado
+
+
+def _gerar_arquivo(caminho, n):
+    with open(caminho, "w", encoding="utf-8", newline="") as f:
+        if caminho.endswith(".csv"):
+            escritor = csv.writer(f)
+            escritor.writerow(exercicio06.CAMPOS)
+            escritor.writerows((i, nome, desc, p, c, int(ok)) for i, nome, desc, p, c, ok in _campos(n))
+        else:
+            for campos in _campos(n):
+                f.write(json.dumps(dict(zip(exercicio06.CAMPOS, campos)), ensure_ascii=False) + "\n")
+
+
+def medir_arquivos(n, pasta):
+    resultado = {}
+    for formato in ("csv", "jsonl"):
+        origem = os.path.join(pasta, f"origem.{formato}")
+        _gerar_arquivo(origem, n)
+
+        def importar_sem_diario():
+            repo = exercicio06.RepositorioTarefas()
+            repo.importar(origem)
+            return repo
+
+        for diario in (False, True):
+            caminho_diario = os.path.join(pasta, f"diario-{formato}.jsonl") if diario else None
+
+            def importar():
+                repo = exercicio06.RepositorioTarefas(caminho_diario)
+                repo.importar(origem)
+                return repo
+            repo, duracao = _cronometrar(importar)
+            if len(repo) != n:
+                raise RuntimeError(f"{formato}: {len(repo)} de {n} tarefas importadas")
+            nome = f"importacao_{formato}" + ("_com_diario" if diario else "")
+            resultado[nome] = {
+                "tarefas_por_segundo": round(n / duracao),
+                "segundos": round(duracao, 3),
+            }
+            if diario:
+                repo.fechar()
+                reaberto, duracao = _cronometrar(lambda: exercicio06.RepositorioTarefas(caminho_diario))
+                resultado[f"reabertura_{formato}"] = {
+                    "tarefas_por_segundo": round(len(reaberto) / duracao),
+                    "segundos": round(duracao, 3),
+                }
+                reaberto.fechar()
+                continue
+
+            destino = os.path.join(pasta, f"exportado.{formato}")
+            _, duracao = _cronometrar(lambda r=repo: r.exportar(destino))
+            resultado[f"exportacao_{formato}"] = {
+                "tarefas_por_segundo": round(n / duracao),
+                "segundos": round(duracao, 3),
+            }
+            repo = None  # solta o repositório antes de medir a memória
+            # memória do repositório inteiro (registros + índices) depois de importar
+            resultado[nome]["bytes_por_tarefa"] = round(_memoria(importar_sem_diario) / n, 1)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória e importação das tarefas do exercicio06")
+    parser.add_argument("--tarefas", type=int, default=200000)
+    parser.add_argument("--economia-minima", type=float, default=0.25,
+                        help="fração mínima de memória que a Tarefa economiza em relação ao dict")
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    parser.add_argument("--comparar", help="resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.3)
+    args = parser.parse_args()
+
+    registros = medir_registros(args.tarefas)
+    for nome, r in registros.items():
+        print(f"{nome:24} {r['bytes_por_tarefa']:>8.1f} bytes/tarefa  {r['tarefas_por_segundo']:>10} tarefas/s")
+    economia = 1 - registros["tarefa"]["bytes_por_tarefa"] / registros["dict"]["bytes_por_tarefa"]
+    print(f"economia da Tarefa: {economia:.0%}")
+
+    with tempfile.TemporaryDirectory(prefix="wayne-tarefas-") as pasta:
+        arquivos = medir_arquivos(args.tarefas, pasta)
+    for nome, r in arquivos.items():
+        extra = f"  {r['bytes_por_tarefa']:>8.1f} bytes/tarefa" if "bytes_por_tarefa" in r else ""
+        print(f"{nome:24} {r['tarefas_por_segundo']:>10} tarefas/s  {r['segundos']:>7.3f}s{extra}")
+
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": massa.commit_atual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "tarefas": args.tarefas,
+        },
+        "registros": registros,
+        "economia": round(economia, 3),
+        "arquivos": arquivos,
+    }
+    saida = args.saida
+    if not saida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        saida = os.path.join(RESULTADOS, datetime.now().strftime("tarefas-%Y%m%d-%H%M%S.json"))
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {saida}")
+
+    problemas = []
+    if economia < args.economia_minima:
+        problemas.append(f"Tarefa economiza só {economia:.0%} (mínimo {args.economia_minima:.0%})")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        atuais = {"registro_tarefa": registros["tarefa"], **arquivos}
+        bases = {"registro_tarefa": anterior.get("registros", {}).get("tarefa"), **anterior.get("arquivos", {})}
+        for nome, r in atuais.items():
+            base = bases.get(nome)
+            if not base:
+                continue
+            if r["tarefas_por_segundo"] < base["tarefas_por_segundo"] * (1 - args.tolerancia):
+                problemas.append(f"{nome}: {base['tarefas_por_segundo']} -> {r['tarefas_por_segundo']} tarefas/s")
+            if "bytes_por_tarefa" in r and r["bytes_por_tarefa"] > base["bytes_por_tarefa"] * 1.05:
+                problemas.append(f"{nome}: {base['bytes_por_tarefa']} -> {r['bytes_por_tarefa']} bytes/tarefa")
+
+    if problemas:
+        print("REGRESSÕES DETECTADAS:")
+        for p in problemas:
+            print(f"  - {p}")
+        sys.exit(1)
+    print("Nenhuma regressão.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# bench/transferencias.py
+"""
+Vazão de transferências do livro de contas do Exercicios/exercicio13.py
+com várias threads, conferindo que nenhum centavo some ou aparece.
+
+Uso:
+    python bench/transferencias.py --contas 1000 --transferencias 200000 --threads 1,4,8
+    python bench/transferencias.py --comparar bench/resultados/transferencias-AAAAMMDD-HHMMSS.json
+
+Para cada número de threads, um livro novo com --contas contas de --saldo
+cada recebe --transferencias transferências aleatórias (divididas entre as
+threads, valores de 0,01 a 2x o saldo inicial, então parte falha por saldo
+insuficiente). No fim:
+- a soma dos saldos tem de ser igual à soma inicial;
+- o saldo de cada conta tem de ser igual ao recalculado a partir do log;
+- o log tem de ter uma entrada por abertura e por transferência aceita.
+
+Sai com código 1 se alguma conferência falhar, ou se a vazão cair além da
+tolerância em relação a --comparar.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(AQUI)
+RESULTADOS = os.path.join(AQUI, "resultados")
+sys.path.insert(0, os.path.join(RAIZ, "Exercicios"))
+
+import exercicio13  # noqa: E402
+import massa  # noqa: E402
+
+
+def _plano(contas, quantidade, saldo, semente):
+    """Transferências (origem, destino, valor) de uma thread, geradas antes de medir."""
+    aleatorio = random.Random(semente)
+    maximo = int(saldo * 200)  # em centavos: até 2x o saldo inicial
+    plano = []
+    for _ in range(quantidade):
+        origem, destino = aleatorio.sample(range(1, contas + 1), 2)
+        plano.append((origem, destino, Decimal(aleatorio.randint(1, maximo)) / 100))
+    return plano
+
+
+def medir(threads, args):
+    livro = exercicio13.Livro()
+    for i in range(args.contas):
+        livro.abrir_conta(f"Titular {i}", args.saldo)
+    inicial = livro.total()
+
+    por_thread = args.transferencias // threads
+    planos = [_plano(args.contas, por_thread, args.saldo, args.semente + i) for i in range(threads)]
+    aceitas = [0] * threads
+    largada = threading.Barrier(threads + 1)
+
+    def trabalhar(indice):
+        transferir = livro.transferir
+        ok = 0
+        largada.wait()
+        for origem, destino, valor in planos[indice]:
+            try:
+                transferir(origem, destino, valor)
+                ok += 1
+            except exercicio13.SaldoInsuficiente:
+                pass
+        aceitas[indice] = ok
+
+    trabalhadores = [threading.Thread(target=trabalhar, args=(i,)) for i in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    largada.wait()
+    inicio = time.perf_counter()
+    for t in trabalhadores:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    problemas = []
+    final = livro.total()
+    if final != inicial:
+        problemas.append(f"{threads} thread(s): total {inicial} -> {final}")
+    pelo_log = livro.saldos_pelo_log()
+    divergentes = [n for n in range(1, args.contas + 1) if livro.conta(n).saldo != pelo_log.get(n)]
+    if divergentes:
+        problemas.append(f"{threads} thread(s): {len(divergentes)} conta(s) diferentes do log")
+    if len(livro.log) != args.contas + sum(aceitas):
+        problemas.append(f"{threads} thread(s): log com {len(livro.log)} entradas, "
+                         f"esperadas {args.contas + sum(aceitas)}")
+
+    total = por_thread * threads
+    return {
+        "transferencias": total,
+        "aceitas": sum(aceitas),
+        "segundos": round(duracao, 3),
+        "transferencias_por_segundo": round(total / duracao),
+        "total_conservado": final == inicial,
+    }, problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de transferências do exercicio13")
+    parser.add_argument("--contas", type=int, default=1000)
+    parser.add_argument("--saldo", type=int, default=1000, help="saldo inicial de cada conta (R$)")
+    parser.add_argument("--transferencias", type=int, default=200000, help="total, dividido entre as threads")
+    parser.add_argument("--threads", default="1,4,8", help="lista separada por vírgula")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    parser.add_argument("--comparar", help="resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.3)
+    args = parser.parse_args()
+
+    cenarios = {}
+    problemas = []
+    for threads in (int(t) for t in args.threads.split(",")):
+        res, erros = medir(threads, args)
+        cenarios[str(threads)] = res
+        problemas.extend(erros)
+        print(f"{threads:>3} thread(s) {res['transferencias_por_segundo']:>10} transf/s  "
+              f"{res['segundos']:>7.3f}s  {res['aceitas']} aceitas  "
+              f"total {'conservado' if res['total_conservado'] else 'ALTERADO'}")
+
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": massa.commit_atual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "contas": args.contas,
+            "transferencias": args.transferencias,
+        },
+        "threads": cenarios,
+    }
+    saida = args.saida
+    if not saida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        saida = os.path.join(RESULTADOS, datetime.now().strftime("transferencias-%Y%m%d-%H%M%S.json"))
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        for threads, r in cenarios.items():
+            base = anterior.get("threads", {}).get(threads)
+            if base and r["transferencias_por_segundo"] < base["transferencias_por_segundo"] * (1 - args.tolerancia):
+                problemas.append(f"{threads} thread(s): {base['transferencias_por_segundo']} -> "
+                                 f"{r['transferencias_por_segundo']} transf/s")
+
+    if problemas:
+        print("PROBLEMAS DETECTADOS:")
+        for p in problemas:
+            print(f"  - {p}")
+        sys.exit(1)
+    print("Dinheiro conservado e nenhuma regressão.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# bench/vendas_lote.py
+"""
+Compara a vazão de vendas do Exercicios/exercicio14.py: uma venda por vez
+contra BancoDeDados.registrar_vendas_em_lote().
+
+Uso:
+    python bench/vendas_lote.py --vendas 5000 --produtos 200 --lote 1000
+    python bench/vendas_lote.py --comparar bench/resultados/vendas_lote-AAAAMMDD-HHMMSS.json
+
+Cenários (cada um num banco novo em arquivo, com a mesma sequência de vendas):
+- original: o caminho antigo (buscar_produto_por_id, atualizar_quantidade com
+  commit, INSERT e outro commit), com o journal padrão do SQLite;
+- por_venda: registrar_venda(), uma transação por venda, em WAL;
+- lote: registrar_vendas_em_lote() em lotes de --lote vendas.
+
+O estoque final e o número de vendas gravadas têm de ser iguais nos três.
+Sai com código 1 se o lote não for --ganho-minimo vezes mais rápido que o
+caminho original, ou se a vazão cair além da tolerância em relação a --comparar.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(AQUI)
+RESULTADOS = os.path.join(AQUI, "resultados")
+sys.path.insert(0, os.path.join(RAIZ, "Exercicios"))
+
+import exercicio14  # noqa: E402
+import massa  # noqa: E402
+
+
+def _abrir(caminho, produtos, estoque_inicial, pragmas_originais=False):
+    banco = exercicio14.BancoDeDados(caminho)
+    if pragmas_originais:
+        banco.conn.execute("PRAGMA journal_mode = DELETE;")
+        banco.conn.execute("PRAGMA synchronous = FULL;")
+    banco.conn.executemany(
+        "INSERT INTO Produtos (nome, descricao, quantidade, preco) VALUES (?, ?, ?, ?)",
+        [(f"Produto {i}", "", estoque_inicial, 10.0) for i in range(produtos)],
+    )
+    banco.conn.commit()
+    return banco
+
+
+def _venda_original(banco, venda):
+    """O registrar_venda de antes do lote: leitura, UPDATE + commit, INSERT + commit."""
+    produto = banco.buscar_produto_por_id(venda.produto_id)
+    if not produto or venda.quantidade <= 0 or produto.quantidade < venda.quantidade:
+        return
+    banco.atualizar_quantidade(produto.id, produto.quantidade - venda.quantidade)
+    banco.conn.execute(
+        "INSERT INTO Vendas (produto_id, quantidade, data_venda) VALUES (?, ?, ?)",
+        (venda.produto_id, venda.quantidade, venda.data_venda),
+    )
+    banco.conn.commit()
+
+
+def _gerar_vendas(n, produtos, semente):
+    aleatorio = random.Random(semente)
+    data = "2024-01-01 12:00:00"
+    # alguns ids inexistentes e quantidades inválidas para exercitar as falhas
+    return [
+        exercicio14.Venda(
+            produto_id=aleatorio.randint(1, produtos + 2),
+            quantidade=aleatorio.choice((1, 1, 2, 3, 5, 0)),
+            data_venda=data,
+        )
+        for _ in range(n)
+    ]
+
+
+def _estado(banco):
+    estoque = banco.conn.execute("SELECT id, quantidade FROM Produtos ORDER BY id").fetchall()
+    vendas = banco.conn.execute("SELECT COUNT(*) FROM Vendas").fetchone()[0]
+    return estoque, vendas
+
+
+def medir(cenario, vendas, args, pasta):
+    caminho = os.path.join(pasta, f"{cenario}.db")
+    banco = _abrir(caminho, args.produtos, args.estoque, pragmas_originais=cenario == "original")
+    falhas = 0
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if cenario == "lote":
+            for i in range(0, len(vendas), args.lote):
+                falhas += len(banco.registrar_vendas_em_lote(vendas[i:i + args.lote]).falhas)
+        else:
+            registrar = _venda_original if cenario == "original" else exercicio14.BancoDeDados.registrar_venda
+            for venda in vendas:
+                registrar(banco, venda)
+    duracao = time.perf_counter() - inicio
+    estado = _estado(banco)
+    banco.fechar()
+    return {
+        "segundos": round(duracao, 4),
+        "vendas_por_segundo": round(len(vendas) / duracao, 1),
+        "gravadas": estado[1],
+        "falhas": falhas if cenario == "lote" else None,
+    }, estado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de registro de vendas do exercicio14")
+    parser.add_argument("--vendas", type=int, default=5000)
+    parser.add_argument("--produtos", type=int, default=200)
+    parser.add_argument("--estoque", type=int, default=100, help="estoque inicial de cada produto")
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--ganho-minimo", type=float, default=10,
+                        help="quantas vezes o lote tem de ser mais rápido que o original")
+    parser.add_argument("--saida", help="arquivo JSON de resultado")
+    parser.add_argument("--comparar", help="resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.3)
+    args = parser.parse_args()
+
+    vendas = _gerar_vendas(args.vendas, args.produtos, args.semente)
+    cenarios = {}
+    estados = {}
+    with tempfile.TemporaryDirectory(prefix="wayne-vendas-") as pasta:
+        for cenario in ("original", "por_venda", "lote"):
+            cenarios[cenario], estados[cenario] = medir(cenario, vendas, args, pasta)
+            r = cenarios[cenario]
+            print(f"{cenario:10} {r['vendas_por_segundo']:>12.1f} vendas/s  {r['segundos']:>8.3f}s  "
+                  f"{r['gravadas']} gravadas")
+
+    problemas = []
+    if len({repr(e) for e in estados.values()}) != 1:
+        problemas.append("estoque final ou vendas gravadas diferentes entre os cenários")
+    ganhos = {nome: cenarios["lote"]["vendas_por_segundo"] / cenarios[nome]["vendas_por_segundo"]
+              for nome in ("original", "por_venda")}
+    print(f"lote / original: {ganhos['original']:.1f}x   lote / por_venda: {ganhos['por_venda']:.1f}x")
+    if ganhos["original"] < args.ganho_minimo:
+        problemas.append(f"lote só {ganhos['original']:.1f}x mais rápido que o original "
+                         f"(mínimo {args.ganho_minimo}x)")
+
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": massa.commit_atual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "vendas": args.vendas,
+            "produtos": args.produtos,
+            "lote": args.lote,
+        },
+        "cenarios": cenarios,
+        "ganho_lote": {nome: round(g, 1) for nome, g in ganhos.items()},
+    }
+    saida = args.saida
+    if not saida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        saida = os.path.join(RESULTADOS, datetime.now().strftime("vendas_lote-%Y%m%d-%H%M%S.json"))
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        for nome, r in cenarios.items():
+            base = anterior.get("cenarios", {}).get(nome)
+            if base and r["vendas_por_segundo"] < base["vendas_por_segundo"] * (1 - args.tolerancia):
+                problemas.append(f"{nome}: {base['vendas_por_segundo']} -> {r['vendas_por_segundo']} vendas/s")
+
+    if problemas:
+        print("REGRESSÕES DETECTADAS:")
+        for p in problemas:
+            print(f"  - {p}")
+        sys.exit(1)
+    print("Nenhuma regressão.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# compressao.py
+"""
+Compressão das respostas dinâmicas (HTML e JSON).
+
+Usa gzip sempre; brotli e zstd quando os pacotes `brotli` / `zstandard`
+estiverem instalados e o navegador aceitar. Respostas em stream
+(geradores) são comprimidas pedaço a pedaço, com flush a cada pedaço
+para o navegador já ir recebendo o conteúdo.
+
+Configuração (variáveis de ambiente):
+- WAYNE_COMPRESS=0 desliga a compressão.
+- WAYNE_COMPRESS_MIN_SIZE: tamanho mínimo (bytes) para comprimir; padrão 1024.
+- WAYNE_COMPRESS_LEVEL: nível do gzip (1-9); padrão 6.
+- WAYNE_COMPRESS_BR_LEVEL / WAYNE_COMPRESS_ZSTD_LEVEL: níveis do brotli (0-11) e zstd (1-22).
+"""
+import os
+import zlib
+
+from flask import request
+
+import metricas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ATIVO = (os.getenv("WAYNE_COMPRESS") or "1") not in ("0", "off", "false")
+TAMANHO_MINIMO = int(os.getenv("WAYNE_COMPRESS_MIN_SIZE") or 1024)
+NIVEIS = {
+    "gzip": int(os.getenv("WAYNE_COMPRESS_LEVEL") or 6),
+    "br": int(os.getenv("WAYNE_COMPRESS_BR_LEVEL") or 4),
+    "zstd": int(os.getenv("WAYNE_COMPRESS_ZSTD_LEVEL") or 3),
+}
+MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+
+def disponiveis():
+    """Algoritmos suportados neste processo, em ordem de preferência."""
+    algoritmos = []
+    if brotli is not None:
+        algoritmos.append("br")
+    if zstandard is not None:
+        algoritmos.append("zstd")
+    algoritmos.append("gzip")
+    return algoritmos
+
+
+def _escolher(aceitos):
+    for algoritmo in disponiveis():
+        if algoritmo in aceitos:
+            return algoritmo
+    return None
+
+
+def comprimir(dados, algoritmo, nivel=None):
+    nivel = NIVEIS[algoritmo] if nivel is None else nivel
+    if algoritmo == "br":
+        return brotli.compress(dados, quality=nivel)
+    if algoritmo == "zstd":
+        return zstandard.ZstdCompressor(level=nivel).compress(dados)
+    c = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    return c.compress(dados) + c.flush()
+
+
+class _Compressor:
+    """Interface única de compressão incremental para os três algoritmos."""
+
+    def __init__(self, algoritmo, nivel=None):
+        nivel = NIVEIS[algoritmo] if nivel is None else nivel
+        self.algoritmo = algoritmo
+        if algoritmo == "br":
+            self._c = brotli.Compressor(quality=nivel)
+        elif algoritmo == "zstd":
+            self._c = zstandard.ZstdCompressor(level=nivel).compressobj()
+        else:
+            self._c = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def pedaco(self, dados):
+        if self.algoritmo == "br":
+            return self._c.process(dados) + self._c.flush()
+        if self.algoritmo == "zstd":
+            return self._c.compress(dados) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._c.compress(dados) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def fim(self):
+        if self.algoritmo == "br":
+            return self._c.finish()
+        return self._c.flush()
+
+
+def _stream(iteravel, algoritmo, charset):
+    compressor = _Compressor(algoritmo)
+    entrada = saida = 0
+    try:
+        for pedaco in iteravel:
+            if isinstance(pedaco, str):
+                pedaco = pedaco.encode(charset)
+            if not pedaco:
+                continue
+            entrada += len(pedaco)
+            dados = compressor.pedaco(pedaco)
+            saida += len(dados)
+            yield dados
+        dados = compressor.fim()
+        saida += len(dados)
+        yield dados
+    finally:
+        if hasattr(iteravel, "close"):
+            iteravel.close()
+        metricas.registro.contar("wayne_compression_bytes_total", entrada, algo=algoritmo, direction="in")
+        metricas.registro.contar("wayne_compression_bytes_total", saida, algo=algoritmo, direction="out")
+
+
+def _comprimir_resposta(response):
+    if (
+        response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    algoritmo = _escolher(request.accept_encodings)
+    if not algoritmo:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, algoritmo, "utf-8")
+        response.headers.pop("Content-Length", None)
+    else:
+        dados = response.get_data()
+        if len(dados) < TAMANHO_MINIMO:
+            return response
+        with metricas.medir("compressao"):
+            comprimido = comprimir(dados, algoritmo)
+        metricas.registro.contar("wayne_compression_bytes_total", len(dados), algo=algoritmo, direction="in")
+        metricas.registro.contar("wayne_compression_bytes_total", len(comprimido), algo=algoritmo, direction="out")
+        response.set_data(comprimido)
+
+    response.headers["Content-Encoding"] = algoritmo
+    etag, fraco = response.get_etag()
+    if etag and not fraco:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    if ATIVO:
+        app.after_request(_comprimir_resposta)
@@ -1,11 +1,429 @@
 # db.py
-import mysql.connector
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
 
-def get_connection():
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",          # ajuste conforme seu ambiente
-        password="Fla-2019", # ajuste conforme seu ambiente
-        database="wayne_security"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def carregar_env(override=False):
+    """Lê o .env da raiz, se existir (o python-dotenv só é importado nesse caso)."""
+    caminho = os.path.join(BASE_DIR, ".env")
+    if os.path.exists(caminho):
+        from dotenv import load_dotenv
+        load_dotenv(caminho, override=override)
+
+
+carregar_env()
+
+# ===== Configuração do backend =====
+# WAYNE_DB_BACKEND=mysql (padrão) ou sqlite
+# As credenciais do MySQL vêm do ambiente / .env (veja .env.example).
+DB_BACKEND = (os.getenv("WAYNE_DB_BACKEND") or "mysql").strip().lower()
+SQLITE_PATH = os.getenv("WAYNE_SQLITE_PATH") or os.path.join(BASE_DIR, "wayne_security.db")
+SQLITE_SCHEMA = os.path.join(BASE_DIR, "sql", "sqlite_schema.sql")
+SQLITE_POOL_MAX = int(os.getenv("WAYNE_SQLITE_POOL_MAX") or 8)
+# linhas lidas por fetchmany nas listagens em stream (ConsultaEmLotes)
+LOTE_STREAM = int(os.getenv("WAYNE_STREAM_BATCH") or 500)
+
+# Colunas adicionadas depois da primeira versão do esquema: bancos SQLite
+# já existentes recebem um ALTER TABLE na primeira conexão.
+SQLITE_COLUNAS_NOVAS = (
+    ("resources", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("resource_requests", "decided_at", "TIMESTAMP"),
+    ("access_logs", "entity_type", "TEXT"),
+    ("access_logs", "entity_id", "INTEGER"),
+    ("access_logs", "quantity", "INTEGER"),
+    ("access_logs", "value", "NUMERIC"),
+)
+
+# Pragmas aplicados em toda conexão SQLite nova
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 134217728",
+)
+# ===================================
+
+
+# ===== Observadores de consultas =====
+# Funções chamadas como fn(evento, sql, duracao, n_params) depois de cada
+# "connect", "execute" e "commit". Usado por benchmarks, métricas e pelo
+# log de consultas lentas.
+_observadores = []
+
+
+def adicionar_observador(fn):
+    _observadores.append(fn)
+
+
+def remover_observador(fn):
+    if fn in _observadores:
+        _observadores.remove(fn)
+
+
+def _notificar(evento, sql, inicio, n_params=0):
+    duracao = time.perf_counter() - inicio
+    for fn in _observadores:
+        fn(evento, sql, duracao, n_params)
+# =====================================
+
+
+def _converter_timestamp(valor):
+    texto = valor.decode()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
+        try:
+            return datetime.strptime(texto, fmt)
+        except ValueError:
+            pass
+    return texto
+
+
+# colunas TIMESTAMP voltam como datetime, igual ao mysql.connector
+sqlite3.register_converter("TIMESTAMP", _converter_timestamp)
+sqlite3.register_converter("DATETIME", _converter_timestamp)
+sqlite3.register_adapter(datetime, lambda d: d.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def _traduzir_placeholders(sql):
+    """
+    Converte os placeholders %s (estilo MySQL) para ? (estilo SQLite),
+    ignorando o que estiver dentro de literais entre aspas.
+    """
+    if "%" not in sql:
+        return sql
+
+    saida = []
+    aspas = None
+    i = 0
+    while i < len(sql):
+        c = sql[i]
+        if aspas:
+            saida.append(c)
+            if c == aspas:
+                aspas = None
+        elif c in ("'", '"'):
+            aspas = c
+            saida.append(c)
+        elif c == "%" and i + 1 < len(sql) and sql[i + 1] == "s":
+            saida.append("?")
+            i += 1
+        elif c == "%" and i + 1 < len(sql) and sql[i + 1] == "%":
+            saida.append("%")
+            i += 1
+        else:
+            saida.append(c)
+        i += 1
+    return "".join(saida)
+
+
+class _Cursor:
+    """
+    Cursor que imita a API do mysql.connector usada no app:
+    placeholders %s e cursor(dictionary=True).
+    """
+
+    def __init__(self, raw, dialect, dictionary=False):
+        self._raw = raw
+        self._dialect = dialect
+        self._dictionary = dictionary
+
+    @property
+    def dialect(self):
+        return self._dialect
+
+    def execute(self, sql, params=()):
+        inicio = time.perf_counter()
+        if self._dialect == "sqlite":
+            self._raw.execute(_traduzir_placeholders(sql), params or ())
+        else:
+            self._raw.execute(sql, params or ())
+        _notificar("execute", sql, inicio, len(params or ()))
+        return self
+
+    def executemany(self, sql, seq_params):
+        inicio = time.perf_counter()
+        if self._dialect == "sqlite":
+            self._raw.executemany(_traduzir_placeholders(sql), seq_params)
+        else:
+            self._raw.executemany(sql, seq_params)
+        n_params = sum(len(p) for p in seq_params) if isinstance(seq_params, (list, tuple)) else 0
+        _notificar("execute", sql, inicio, n_params)
+        return self
+
+    def _linha(self, row):
+        if row is None or not self._dictionary or isinstance(row, dict):
+            return row
+        nomes = [d[0] for d in self._raw.description]
+        return dict(zip(nomes, row))
+
+    def fetchone(self):
+        return self._linha(self._raw.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._raw.fetchmany(size) if size else self._raw.fetchmany()
+        return [self._linha(r) for r in rows]
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        if not self._dictionary or not rows or isinstance(rows[0], dict):
+            return rows
+        nomes = [d[0] for d in self._raw.description]
+        return [dict(zip(nomes, r)) for r in rows]
+
+    def __iter__(self):
+        return (self._linha(r) for r in self._raw)
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._raw.lastrowid
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    def close(self):
+        self._raw.close()
+
+
+class _Connection:
+    """
+    Conexão comum aos dois backends. No SQLite, close() devolve
+    a conexão para o pool em vez de fechar o arquivo.
+    """
+
+    def __init__(self, raw, dialect, pool=None):
+        self._raw = raw
+        self.dialect = dialect
+        self._pool = pool
+
+    def cursor(self, dictionary=False):
+        if self.dialect == "mysql":
+            return _Cursor(self._raw.cursor(dictionary=dictionary), "mysql")
+        return _Cursor(self._raw.cursor(), "sqlite", dictionary=dictionary)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        self._raw.commit()
+        _notificar("commit", None, inicio)
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        if self._pool is not None:
+            self._pool.devolver(raw)
+        else:
+            raw.close()
+
+
+def sql_upsert_soma(dialect, tabela, chaves, colunas):
+    """
+    INSERT que, se a linha com as mesmas `chaves` já existir, soma os
+    valores às `colunas` em vez de falhar. Parâmetros: chaves + colunas, em ordem.
+    """
+    todas = list(chaves) + list(colunas)
+    marcadores = ", ".join(["%s"] * len(todas))
+    sql = f"INSERT INTO {tabela} ({', '.join(todas)}) VALUES ({marcadores})"
+    if dialect == "sqlite":
+        soma = ", ".join(f"{c} = {c} + excluded.{c}" for c in colunas)
+        return f"{sql} ON CONFLICT ({', '.join(chaves)}) DO UPDATE SET {soma}"
+    soma = ", ".join(f"{c} = {c} + VALUES({c})" for c in colunas)
+    return f"{sql} ON DUPLICATE KEY UPDATE {soma}"
+
+
+def _migrar_colunas(raw):
+    for tabela, coluna, definicao in SQLITE_COLUNAS_NOVAS:
+        colunas = [row[1] for row in raw.execute(f"PRAGMA table_info({tabela})")]
+        if colunas and coluna not in colunas:
+            raw.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+    raw.commit()
+
+
+class _SQLitePool:
+    """Guarda conexões SQLite abertas para não repetir o setup dos pragmas."""
+
+    def __init__(self, caminho, maximo):
+        self.caminho = caminho
+        self._livres = queue.LifoQueue(maxsize=maximo)
+        self.maximo = maximo
+        self.abertas = 0
+        self._schema_ok = False
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        raw = sqlite3.connect(
+            self.caminho,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=5,
+        )
+        self.abertas += 1
+        for pragma in SQLITE_PRAGMAS:
+            raw.execute(pragma)
+        if not self._schema_ok:
+            with self._lock:
+                if not self._schema_ok:
+                    _migrar_colunas(raw)
+                    with open(SQLITE_SCHEMA, encoding="utf-8") as f:
+                        raw.executescript(f.read())
+                    raw.commit()
+                    self._schema_ok = True
+        return raw
+
+    def obter(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            return self._abrir()
+
+    def devolver(self, raw):
+        # descarta qualquer transação pendente antes de reaproveitar
+        try:
+            raw.rollback()
+            self._livres.put_nowait(raw)
+        except (queue.Full, sqlite3.Error):
+            raw.close()
+            self.abertas -= 1
+
+    def estatisticas(self):
+        livres = self._livres.qsize()
+        return {
+            "abertas": self.abertas,
+            "livres": livres,
+            "em_uso": max(self.abertas - livres, 0),
+            "maximo": self.maximo,
+        }
+
+
+_sqlite_pool = None
+_sqlite_pool_lock = threading.Lock()
+
+
+def _sqlite_connection():
+    global _sqlite_pool
+    if _sqlite_pool is None:
+        with _sqlite_pool_lock:
+            if _sqlite_pool is None:
+                _sqlite_pool = _SQLitePool(SQLITE_PATH, SQLITE_POOL_MAX)
+    return _Connection(_sqlite_pool.obter(), "sqlite", pool=_sqlite_pool)
+
+
+def _mysql_connection():
+    import mysql.connector
+
+    raw = mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST") or "localhost",
+        port=int(os.getenv("MYSQL_PORT") or 3306),
+        user=os.getenv("MYSQL_USER") or "root",
+        password=os.getenv("MYSQL_PASSWORD") or "",
+        database=os.getenv("MYSQL_DATABASE") or "wayne_security",
     )
+    return _Connection(raw, "mysql")
+
+
+def preparar_banco():
+    """
+    Cria/migra o esquema SQLite e fecha a conexão usada. O servidor.py chama
+    no processo mestre, antes do fork, para os workers não disputarem a
+    criação das tabelas; nenhuma conexão aberta é herdada por eles.
+    """
+    if DB_BACKEND != "sqlite":
+        return
+    pool = _SQLitePool(SQLITE_PATH, 1)
+    pool.obter().close()
+
+
+def configurar_pool(maximo):
+    """Define o tamanho do pool SQLite deste processo (um por worker)."""
+    global _sqlite_pool, SQLITE_POOL_MAX
+    with _sqlite_pool_lock:
+        SQLITE_POOL_MAX = maximo
+        _sqlite_pool = None
+
+
+def estatisticas_pool():
+    """Estado do pool de conexões deste processo (vazio se não houver pool)."""
+    if DB_BACKEND == "sqlite" and _sqlite_pool is not None:
+        return _sqlite_pool.estatisticas()
+    return {}
+
+
+def get_connection():
+    inicio = time.perf_counter()
+    if DB_BACKEND == "sqlite":
+        conn = _sqlite_connection()
+    else:
+        conn = _mysql_connection()
+    _notificar("connect", None, inicio)
     return conn
+
+
+# ===== Consultas lidas em lotes =====
+
+@lru_cache(maxsize=64)
+def _tipo_linha(colunas):
+    return namedtuple("Linha", colunas, rename=True)
+
+
+class ConsultaEmLotes:
+    """
+    Executa `sql` numa conexão própria e entrega as linhas aos poucos
+    (fetchmany de `tamanho` em `tamanho`), como tuplas nomeadas: nos
+    templates `r.name` funciona como antes, sem montar um dict por linha
+    nem a lista inteira na memória.
+
+    Feita para respostas em stream: a consulta roda já no construtor (erros
+    aparecem antes de a resposta começar) e a conexão é liberada ao fim da
+    leitura ou em fechar(), que deve ser chamado quando a resposta termina.
+    """
+
+    def __init__(self, sql, params=(), tamanho=None):
+        self.tamanho = tamanho or LOTE_STREAM
+        self._conn = get_connection()
+        self._cursor = self._conn.cursor()
+        self._lida = False
+        try:
+            self._cursor.execute(sql, params)
+            self._linha = _tipo_linha(tuple(d[0] for d in self._cursor.description))
+        except Exception:
+            self.fechar()
+            raise
+
+    def __iter__(self):
+        while self._cursor is not None:
+            lote = self._cursor.fetchmany(self.tamanho)
+            if not lote:
+                self._lida = True
+                self.fechar()
+                return
+            yield from map(self._linha._make, lote)
+
+    def fechar(self):
+        if self._conn is None:
+            return
+        conn, cursor = self._conn, self._cursor
+        self._conn = self._cursor = None
+        try:
+            # no MySQL, fechar um cursor com linhas não lidas dá erro:
+            # fechar a conexão já descarta o resto do resultado
+            if self._lida or conn.dialect == "sqlite":
+                cursor.close()
+        finally:
+            conn.close()
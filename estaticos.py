@@ -0,0 +1,160 @@
+# estaticos.py
+"""
+Pipeline dos arquivos estáticos.
+
+`python estaticos.py` gera em static/dist/ uma cópia de cada arquivo com
+o hash do conteúdo no nome (style.3f2a9c1b7d0e.css), as variantes
+pré-comprimidas .gz e .br (se o pacote `brotli` estiver instalado) e o
+manifest.json com o mapeamento nome original -> nome com hash.
+
+Com o manifest presente, url_for('static', filename=...) passa a apontar
+para a versão com hash, servida com Cache-Control imutável e com a
+variante comprimida que o navegador aceitar. Sem o manifest, nada muda.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+DIST = "dist"
+MANIFEST = "manifest.json"
+
+COMPRIMIVEIS = (".css", ".js", ".svg", ".json", ".txt", ".html", ".map")
+UM_ANO = 365 * 24 * 3600
+
+_RE_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _hash(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()[:12]
+
+
+def _nome_com_hash(relativo, conteudo):
+    raiz, ext = os.path.splitext(relativo)
+    return f"{raiz}.{_hash(conteudo)}{ext}"
+
+
+def _reescrever_css(conteudo, manifest, prefixo):
+    """Aponta os url(/static/...) do CSS para as versões com hash."""
+    por_minusculo = {k.lower(): v for k, v in manifest.items()}
+
+    def trocar(m):
+        aspas, url = m.group(1), m.group(2)
+        if not url.startswith(prefixo):
+            return m.group(0)
+        relativo = url[len(prefixo):]
+        destino = manifest.get(relativo) or por_minusculo.get(relativo.lower())
+        if not destino:
+            return m.group(0)
+        return f"url({aspas}{prefixo}{destino}{aspas})"
+
+    return _RE_CSS_URL.sub(trocar, conteudo.decode("utf-8")).encode("utf-8")
+
+
+def _gravar(caminho, conteudo):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+
+
+def construir(static_dir=STATIC_DIR, prefixo="/static/"):
+    """Gera static/dist/ e devolve o manifest."""
+    dist_dir = os.path.join(static_dir, DIST)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    arquivos = []
+    for pasta, subpastas, nomes in os.walk(static_dir):
+        subpastas[:] = [s for s in subpastas if os.path.join(pasta, s) != dist_dir]
+        for nome in nomes:
+            caminho = os.path.join(pasta, nome)
+            arquivos.append(os.path.relpath(caminho, static_dir).replace(os.sep, "/"))
+
+    # CSS por último, para já conhecer os nomes com hash das imagens que ele usa
+    arquivos.sort(key=lambda r: (r.endswith(".css"), r))
+
+    manifest = {}
+    for relativo in arquivos:
+        with open(os.path.join(static_dir, relativo), "rb") as f:
+            conteudo = f.read()
+        if relativo.endswith(".css"):
+            conteudo = _reescrever_css(conteudo, manifest, prefixo)
+
+        destino = f"{DIST}/{_nome_com_hash(relativo, conteudo)}"
+        caminho = os.path.join(static_dir, destino)
+        _gravar(caminho, conteudo)
+
+        if relativo.endswith(COMPRIMIVEIS):
+            _gravar(caminho + ".gz", gzip.compress(conteudo, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _gravar(caminho + ".br", brotli.compress(conteudo, quality=11))
+
+        manifest[relativo] = destino
+
+    _gravar(os.path.join(dist_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def carregar_manifest(static_dir=STATIC_DIR):
+    caminho = os.path.join(static_dir, DIST, MANIFEST)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def init_app(app):
+    manifest = carregar_manifest(app.static_folder)
+    if not manifest:
+        return
+
+    com_hash = set(manifest.values())
+    static_original = app.view_functions["static"]
+
+    @app.url_defaults
+    def _url_estatico(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    def static_view(filename):
+        if filename not in com_hash:
+            return static_original(filename=filename)
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        arquivo, encoding = filename, None
+        for enc, ext in (("br", ".br"), ("gzip", ".gz")):
+            if enc in request.accept_encodings and os.path.exists(os.path.join(app.static_folder, filename + ext)):
+                arquivo, encoding = filename + ext, enc
+                break
+
+        resp = send_from_directory(app.static_folder, arquivo, mimetype=mimetype, max_age=UM_ANO)
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        resp.vary.add("Accept-Encoding")
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+        return resp
+
+    app.view_functions["static"] = static_view
+
+
+if __name__ == "__main__":
+    gerado = construir()
+    for original, destino in sorted(gerado.items()):
+        print(f"{original} -> {destino}")
+    if brotli is None:
+        print("(pacote brotli não instalado: só variantes .gz foram geradas)", file=sys.stderr)
@@ -0,0 +1,264 @@
+# estoque.py
+"""
+Razão de movimentações de estoque.
+
+Toda alteração de resources.quantity passa por movimentar()/ajustar() (ou
+devolver_solicitacoes(), em lote), que atualizam o recurso e gravam a
+movimentação (stock_movements) com o mesmo cursor, ou seja, na mesma
+transação da rota.
+
+tirar_snapshot() grava periodicamente a quantidade de cada recurso que teve
+movimentações (stock_snapshots). O estoque numa data é o snapshot anterior
+mais as movimentações até o snapshot seguinte: uma busca pelo índice e uma
+faixa curta, sem reprocessar o histórico inteiro.
+
+Uso (agendar uma vez por dia, por exemplo):
+    python estoque.py snapshot
+"""
+import sys
+from datetime import datetime
+
+import jobs
+from db import get_connection
+
+TIPOS = ("inicial", "entrada", "baixa", "devolucao", "ajuste", "expiracao")
+
+
+def movimentar(cursor, recurso_id, delta, tipo, usuario_id=None, solicitacao_id=None):
+    """
+    Soma `delta` ao estoque do recurso e registra a movimentação.
+    Usa o cursor da rota: o commit (ou rollback) é de quem chamou.
+    Devolve a quantidade depois da movimentação.
+    """
+    cursor.execute("""
+        UPDATE resources
+        SET quantity = quantity + %s,
+            version = version + 1
+        WHERE id = %s
+    """, (delta, recurso_id))
+    cursor.execute("SELECT quantity FROM resources WHERE id = %s", (recurso_id,))
+    linha = cursor.fetchone()
+    quantidade = linha["quantity"] if isinstance(linha, dict) else linha[0]
+    _registrar(cursor, recurso_id, delta, quantidade, tipo, usuario_id, solicitacao_id)
+    return quantidade
+
+
+def ajustar(cursor, recurso_id, nova_quantidade, usuario_id=None):
+    """Leva o estoque a `nova_quantidade` (edição do recurso), registrando a diferença."""
+    cursor.execute("SELECT quantity FROM resources WHERE id = %s", (recurso_id,))
+    linha = cursor.fetchone()
+    atual = linha["quantity"] if isinstance(linha, dict) else linha[0]
+    delta = int(nova_quantidade) - atual
+    if delta == 0:
+        return atual
+    return movimentar(cursor, recurso_id, delta, "ajuste", usuario_id)
+
+
+def registrar_inicial(cursor, recurso_id, quantidade, usuario_id=None):
+    """Movimentação de abertura de um recurso recém-criado."""
+    _registrar(cursor, recurso_id, int(quantidade), int(quantidade), "inicial", usuario_id, None)
+
+
+def devolver_solicitacoes(cursor, solicitacoes, tipo, usuario_id=None):
+    """
+    Devolve ao estoque a quantidade de várias solicitações de uma vez:
+    um UPDATE para todos os recursos e as movimentações em lote.
+    `solicitacoes` é uma lista de (solicitacao_id, recurso_id, quantidade).
+    Usa o cursor de quem chamou, como movimentar().
+    """
+    if not solicitacoes:
+        return
+    ids = [s[0] for s in solicitacoes]
+    recursos = sorted({s[1] for s in solicitacoes})
+    m_ids = ", ".join(["%s"] * len(ids))
+    m_rec = ", ".join(["%s"] * len(recursos))
+    cursor.execute(f"""
+        UPDATE resources
+        SET quantity = quantity + (
+                SELECT COALESCE(SUM(rr.quantity), 0) FROM resource_requests rr
+                WHERE rr.resource_id = resources.id AND rr.id IN ({m_ids})
+            ),
+            version = version + 1
+        WHERE id IN ({m_rec})
+    """, ids + recursos)
+
+    # quantity_after de cada movimentação: parte do estoque final e volta
+    # solicitação por solicitação (a última do recurso fica com o valor final)
+    cursor.execute(f"SELECT id, quantity FROM resources WHERE id IN ({m_rec})", recursos)
+    saldo = {}
+    for linha in cursor.fetchall():
+        if isinstance(linha, dict):
+            saldo[linha["id"]] = linha["quantity"]
+        else:
+            saldo[linha[0]] = linha[1]
+    agora = datetime.now()
+    linhas = []
+    for solicitacao_id, recurso_id, quantidade in sorted(solicitacoes, reverse=True):
+        linhas.append((recurso_id, quantidade, saldo[recurso_id], tipo,
+                       solicitacao_id, usuario_id, agora))
+        saldo[recurso_id] -= quantidade
+    linhas.reverse()
+    cursor.executemany("""
+        INSERT INTO stock_movements
+            (resource_id, delta, quantity_after, kind, request_id, user_id, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, linhas)
+
+
+def _registrar(cursor, recurso_id, delta, quantidade, tipo, usuario_id, solicitacao_id):
+    cursor.execute("""
+        INSERT INTO stock_movements
+            (resource_id, delta, quantity_after, kind, request_id, user_id, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (recurso_id, delta, quantidade, tipo, solicitacao_id, usuario_id, datetime.now()))
+
+
+# =========================
+# SNAPSHOTS
+# =========================
+
+def tirar_snapshot(quando=None):
+    """
+    Grava a quantidade atual de cada recurso que teve movimentações desde o
+    último snapshot (e uma linha de base para os que nunca tiveram nenhum).
+    Só varre as movimentações novas. Devolve quantos snapshots foram gravados.
+    """
+    quando = (quando or datetime.now()).replace(microsecond=0)
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COALESCE(MAX(movement_id), 0) FROM stock_snapshots")
+    desde = cursor.fetchone()[0]
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements")
+    ate = cursor.fetchone()[0]
+
+    cursor.execute("""
+        INSERT INTO stock_snapshots (resource_id, taken_at, quantity, movement_id)
+        SELECT m.resource_id, %s, m.quantity_after, m.id
+        FROM stock_movements m
+        JOIN (
+            SELECT resource_id, MAX(id) AS id
+            FROM stock_movements
+            WHERE id > %s AND id <= %s
+            GROUP BY resource_id
+        ) ultimo ON ultimo.id = m.id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM stock_snapshots s
+            WHERE s.resource_id = m.resource_id AND s.taken_at = %s
+        )
+    """, (quando, desde, ate, quando))
+    gravados = cursor.rowcount
+
+    # linha de base para recursos anteriores ao razão (sem nenhuma movimentação)
+    cursor.execute("""
+        INSERT INTO stock_snapshots (resource_id, taken_at, quantity, movement_id)
+        SELECT r.id, %s, r.quantity, 0
+        FROM resources r
+        WHERE NOT EXISTS (SELECT 1 FROM stock_snapshots s WHERE s.resource_id = r.id)
+          AND NOT EXISTS (SELECT 1 FROM stock_movements m WHERE m.resource_id = r.id)
+    """, (quando,))
+    gravados += cursor.rowcount
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return gravados
+
+
+@jobs.tarefa("snapshot_estoque")
+def _tarefa_snapshot(job):
+    return {"snapshots": tirar_snapshot()}
+
+
+# =========================
+# CONSULTAS
+# =========================
+
+def estoque_em(recurso_id, quando):
+    """
+    Quantidade do recurso na data/hora `quando`, ou None se não houver
+    histórico que cubra essa data (sem snapshot anterior e antes da
+    primeira movimentação do recurso).
+    """
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT quantity, movement_id FROM stock_snapshots
+            WHERE resource_id = %s AND taken_at <= %s
+            ORDER BY taken_at DESC
+            LIMIT 1
+        """, (recurso_id, quando))
+        snap = cursor.fetchone()
+
+        if snap:
+            base, de_id = snap["quantity"], snap["movement_id"]
+        else:
+            # antes do primeiro snapshot: a primeira movimentação diz o estoque
+            # anterior a ela (quantity_after - delta), mesmo para recursos que
+            # já existiam antes do razão; antes dela não há histórico
+            cursor.execute("""
+                SELECT id, delta, quantity_after, created_at <= %s AS cobre
+                FROM stock_movements
+                WHERE resource_id = %s
+                ORDER BY id
+                LIMIT 1
+            """, (quando, recurso_id))
+            primeiro = cursor.fetchone()
+            if not primeiro or not primeiro["cobre"]:
+                return None
+            base, de_id = primeiro["quantity_after"] - primeiro["delta"], primeiro["id"] - 1
+
+        # o snapshot seguinte limita a faixa de movimentações a somar
+        cursor.execute("""
+            SELECT movement_id FROM stock_snapshots
+            WHERE resource_id = %s AND taken_at > %s
+            ORDER BY taken_at
+            LIMIT 1
+        """, (recurso_id, quando))
+        proximo = cursor.fetchone()
+        ate_id = proximo["movement_id"] if proximo and proximo["movement_id"] else None
+
+        sql = """
+            SELECT COALESCE(SUM(delta), 0) AS soma FROM stock_movements
+            WHERE resource_id = %s AND id > %s AND created_at <= %s
+        """
+        params = [recurso_id, de_id, quando]
+        if ate_id is not None:
+            sql += " AND id <= %s"
+            params.append(ate_id)
+        cursor.execute(sql, params)
+        return base + int(cursor.fetchone()["soma"])
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def movimentos(recurso_id, ate=None, limite=100):
+    """Movimentações do recurso, da mais recente para a mais antiga (até `ate`)."""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    sql = """
+        SELECT m.id, m.delta, m.quantity_after, m.kind, m.request_id, m.created_at,
+               u.name AS user_name
+        FROM stock_movements m
+        LEFT JOIN users u ON u.id = m.user_id
+        WHERE m.resource_id = %s
+    """
+    params = [recurso_id]
+    if ate is not None:
+        sql += " AND m.created_at <= %s"
+        params.append(ate)
+    sql += " ORDER BY m.created_at DESC, m.id DESC LIMIT %s"
+    params.append(limite)
+    cursor.execute(sql, params)
+    linhas = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return linhas
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["snapshot"]:
+        sys.exit("uso: python estoque.py snapshot")
+    print(f"{tirar_snapshot()} snapshot(s) gravado(s)")
@@ -0,0 +1,167 @@
+# eventos.py
+"""
+Hub de eventos para o stream SSE (/eventos).
+
+As rotas que alteram dados chamam publicar(tipo, dados); cada cliente
+conectado no stream tem uma fila própria e recebe o evento na hora.
+
+Com vários workers, defina WAYNE_EVENTS_FILE: cada evento também é
+anexado a esse arquivo (JSON Lines) e cada worker que tem clientes
+conectados acompanha o arquivo e repassa os eventos dos outros processos.
+
+Cada conexão dura no máximo WAYNE_EVENTS_MAX_SECONDS; depois o stream
+termina e o navegador reconecta sozinho (campo `retry`). encerrar() fecha
+todas as conexões do processo na hora (usado ao parar um worker).
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+ARQUIVO = os.getenv("WAYNE_EVENTS_FILE") or ""
+ARQUIVO_MAX_BYTES = 1024 * 1024
+INTERVALO_LEITURA = 0.3
+HEARTBEAT = 15
+FILA_MAX = 100
+DURACAO_MAX = int(os.getenv("WAYNE_EVENTS_MAX_SECONDS") or 300)
+
+
+class Hub:
+    def __init__(self, arquivo=ARQUIVO):
+        self.arquivo = arquivo
+        self._lock = threading.Lock()
+        self._assinantes = set()
+        self._leitor_pid = None
+        self.encerrado = False
+
+    def assinar(self):
+        fila = queue.Queue(maxsize=FILA_MAX)
+        with self._lock:
+            self._assinantes.add(fila)
+            if self.arquivo and self._leitor_pid != os.getpid():
+                # a thread leitora não sobrevive a um fork: uma por processo
+                self._leitor_pid = os.getpid()
+                threading.Thread(target=self._acompanhar_arquivo, daemon=True).start()
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.discard(fila)
+
+    def encerrar(self):
+        """Acorda e termina todos os streams abertos; novos terminam logo ao abrir."""
+        with self._lock:
+            self.encerrado = True
+            filas = list(self._assinantes)
+        for fila in filas:
+            try:
+                fila.put_nowait(None)
+            except queue.Full:
+                # fila cheia: o stream esvazia e vê `encerrado` no próximo evento
+                pass
+
+    @property
+    def total_assinantes(self):
+        return len(self._assinantes)
+
+    def _entregar(self, evento):
+        with self._lock:
+            filas = list(self._assinantes)
+        for fila in filas:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                # cliente lento: descarta o evento em vez de segurar quem publica
+                pass
+
+    def publicar(self, tipo, dados):
+        evento = {"tipo": tipo, "dados": dados, "pid": os.getpid()}
+        self._entregar(evento)
+        if self.arquivo:
+            linha = json.dumps(evento, ensure_ascii=False, default=str) + "\n"
+            with self._lock, open(self.arquivo, "a", encoding="utf-8") as f:
+                f.write(linha)
+                if f.tell() > ARQUIVO_MAX_BYTES:
+                    f.truncate(0)
+
+    def _acompanhar_arquivo(self):
+        meu_pid = os.getpid()
+        open(self.arquivo, "a").close()
+        with open(self.arquivo, encoding="utf-8") as f:
+            f.seek(0, os.SEEK_END)
+            resto = ""
+            while True:
+                linha = f.readline()
+                if not linha:
+                    # arquivo truncado por quem publica: volta para o início
+                    if os.path.getsize(self.arquivo) < f.tell():
+                        f.seek(0)
+                        resto = ""
+                    time.sleep(INTERVALO_LEITURA)
+                    continue
+                linha = resto + linha
+                if not linha.endswith("\n"):
+                    resto = linha
+                    continue
+                resto = ""
+                try:
+                    evento = json.loads(linha)
+                except ValueError:
+                    continue
+                if evento.get("pid") != meu_pid:
+                    self._entregar(evento)
+
+
+hub = Hub()
+
+
+def publicar(tipo, dados):
+    hub.publicar(tipo, dados)
+
+
+def encerrar():
+    hub.encerrar()
+
+
+def publicar_pendencias(conn):
+    """
+    Envia as contagens usadas no badge de baixas (gerente e admin). Chamado
+    pelas rotas que aprovam/rejeitam e pela expiração de reservas.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT status, COUNT(*) FROM resource_requests
+        WHERE status IN ('pendente', 'aprovado_gerente')
+        GROUP BY status
+    """)
+    por_status = dict(cursor.fetchall())
+    cursor.close()
+    pendente = por_status.get("pendente", 0)
+    publicar("pendencias", {
+        "gerente": pendente,
+        "admin": pendente + por_status.get("aprovado_gerente", 0),
+    })
+
+
+def stream():
+    """Gerador no formato text/event-stream para uma conexão de cliente."""
+    fila = hub.assinar()
+    fim = time.monotonic() + DURACAO_MAX
+    try:
+        yield "retry: 5000\n\n"
+        while not hub.encerrado:
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                evento = fila.get(timeout=min(HEARTBEAT, restante))
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if evento is None:
+                break
+            dados = json.dumps(evento["dados"], ensure_ascii=False, default=str)
+            yield f"event: {evento['tipo']}\ndata: {dados}\n\n"
+    finally:
+        hub.cancelar(fila)
@@ -0,0 +1,94 @@
+# fragmentos.py
+"""
+Cache de fragmentos de template (ex.: cada linha da tabela de recursos).
+
+A chave de cada fragmento inclui a versão do registro (coluna `version`,
+incrementada pelas rotas que alteram o recurso) e o papel do usuário, então
+outros workers nunca servem uma linha desatualizada; invalidar() só libera
+a memória das versões antigas neste processo.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+import metricas
+
+FRAGMENTOS_MAX = int(os.getenv("WAYNE_FRAGMENT_CACHE_MAX") or 20000)
+
+
+class CacheFragmentos:
+    def __init__(self, maximo=FRAGMENTOS_MAX):
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._por_grupo = {}
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            html = self._itens.get(chave)
+            if html is not None:
+                self._itens.move_to_end(chave)
+            return html
+
+    def set(self, chave, grupo, html):
+        with self._lock:
+            self._itens[chave] = html
+            self._itens.move_to_end(chave)
+            self._por_grupo.setdefault(grupo, set()).add(chave)
+            while len(self._itens) > self.maximo:
+                antiga, _ = self._itens.popitem(last=False)
+                chaves = self._por_grupo.get(antiga[0])
+                if chaves is not None:
+                    chaves.discard(antiga)
+                    if not chaves:
+                        del self._por_grupo[antiga[0]]
+
+    def invalidar(self, grupo):
+        with self._lock:
+            for chave in self._por_grupo.pop(grupo, ()):
+                self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._por_grupo.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+def renderizar(cache, template, itens, chave, nome="item", nome_cache="fragmentos", **contexto):
+    """
+    Gera o HTML de `template` para cada item, reaproveitando o que já estiver
+    em cache. chave(item) devolve uma tupla cujo primeiro elemento é o grupo
+    usado em invalidar() (ex.: o id do recurso).
+
+    O template recebe só o item (na variável `nome`) e `contexto`, sem os
+    context processors do Flask: tudo que ele usa precisa vir explícito.
+    """
+    hits = misses = 0
+    try:
+        for item in itens:
+            k = chave(item)
+            html = cache.get(k)
+            if html is None:
+                misses += 1
+                html = template.render({nome: item, **contexto})
+                cache.set(k, k[0], html)
+            else:
+                hits += 1
+            yield Markup(html)
+    finally:
+        if hits:
+            metricas.contar_cache(nome_cache, True, hits)
+        if misses:
+            metricas.contar_cache(nome_cache, False, misses)
+
+
+linhas_recursos = CacheFragmentos()
+
+
+def invalidar_recurso(recurso_id):
+    linhas_recursos.invalidar(recurso_id)
@@ -0,0 +1,282 @@
+# idempotencia.py
+"""
+Chaves de idempotência para as rotas que alteram dados.
+
+Os formulários levam um campo oculto `idempotency_key` (gerado por
+campo_idempotencia() a cada renderização) e os clientes JSON podem mandar
+o cabeçalho `Idempotency-Key`. A primeira requisição com a chave executa a
+rota e guarda a resposta (e as mensagens flash); reenvios com a mesma chave
+recebem a resposta guardada sem executar nada de novo. Um reenvio que chega
+enquanto a primeira ainda está executando espera por ela.
+
+As chaves são por usuário e por rota e ficam WAYNE_IDEMPOTENCY_TTL segundos.
+Por padrão as respostas ficam na memória de cada processo (no máximo
+WAYNE_IDEMPOTENCY_MAX): com vários workers, um reenvio atendido por outro
+worker executaria a rota de novo. Defina WAYNE_IDEMPOTENCY_FILE para guardar
+as respostas num arquivo SQLite local compartilhado pelos processos da máquina.
+Requisições sem chave funcionam como antes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, flash, request, session
+from markupsafe import Markup
+
+import metricas
+
+TTL = float(os.getenv("WAYNE_IDEMPOTENCY_TTL") or 3600)
+MAXIMO = int(os.getenv("WAYNE_IDEMPOTENCY_MAX") or 10000)
+ARQUIVO = os.getenv("WAYNE_IDEMPOTENCY_FILE") or ""
+ESPERA_MAX = 30
+INTERVALO_ESPERA = 0.05  # consulta ao arquivo compartilhado enquanto outro processo executa
+CAMPO = "idempotency_key"
+CABECALHO = "Idempotency-Key"
+
+# cabeçalhos que não fazem sentido repetir (o Flask gera de novo)
+_SEM_REPETIR = {"set-cookie", "content-length", "server-timing", "content-encoding", "vary"}
+
+
+class ArmazemRespostas:
+    """chave -> resposta guardada, com validade (TTL) e limite de itens (LRU)."""
+
+    def __init__(self, ttl=TTL, maximo=MAXIMO):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._executando = {}
+        self._lock = threading.Lock()
+
+    def _expirar(self, agora):
+        # os itens estão em ordem de gravação: os vencidos ficam no começo
+        while self._itens:
+            chave, (validade, _) = next(iter(self._itens.items()))
+            if validade > agora:
+                break
+            del self._itens[chave]
+
+    def reservar(self, chave):
+        """
+        Devolve ("guardada", resposta) se a chave já tem resposta, ou
+        ("executar", None) se quem chamou deve executar a rota (e depois
+        chamar concluir() ou liberar()). Espera se outra thread está executando.
+        """
+        limite = time.monotonic() + ESPERA_MAX
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._expirar(agora)
+                item = self._itens.get(chave)
+                if item is not None:
+                    return "guardada", item[1]
+                evento = self._executando.get(chave)
+                if evento is None:
+                    self._executando[chave] = threading.Event()
+                    return "executar", None
+            restante = limite - time.monotonic()
+            if restante <= 0 or not evento.wait(restante):
+                return "ocupada", None
+
+    def concluir(self, chave, resposta):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, resposta)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+            self._executando.pop(chave).set()
+
+    def liberar(self, chave):
+        """A execução falhou sem resposta: o próximo reenvio executa de novo."""
+        with self._lock:
+            self._executando.pop(chave).set()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class ArmazemSQLite:
+    """
+    Mesmo contrato do ArmazemRespostas, num arquivo SQLite local: a chave em
+    execução fica marcada no arquivo (por até ESPERA_MAX segundos, caso o
+    processo morra) e os outros processos esperam consultando o arquivo.
+    """
+
+    def __init__(self, caminho, ttl=TTL):
+        self.caminho = caminho
+        self.ttl = ttl
+        self._local = threading.local()
+        self._chamadas = 0
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave TEXT PRIMARY KEY,
+                    pronta INTEGER NOT NULL,
+                    validade REAL NOT NULL,
+                    resposta TEXT
+                )
+            """)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _texto(chave):
+        return json.dumps(chave)
+
+    def reservar(self, chave):
+        texto = self._texto(chave)
+        conn = self._conexao()
+        limite = time.monotonic() + ESPERA_MAX
+        while True:
+            agora = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                linha = conn.execute(
+                    "SELECT pronta, resposta FROM respostas WHERE chave = ? AND validade > ?",
+                    (texto, agora),
+                ).fetchone()
+                if linha is None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO respostas (chave, pronta, validade) VALUES (?, 0, ?)",
+                        (texto, agora + ESPERA_MAX),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if linha is None:
+                return "executar", None
+            if linha[0]:
+                guardada = json.loads(linha[1])
+                guardada["corpo"] = guardada["corpo"].encode("latin-1")
+                return "guardada", guardada
+            if time.monotonic() >= limite:
+                return "ocupada", None
+            time.sleep(INTERVALO_ESPERA)
+
+    def concluir(self, chave, resposta):
+        conn = self._conexao()
+        agora = time.time()
+        # latin-1 leva qualquer byte para um caractere e volta igual
+        texto = json.dumps(dict(resposta, corpo=resposta["corpo"].decode("latin-1")))
+        conn.execute(
+            "INSERT OR REPLACE INTO respostas (chave, pronta, validade, resposta) VALUES (?, 1, ?, ?)",
+            (self._texto(chave), agora + self.ttl, texto),
+        )
+        self._chamadas += 1
+        if self._chamadas % 1000 == 0:
+            conn.execute("DELETE FROM respostas WHERE validade < ?", (agora,))
+
+    def liberar(self, chave):
+        self._conexao().execute(
+            "DELETE FROM respostas WHERE chave = ? AND pronta = 0", (self._texto(chave),)
+        )
+
+    def __len__(self):
+        return self._conexao().execute(
+            "SELECT COUNT(*) FROM respostas WHERE pronta = 1 AND validade > ?", (time.time(),)
+        ).fetchone()[0]
+
+
+respostas = ArmazemSQLite(ARQUIVO) if ARQUIVO else ArmazemRespostas()
+
+
+def nova_chave():
+    return uuid.uuid4().hex
+
+
+def campo_idempotencia():
+    """Campo oculto com uma chave nova, para colocar dentro de cada <form method="post">."""
+    return Markup(f'<input type="hidden" name="{CAMPO}" value="{nova_chave()}">')
+
+
+def _chave_da_requisicao():
+    chave = request.headers.get(CABECALHO) or request.form.get(CAMPO)
+    if not chave:
+        return None
+    chave = chave.strip()[:128]
+    return (session.get("user_id"), request.endpoint, chave) if chave else None
+
+
+def _guardar(resposta, flashes):
+    return {
+        "status": resposta.status_code,
+        "headers": [(k, v) for k, v in resposta.headers.items() if k.lower() not in _SEM_REPETIR],
+        "corpo": resposta.get_data(),
+        "flashes": flashes,
+    }
+
+
+def _repetir(guardada):
+    # se a resposta original chegou ao navegador, as mensagens já estão na sessão
+    pendentes = session.get("_flashes", ())
+    for categoria, mensagem in guardada["flashes"]:
+        if (categoria, mensagem) not in pendentes:
+            flash(mensagem, categoria)
+    resposta = Response(guardada["corpo"], status=guardada["status"], headers=guardada["headers"])
+    resposta.headers["Idempotent-Replayed"] = "true"
+    return resposta
+
+
+def _sem_falhar(operacao, *args):
+    # a rota já executou: um erro no arquivo compartilhado não muda a resposta
+    try:
+        operacao(*args)
+    except sqlite3.Error:
+        pass
+
+
+def idempotente(f):
+    """
+    Decorador das rotas POST que alteram dados: com uma chave de
+    idempotência, executa a rota uma vez e repete a resposta nos reenvios.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        chave = _chave_da_requisicao() if request.method == "POST" else None
+        if chave is None:
+            return f(*args, **kwargs)
+
+        try:
+            estado, guardada = respostas.reservar(chave)
+        except sqlite3.Error:
+            # arquivo compartilhado indisponível: executa sem proteção contra
+            # reenvio em vez de derrubar a rota
+            return f(*args, **kwargs)
+        if estado == "guardada":
+            metricas.contar_cache("idempotencia", True)
+            return _repetir(guardada)
+        if estado == "ocupada":
+            return Response("Requisição anterior com a mesma chave ainda em andamento.",
+                            status=409, headers={"Retry-After": "1"})
+
+        metricas.contar_cache("idempotencia", False)
+        antes = len(session.get("_flashes", ()))
+        try:
+            resposta = f(*args, **kwargs)
+            resposta = current_app.make_response(resposta)
+        except BaseException:
+            _sem_falhar(respostas.liberar, chave)
+            raise
+        if resposta.is_streamed or resposta.status_code >= 500:
+            _sem_falhar(respostas.liberar, chave)
+            return resposta
+        _sem_falhar(respostas.concluir, chave,
+                    _guardar(resposta, list(session.get("_flashes", ())[antes:])))
+        return resposta
+    return decorated
+
+
+def init_app(app):
+    app.add_template_global(campo_idempotencia)
@@ -0,0 +1,491 @@
+# jobs.py
+"""
+Tarefas em segundo plano (exportações, importações, arquivamento...).
+
+As rotas chamam enfileirar("tipo", {...}) e respondem na hora; a tarefa
+fica na tabela `jobs` até um dos processos de `python jobs.py` pegá-la.
+Cada tarefa informa o progresso, pode ser cancelada pela interface e,
+se falhar, volta para a fila com espera crescente até `max_attempts`.
+
+Uso:
+    python jobs.py --processos 2
+"""
+import argparse
+import csv
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from db import get_connection
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPORT_DIR = os.getenv("WAYNE_EXPORT_DIR") or os.path.join(BASE_DIR, "exports")
+
+INTERVALO_FILA = float(os.getenv("WAYNE_JOBS_POLL") or 1.0)
+INTERVALO_PROGRESSO = 0.5      # grava o progresso no banco no máximo a cada 0,5 s
+ESPERA_RETENTATIVA = 10        # segundos; dobra a cada tentativa
+LIMITE_ORFAO = 300             # sem sinal de vida por 5 min: o processo morreu
+INTERVALO_BATIMENTO = LIMITE_ORFAO / 5  # o worker renova heartbeat_at do job em execução
+ESPERA_MAX_FALHAS = 60         # teto da espera entre tentativas após erros de banco
+INTERVALO_SUPERVISAO = 1.0     # o processo principal confere os workers a cada 1 s
+
+STATUS_FINAIS = ("concluido", "falhou", "cancelado")
+
+TAREFAS = {}
+
+
+class Cancelado(Exception):
+    """Levantada dentro da tarefa quando o cancelamento é pedido."""
+
+
+class Interrompido(Exception):
+    """Levantada dentro da tarefa quando o processo recebe SIGTERM."""
+
+
+def tarefa(nome, tentativas=3):
+    """Registra a função como tarefa `nome`: fn(job, **params) -> resultado (JSON)."""
+    def registrar(fn):
+        TAREFAS[nome] = (fn, tentativas)
+        return fn
+    return registrar
+
+
+# =========================
+# FILA (usado pelas rotas)
+# =========================
+
+def enfileirar(tipo, params=None, criado_por=None, atraso=0):
+    """Coloca a tarefa na fila e devolve o id do job."""
+    if tipo not in TAREFAS:
+        raise ValueError(f"Tarefa desconhecida: {tipo}")
+    agora = datetime.now()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO jobs (type, params, max_attempts, created_by, created_at, run_after)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (tipo, json.dumps(params or {}), TAREFAS[tipo][1], criado_por, agora,
+          agora + timedelta(seconds=atraso)))
+    conn.commit()
+    job_id = cursor.lastrowid
+    cursor.close()
+    conn.close()
+    return job_id
+
+
+def _decodificar(job):
+    if job:
+        job["params"] = json.loads(job["params"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def obter(job_id):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
+    job = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return _decodificar(job)
+
+
+def listar(criado_por=None, limite=50):
+    """Jobs mais recentes (todos, ou só os de `criado_por`)."""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    if criado_por is None:
+        cursor.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT %s", (limite,))
+    else:
+        cursor.execute("""
+            SELECT * FROM jobs WHERE created_by = %s ORDER BY id DESC LIMIT %s
+        """, (criado_por, limite))
+    jobs = [_decodificar(j) for j in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return jobs
+
+
+def cancelar(job_id):
+    """
+    Cancela o job: se ainda está na fila, na hora; se está executando, a
+    tarefa para no próximo aviso de progresso. Devolve False se já terminou.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs SET status = 'cancelado', finished_at = %s
+        WHERE id = %s AND status = 'pendente'
+    """, (datetime.now(), job_id))
+    if cursor.rowcount == 0:
+        cursor.execute("""
+            UPDATE jobs SET cancel_requested = 1
+            WHERE id = %s AND status = 'executando'
+        """, (job_id,))
+    alterou = cursor.rowcount > 0
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return alterou
+
+
+# =========================
+# EXECUÇÃO (processos worker)
+# =========================
+
+class Job:
+    """Passado para a tarefa: dá acesso aos parâmetros e ao progresso."""
+
+    def __init__(self, linha, interrompido):
+        self.id = linha["id"]
+        self.tipo = linha["type"]
+        self.params = json.loads(linha["params"] or "{}")
+        self.tentativa = linha["attempts"]
+        self._interrompido = interrompido
+        self._ultimo = 0.0
+
+    def progresso(self, feito, total=None, mensagem=None):
+        """
+        Informa o andamento (feito/total ou porcentagem) e verifica se o job
+        foi cancelado. Chame com frequência nos laços longos.
+        """
+        if self._interrompido():
+            raise Interrompido()
+        agora = time.monotonic()
+        if agora - self._ultimo < INTERVALO_PROGRESSO and (total is None or feito < total):
+            return
+        self._ultimo = agora
+
+        pct = int(feito * 100 / total) if total else int(feito)
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE jobs SET progress = %s, message = %s, heartbeat_at = %s
+            WHERE id = %s
+        """, (max(0, min(pct, 100)), mensagem, datetime.now(), self.id))
+        cursor.execute("SELECT cancel_requested FROM jobs WHERE id = %s", (self.id,))
+        cancelado = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        if cancelado:
+            raise Cancelado()
+
+
+def _reivindicar(nome_worker):
+    """Pega o próximo job pronto da fila (ou None). Seguro entre processos."""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        while True:
+            agora = datetime.now()
+            cursor.execute("""
+                SELECT * FROM jobs
+                WHERE status = 'pendente' AND run_after <= %s
+                ORDER BY run_after, id
+                LIMIT 1
+            """, (agora,))
+            linha = cursor.fetchone()
+            if not linha:
+                conn.commit()
+                return None
+            cursor.execute("""
+                UPDATE jobs
+                SET status = 'executando', worker = %s, attempts = attempts + 1,
+                    started_at = %s, heartbeat_at = %s
+                WHERE id = %s AND status = 'pendente'
+            """, (nome_worker, agora, agora, linha["id"]))
+            conn.commit()
+            if cursor.rowcount == 1:
+                linha["attempts"] += 1
+                return linha
+            # outro processo pegou antes: tenta o próximo
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _finalizar(job_id, status, **campos):
+    campos["status"] = status
+    campos.setdefault("finished_at", datetime.now())
+    colunas = ", ".join(f"{c} = %s" for c in campos)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"UPDATE jobs SET {colunas} WHERE id = %s", (*campos.values(), job_id))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+class _Batimento:
+    """
+    Thread que renova heartbeat_at do job enquanto ele executa, para a
+    recuperação de órfãos não devolver à fila uma tarefa viva que não
+    chama job.progresso (ex.: uma única consulta longa).
+    """
+
+    def __init__(self, job_id, intervalo=INTERVALO_BATIMENTO):
+        self.job_id = job_id
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._rodar, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+    def _rodar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE jobs SET heartbeat_at = %s
+                    WHERE id = %s AND status = 'executando'
+                """, (datetime.now(), self.job_id))
+                conn.commit()
+                cursor.close()
+                conn.close()
+            except Exception:
+                # banco ocupado ou fora do ar: tenta de novo no próximo intervalo
+                traceback.print_exc(limit=2)
+
+
+def _executar(linha, interrompido):
+    job = Job(linha, interrompido)
+    registrada = TAREFAS.get(job.tipo)
+    if not registrada:
+        _finalizar(job.id, "falhou", error=f"Tarefa desconhecida: {job.tipo}")
+        return
+
+    try:
+        with _Batimento(job.id):
+            resultado = registrada[0](job, **job.params)
+    except Cancelado:
+        _finalizar(job.id, "cancelado", message="Cancelado pelo usuário")
+    except Interrompido:
+        # processo encerrando: devolve para a fila sem gastar a tentativa
+        _finalizar(job.id, "pendente", attempts=job.tentativa - 1, worker=None, finished_at=None)
+    except Exception:
+        erro = traceback.format_exc(limit=5)
+        if job.tentativa < linha["max_attempts"]:
+            espera = ESPERA_RETENTATIVA * 2 ** (job.tentativa - 1)
+            _finalizar(job.id, "pendente", error=erro, worker=None, finished_at=None,
+                       run_after=datetime.now() + timedelta(seconds=espera))
+        else:
+            _finalizar(job.id, "falhou", error=erro)
+    else:
+        _finalizar(job.id, "concluido", progress=100,
+                   result=json.dumps(resultado, default=str) if resultado is not None else None)
+
+
+def recuperar_orfaos():
+    """Volta para a fila os jobs de processos que morreram no meio da execução."""
+    limite = datetime.now() - timedelta(seconds=LIMITE_ORFAO)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs SET status = 'pendente', worker = NULL
+        WHERE status = 'executando' AND heartbeat_at < %s
+    """, (limite,))
+    conn.commit()
+    total = cursor.rowcount
+    cursor.close()
+    conn.close()
+    return total
+
+
+def _carregar_tarefas():
+    """Importa os módulos que registram tarefas com @tarefa."""
+    import auditoria  # noqa: F401
+    import estoque  # noqa: F401
+    import reservas  # noqa: F401
+    import resumos  # noqa: F401
+
+
+def rodar_worker(intervalo=INTERVALO_FILA):
+    """Laço de um processo worker: executa jobs até receber SIGTERM/SIGINT."""
+    import db
+
+    # o fork herda o pool SQLite do processo pai (aberto por recuperar_orfaos);
+    # uma conexão sqlite3 não pode ser usada dos dois lados do fork
+    db.configurar_pool(db.SQLITE_POOL_MAX)
+    _carregar_tarefas()
+    parar = []
+    signal.signal(signal.SIGTERM, lambda *_: parar.append(True))
+    signal.signal(signal.SIGINT, lambda *_: parar.append(True))
+    nome = f"{socket.gethostname()}:{os.getpid()}"
+
+    falhas = 0
+    while not parar:
+        try:
+            linha = _reivindicar(nome)
+            if linha is None:
+                time.sleep(intervalo)
+                continue
+            _executar(linha, interrompido=lambda: bool(parar))
+            falhas = 0
+        except Exception:
+            # banco travado ou conexão perdida: o processo continua vivo e
+            # tenta de novo, esperando mais a cada falha seguida; um job que
+            # ficou em 'executando' volta à fila pela recuperação de órfãos
+            falhas += 1
+            espera = min(intervalo * 2 ** (falhas - 1), ESPERA_MAX_FALHAS)
+            print(f"[jobs {nome}] erro no laço do worker (falha {falhas}), "
+                  f"nova tentativa em {espera:.1f}s", file=sys.stderr)
+            traceback.print_exc(limit=5)
+            time.sleep(espera)
+
+
+# =========================
+# TAREFAS
+# =========================
+
+LOTE_EXPORTACAO = 5000
+
+
+def _exportar_csv(job, nome, cabecalho, sql_total, sql, params=()):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    arquivo = f"{nome}-{job.id}.csv"
+    caminho = os.path.join(EXPORT_DIR, arquivo)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql_total, params)
+    total = cursor.fetchone()[0]
+    cursor.execute(sql, params)
+
+    feitas = 0
+    try:
+        with open(caminho + ".tmp", "w", newline="", encoding="utf-8-sig") as f:
+            escritor = csv.writer(f, delimiter=";")
+            escritor.writerow(cabecalho)
+            while True:
+                linhas = cursor.fetchmany(LOTE_EXPORTACAO)
+                if not linhas:
+                    break
+                escritor.writerows(linhas)
+                feitas += len(linhas)
+                job.progresso(feitas, total, f"{feitas} de {total} linhas")
+        os.replace(caminho + ".tmp", caminho)
+    except BaseException:
+        if os.path.exists(caminho + ".tmp"):
+            os.remove(caminho + ".tmp")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return {"arquivo": arquivo, "linhas": feitas}
+
+
+@tarefa("exportar_logs")
+def exportar_logs(job, inicio=None, fim=None):
+    """CSV dos logs de acesso, opcionalmente entre as datas `inicio` e `fim`."""
+    filtro, params = [], []
+    if inicio:
+        filtro.append("l.created_at >= %s")
+        params.append(inicio)
+    if fim:
+        filtro.append("l.created_at < %s")
+        params.append(fim)
+    where = ("WHERE " + " AND ".join(filtro)) if filtro else ""
+    return _exportar_csv(
+        job, "logs",
+        ("id", "data", "usuario", "acao", "detalhes", "entidade", "entidade_id", "quantidade", "valor"),
+        f"SELECT COUNT(*) FROM access_logs l {where}",
+        f"""
+            SELECT l.id, l.created_at, u.username, l.action, l.details,
+                   l.entity_type, l.entity_id, l.quantity, l.value
+            FROM access_logs l
+            LEFT JOIN users u ON u.id = l.user_id
+            {where}
+            ORDER BY l.id
+        """,
+        tuple(params),
+    )
+
+
+@tarefa("exportar_recursos")
+def exportar_recursos(job):
+    """CSV de todos os recursos com tipo, estoque e preço."""
+    return _exportar_csv(
+        job, "recursos",
+        ("id", "nome", "tipo", "localizacao", "status", "preco", "quantidade", "criado_em"),
+        "SELECT COUNT(*) FROM resources",
+        """
+            SELECT r.id, r.name, rt.name, r.location, r.status, r.price, r.quantity, r.created_at
+            FROM resources r
+            JOIN resource_types rt ON rt.id = r.type_id
+            ORDER BY r.id
+        """,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processos que executam as tarefas em segundo plano")
+    parser.add_argument("--processos", type=int, default=int(os.getenv("WAYNE_JOBS_PROCESSES") or 2))
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_FILA,
+                        help="segundos entre consultas à fila quando ela está vazia")
+    args = parser.parse_args()
+
+    recuperados = recuperar_orfaos()
+    if recuperados:
+        print(f"{recuperados} job(s) órfão(s) devolvido(s) à fila", file=sys.stderr)
+
+    import multiprocessing
+
+    def novo_processo():
+        p = multiprocessing.Process(target=rodar_worker, args=(args.intervalo,), daemon=False)
+        p.start()
+        return p
+
+    processos = [novo_processo() for _ in range(args.processos)]
+    print(f"{len(processos)} processo(s) de tarefas rodando; Ctrl+C para parar", file=sys.stderr)
+
+    parando = []
+
+    def encerrar(*_):
+        parando.append(True)
+        for p in processos:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    proxima_recuperacao = time.monotonic() + LIMITE_ORFAO / 10
+    try:
+        while any(p.is_alive() for p in processos):
+            time.sleep(INTERVALO_SUPERVISAO)
+            for i, p in enumerate(processos):
+                if parando or p.is_alive() or p.exitcode == 0:
+                    continue
+                # morreu sem ter sido mandado parar: sobe outro no lugar
+                print(f"processo de tarefas {p.pid} saiu com código {p.exitcode}; "
+                      f"subindo outro", file=sys.stderr)
+                processos[i] = novo_processo()
+            if not parando and time.monotonic() >= proxima_recuperacao:
+                proxima_recuperacao = time.monotonic() + LIMITE_ORFAO / 10
+                try:
+                    recuperar_orfaos()
+                except Exception:
+                    traceback.print_exc(limit=5)
+    except KeyboardInterrupt:
+        encerrar()
+    for p in processos:
+        p.join()
+
+
+if __name__ == "__main__":
+    # roda pelo módulo importado, para as tarefas registradas em outros
+    # módulos (ex.: estoque.py) caírem no mesmo registro TAREFAS
+    import jobs
+    jobs.main()
@@ -0,0 +1,181 @@
+# limites.py
+"""
+Limite de requisições por balde de fichas (token bucket).
+
+Cada chave (rota + IP, rota + usuário, ...) tem um balde com `capacidade`
+fichas que se repõe a `por_segundo` fichas por segundo; cada requisição
+gasta uma. Sem ficha, a rota responde 429 com Retry-After.
+
+Os baldes ficam na memória do processo. Com vários workers, defina
+WAYNE_RATE_LIMIT_FILE: os baldes passam para um arquivo SQLite local
+compartilhado pelos processos da máquina, e o limite vale para todos juntos.
+WAYNE_RATE_LIMIT=0 desliga os limites.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request, session
+
+import metricas
+
+ATIVO = (os.getenv("WAYNE_RATE_LIMIT") or "1") != "0"
+ARQUIVO = os.getenv("WAYNE_RATE_LIMIT_FILE") or ""
+BALDES_MAX = 100000
+# baldes parados há mais que isso estão cheios de novo: podem ser apagados
+OCIOSO = 3600
+
+
+class BaldesMemoria:
+    """Baldes na memória do processo (LRU limitado a `maximo` chaves)."""
+
+    def __init__(self, maximo=BALDES_MAX):
+        self.maximo = maximo
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, capacidade, por_segundo):
+        """Gasta uma ficha. Devolve 0 se conseguiu, ou os segundos até a próxima ficha."""
+        agora = time.monotonic()
+        with self._lock:
+            fichas, antes = self._baldes.get(chave, (capacidade, agora))
+            fichas = min(capacidade, fichas + (agora - antes) * por_segundo)
+            espera = 0.0 if fichas >= 1 else (1 - fichas) / por_segundo
+            self._baldes[chave] = (fichas - 1 if fichas >= 1 else fichas, agora)
+            self._baldes.move_to_end(chave)
+            while len(self._baldes) > self.maximo:
+                self._baldes.popitem(last=False)
+        return espera
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+class BaldesSQLite:
+    """Baldes num arquivo SQLite local, compartilhados entre os processos."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._chamadas = 0
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=1, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS baldes (
+                    chave TEXT PRIMARY KEY,
+                    fichas REAL NOT NULL,
+                    atualizado REAL NOT NULL
+                )
+            """)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def consumir(self, chave, capacidade, por_segundo):
+        conn = self._conexao()
+        agora = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conn.execute(
+                "SELECT fichas, atualizado FROM baldes WHERE chave = ?", (chave,)
+            ).fetchone()
+            fichas, antes = linha if linha else (capacidade, agora)
+            fichas = min(capacidade, fichas + max(agora - antes, 0) * por_segundo)
+            espera = 0.0 if fichas >= 1 else (1 - fichas) / por_segundo
+            conn.execute(
+                "INSERT OR REPLACE INTO baldes (chave, fichas, atualizado) VALUES (?, ?, ?)",
+                (chave, fichas - 1 if fichas >= 1 else fichas, agora),
+            )
+            self._chamadas += 1
+            if self._chamadas % 1000 == 0:
+                conn.execute("DELETE FROM baldes WHERE atualizado < ?", (agora - OCIOSO,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return espera
+
+    def __len__(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM baldes").fetchone()[0]
+
+
+baldes = BaldesSQLite(ARQUIVO) if ARQUIVO else BaldesMemoria()
+
+
+def consumir(nome, chave, capacidade, por_segundo):
+    """
+    Gasta uma ficha do balde `nome:chave`. Devolve 0 se a requisição pode
+    seguir, ou os segundos de espera. Se o arquivo compartilhado falhar,
+    deixa passar (o limite não pode derrubar a rota).
+    """
+    if not ATIVO:
+        return 0.0
+    try:
+        espera = baldes.consumir(f"{nome}:{chave}", capacidade, por_segundo)
+    except sqlite3.Error:
+        metricas.registro.contar("wayne_rate_limit_requests_total", limite=nome, result="erro")
+        return 0.0
+    metricas.registro.contar("wayne_rate_limit_requests_total", limite=nome,
+                             result="limitado" if espera else "permitido")
+    return espera
+
+
+def ip_cliente():
+    return request.remote_addr or "-"
+
+
+def por_usuario():
+    return f"u{session['user_id']}" if "user_id" in session else f"ip{ip_cliente()}"
+
+
+def resposta_429(espera, mensagem="Muitas requisições; tente novamente em instantes."):
+    resposta = jsonify({"ok": False, "error": mensagem})
+    resposta.status_code = 429
+    resposta.headers["Retry-After"] = str(retry_after(espera))
+    return resposta
+
+
+def retry_after(espera):
+    return max(1, math.ceil(espera))
+
+
+def limitar(nome, capacidade, por_segundo, chave=ip_cliente, ao_exceder=None, metodos=None):
+    """
+    Decorador: aplica o balde `nome` à rota, uma ficha por requisição
+    (só nos `metodos` indicados, se houver). `chave()` escolhe de quem é o
+    balde (padrão: IP do cliente); `ao_exceder(espera)` monta a resposta 429
+    (padrão: JSON).
+    """
+    def wrapper(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if metodos and request.method not in metodos:
+                return f(*args, **kwargs)
+            espera = consumir(nome, chave(), capacidade, por_segundo)
+            if espera:
+                return (ao_exceder or resposta_429)(espera)
+            return f(*args, **kwargs)
+        return decorated
+    return wrapper
+
+
+def _gauges():
+    if not ATIVO:
+        return []
+    try:
+        return [("wayne_rate_limit_buckets", {}, len(baldes))]
+    except sqlite3.Error:
+        return []
+
+
+def init_app(app):
+    metricas.registro.registrar_gauge(_gauges)
@@ -0,0 +1,114 @@
+# log_consultas.py
+"""
+Log de consultas lentas e detector de consultas repetidas por requisição.
+
+Modo (WAYNE_QUERY_LOG):
+- off  (padrão): nada é registrado.
+- prod: grava só consultas acima de WAYNE_SLOW_QUERY_MS e os alertas
+        de consultas repetidas / orçamento de consultas estourado.
+- dev:  grava também cada consulta executada.
+
+A saída é um arquivo JSON Lines (WAYNE_QUERY_LOG_FILE), uma ocorrência por linha.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+
+import db
+
+MODO = (os.getenv("WAYNE_QUERY_LOG") or "off").strip().lower()
+LIMITE_LENTA_MS = float(os.getenv("WAYNE_SLOW_QUERY_MS") or 100)
+ORCAMENTO = int(os.getenv("WAYNE_QUERY_BUDGET") or 10)
+LIMITE_REPETICAO = int(os.getenv("WAYNE_QUERY_REPEAT") or 3)
+ARQUIVO = os.getenv("WAYNE_QUERY_LOG_FILE") or os.path.join(db.BASE_DIR, "logs", "consultas.jsonl")
+
+_logger = logging.getLogger("wayne.consultas")
+_logger.propagate = False
+
+_RE_ESPACOS = re.compile(r"\s+")
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)")
+
+
+def formato(sql):
+    """
+    Normaliza a consulta para comparar "a mesma consulta" com valores diferentes:
+    literais viram ?, listas IN (...) viram (?+) e espaços são colapsados.
+    """
+    sql = _RE_TEXTO.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_LISTA.sub("(?+)", sql)
+    return _RE_ESPACOS.sub(" ", sql).strip()
+
+
+def _gravar(registro):
+    registro["ts"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    registro["pid"] = os.getpid()
+    _logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def _origem():
+    if has_request_context():
+        return {"rota": request.endpoint, "metodo": request.method, "caminho": request.path}
+    return {"rota": None}
+
+
+def _observador(evento, sql, duracao, n_params):
+    if evento != "execute":
+        return
+
+    duracao_ms = duracao * 1000
+    forma = formato(sql)
+
+    if has_request_context() and "_consultas" in g:
+        g._consultas.append((forma, duracao_ms))
+
+    if MODO == "dev":
+        _gravar(dict(_origem(), tipo="consulta", sql=forma, duracao_ms=round(duracao_ms, 3), n_params=n_params))
+
+    if duracao_ms >= LIMITE_LENTA_MS:
+        _gravar(dict(_origem(), tipo="lenta", sql=forma, duracao_ms=round(duracao_ms, 3), n_params=n_params,
+                     limite_ms=LIMITE_LENTA_MS))
+
+
+def _inicio_requisicao():
+    g._consultas = []
+
+
+def _fim_requisicao(exc=None):
+    consultas = g.pop("_consultas", None)
+    if not consultas:
+        return
+
+    origem = _origem()
+    total = len(consultas)
+    tempo_total = round(sum(d for _, d in consultas), 3)
+
+    for forma, vezes in Counter(f for f, _ in consultas).items():
+        if vezes >= LIMITE_REPETICAO:
+            _gravar(dict(origem, tipo="repetida", sql=forma, vezes=vezes, consultas=total))
+
+    if total > ORCAMENTO:
+        _gravar(dict(origem, tipo="orcamento", consultas=total, orcamento=ORCAMENTO, duracao_ms=tempo_total))
+
+
+def init_app(app):
+    if MODO not in ("dev", "prod"):
+        return
+
+    os.makedirs(os.path.dirname(ARQUIVO), exist_ok=True)
+    handler = logging.handlers.WatchedFileHandler(ARQUIVO, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+
+    db.adicionar_observador(_observador)
+    app.before_request(_inicio_requisicao)
+    app.teardown_request(_fim_requisicao)
@@ -0,0 +1,252 @@
+# metricas.py
+"""
+Instrumentação por requisição: cabeçalho Server-Timing em toda resposta
+e endpoint /metrics no formato texto do Prometheus.
+
+As métricas ficam na memória de cada processo (cada worker expõe as suas).
+Se WAYNE_METRICS_TOKEN estiver definido, /metrics exige
+"Authorization: Bearer <token>".
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, before_render_template, g, has_request_context, request, template_rendered
+
+import db
+
+METRICS_TOKEN = os.getenv("WAYNE_METRICS_TOKEN") or ""
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+AJUDA = {
+    "wayne_http_request_duration_seconds": ("histogram", "Duração das requisições por endpoint."),
+    "wayne_http_requests_total": ("counter", "Requisições atendidas por endpoint e status."),
+    "wayne_db_queries_total": ("counter", "Consultas SQL executadas por endpoint."),
+    "wayne_db_operation_seconds_total": ("counter", "Tempo acumulado em connect/execute/commit."),
+    "wayne_db_operations_total": ("counter", "Quantidade de connect/execute/commit."),
+    "wayne_template_render_seconds_total": ("counter", "Tempo acumulado de renderização por template."),
+    "wayne_outbound_http_seconds_total": ("counter", "Tempo acumulado em chamadas HTTP externas."),
+    "wayne_cache_requests_total": ("counter", "Consultas a caches internos por resultado (hit/miss)."),
+    "wayne_cache_hit_ratio": ("gauge", "Proporção de hits por cache."),
+    "wayne_db_pool": ("gauge", "Estado do pool de conexões do processo."),
+    "wayne_compression_bytes_total": ("counter", "Bytes antes (in) e depois (out) da compressão."),
+    "wayne_rate_limit_requests_total": ("counter", "Requisições avaliadas pelo limitador, por limite e resultado."),
+    "wayne_rate_limit_buckets": ("gauge", "Baldes de fichas guardados pelo limitador."),
+}
+
+
+def _chave(nome, labels):
+    return nome, tuple(sorted(labels.items()))
+
+
+class _Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+        self._gauges = []
+
+    def contar(self, nome, valor=1, **labels):
+        chave = _chave(nome, labels)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **labels):
+        chave = _chave(nome, labels)
+        with self._lock:
+            hist = self._histogramas.get(chave)
+            if hist is None:
+                hist = self._histogramas[chave] = [0] * len(BUCKETS) + [0.0, 0]
+            for i, limite in enumerate(BUCKETS):
+                if valor <= limite:
+                    hist[i] += 1
+            hist[-2] += valor
+            hist[-1] += 1
+
+    def registrar_gauge(self, fn):
+        """fn() devolve uma lista de (nome, labels, valor)."""
+        self._gauges.append(fn)
+
+    def contador(self, nome, **labels):
+        with self._lock:
+            return self._contadores.get(_chave(nome, labels), 0)
+
+    def exportar(self):
+        linhas = []
+        vistos = set()
+
+        def cabecalho(nome):
+            if nome in vistos:
+                return
+            vistos.add(nome)
+            tipo, texto = AJUDA.get(nome, ("untyped", ""))
+            linhas.append(f"# HELP {nome} {texto}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((k, list(v)) for k, v in self._histogramas.items())
+
+        for (nome, labels), valor in contadores:
+            cabecalho(nome)
+            linhas.append(f"{nome}{_labels(labels)} {_num(valor)}")
+
+        for (nome, labels), hist in histogramas:
+            cabecalho(nome)
+            for i, limite in enumerate(BUCKETS):
+                linhas.append(f"{nome}_bucket{_labels(labels + (('le', _num(limite)),))} {hist[i]}")
+            linhas.append(f"{nome}_bucket{_labels(labels + (('le', '+Inf'),))} {hist[-1]}")
+            linhas.append(f"{nome}_sum{_labels(labels)} {_num(hist[-2])}")
+            linhas.append(f"{nome}_count{_labels(labels)} {hist[-1]}")
+
+        for fn in self._gauges:
+            for nome, labels, valor in fn():
+                cabecalho(nome)
+                linhas.append(f"{nome}{_labels(tuple(sorted(labels.items())))} {_num(valor)}")
+
+        return "\n".join(linhas) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    partes = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _num(valor):
+    if isinstance(valor, float):
+        return repr(round(valor, 6))
+    return str(valor)
+
+
+registro = _Registro()
+
+
+# ===== API usada pelo app =====
+
+def contar_cache(nome, hit, quantidade=1):
+    registro.contar("wayne_cache_requests_total", quantidade, cache=nome, result="hit" if hit else "miss")
+
+
+@contextmanager
+def medir(nome):
+    """Acumula o tempo do bloco no Server-Timing da requisição atual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _acumular(nome, time.perf_counter() - inicio)
+
+
+@contextmanager
+def medir_http(destino):
+    """Mede uma chamada HTTP externa (ex.: Unsplash)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        dur = time.perf_counter() - inicio
+        registro.contar("wayne_outbound_http_seconds_total", dur, destino=destino)
+        _acumular("http", dur)
+
+
+def _acumular(nome, duracao, qtd=0):
+    if not has_request_context() or "_tempos" not in g:
+        return
+    atual = g._tempos.get(nome, (0.0, 0))
+    g._tempos[nome] = (atual[0] + duracao, atual[1] + qtd)
+
+
+# ===== Ganchos =====
+
+_NOMES_DB = {"connect": "conexao", "execute": "consultas", "commit": "commit"}
+
+
+def _observador_db(evento, sql, duracao, n_params):
+    registro.contar("wayne_db_operations_total", op=evento)
+    registro.contar("wayne_db_operation_seconds_total", duracao, op=evento)
+    _acumular(_NOMES_DB[evento], duracao, 1)
+
+
+def _antes_template(sender, template, context, **extra):
+    if has_request_context() and "_tempos" in g:
+        g._templates.append(time.perf_counter())
+
+
+def _template_renderizado(sender, template, context, **extra):
+    if not has_request_context() or "_tempos" not in g or not g._templates:
+        return
+    dur = time.perf_counter() - g._templates.pop()
+    registro.contar("wayne_template_render_seconds_total", dur, template=template.name or "?")
+    _acumular("template", dur)
+
+
+def _gauges_cache():
+    with registro._lock:
+        itens = [(dict(labels), v) for (nome, labels), v in registro._contadores.items()
+                 if nome == "wayne_cache_requests_total"]
+    totais = {}
+    for labels, v in itens:
+        hits, total = totais.get(labels["cache"], (0, 0))
+        totais[labels["cache"]] = (hits + (v if labels["result"] == "hit" else 0), total + v)
+    return [("wayne_cache_hit_ratio", {"cache": nome}, hits / total if total else 0.0)
+            for nome, (hits, total) in sorted(totais.items())]
+
+
+def _gauges_pool():
+    return [("wayne_db_pool", {"backend": db.DB_BACKEND, "state": k}, v)
+            for k, v in sorted(db.estatisticas_pool().items())]
+
+
+def _inicio_requisicao():
+    g._inicio = time.perf_counter()
+    g._tempos = {}
+    g._templates = []
+
+
+def _server_timing(response):
+    if "_inicio" not in g:
+        return response
+
+    total = time.perf_counter() - g._inicio
+    endpoint = request.endpoint or "desconhecido"
+    tempos = g._tempos
+    consultas = tempos.get("consultas", (0.0, 0))[1]
+
+    registro.observar("wayne_http_request_duration_seconds", total, endpoint=endpoint)
+    registro.contar("wayne_http_requests_total", endpoint=endpoint, status=response.status_code)
+    if consultas:
+        registro.contar("wayne_db_queries_total", consultas, endpoint=endpoint)
+
+    partes = []
+    for nome, (dur, qtd) in tempos.items():
+        parte = f"{nome};dur={dur * 1000:.2f}"
+        if qtd:
+            parte += f';desc="{qtd}"'
+        partes.append(parte)
+    partes.append(f"total;dur={total * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(partes)
+    return response
+
+
+def metrics_view():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        abort(401)
+    return Response(registro.exportar(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    app.before_request(_inicio_requisicao)
+    app.after_request(_server_timing)
+    before_render_template.connect(_antes_template, app)
+    template_rendered.connect(_template_renderizado, app)
+    db.adicionar_observador(_observador_db)
+    registro.registrar_gauge(_gauges_cache)
+    registro.registrar_gauge(_gauges_pool)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
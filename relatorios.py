@@ -0,0 +1,111 @@
+# relatorios.py
+"""
+Relatório de valorização do estoque (SUM(price * quantity)).
+
+Uma única consulta agrupa os recursos por tipo, localização e status; os
+subtotais por tipo, por localização, por status e o total geral são somados
+em Python a partir desses grupos (poucas linhas, mesmo com 100 mil recursos).
+
+O resultado fica em cache pela versão das tabelas `resources` e
+`resource_types` (table_versions, mantida por triggers): qualquer rota que
+altera um recurso muda a versão, e a próxima leitura recalcula. Como a
+versão está no banco, todos os workers enxergam a invalidação.
+"""
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import metricas
+from db import get_connection
+
+TABELAS = ("resources", "resource_types")
+SEM_LOCAL = "(sem localização)"
+
+_cache = {"chave": None, "dados": None}
+_lock = threading.Lock()
+
+
+def _versoes(cursor):
+    cursor.execute(
+        "SELECT name, version FROM table_versions WHERE name IN (%s, %s)", TABELAS
+    )
+    versoes = dict(cursor.fetchall())
+    return tuple(versoes.get(t, 0) for t in TABELAS)
+
+
+def _vazio():
+    return {"recursos": 0, "quantidade": 0, "valor": Decimal("0.00")}
+
+
+def _somar(destino, grupo):
+    destino["recursos"] += grupo["recursos"]
+    destino["quantidade"] += grupo["quantidade"]
+    destino["valor"] += grupo["valor"]
+
+
+def _ordenado(por_chave):
+    """Lista de {nome, recursos, quantidade, valor}, do maior valor para o menor."""
+    linhas = [{"nome": nome, **valores} for nome, valores in por_chave.items()]
+    return sorted(linhas, key=lambda l: (-l["valor"], l["nome"]))
+
+
+def _calcular(cursor):
+    cursor.execute("""
+        SELECT rt.name AS tipo,
+               r.location AS localizacao,
+               r.status AS status,
+               COUNT(*) AS recursos,
+               COALESCE(SUM(r.quantity), 0) AS quantidade,
+               COALESCE(SUM(r.price * r.quantity), 0) AS valor
+        FROM resources r
+        JOIN resource_types rt ON rt.id = r.type_id
+        GROUP BY rt.name, r.location, r.status
+    """)
+
+    por_tipo, por_local, por_status = {}, {}, {}
+    tipo_status = {}
+    total = _vazio()
+    for linha in cursor.fetchall():
+        grupo = {
+            "recursos": int(linha[3]),
+            "quantidade": int(linha[4]),
+            # SQLite devolve float; arredonda para centavos como o MySQL (DECIMAL)
+            "valor": Decimal(str(linha[5])).quantize(Decimal("0.01")),
+        }
+        tipo, local, status = linha[0], linha[1] or SEM_LOCAL, linha[2]
+        _somar(por_tipo.setdefault(tipo, _vazio()), grupo)
+        _somar(por_local.setdefault(local, _vazio()), grupo)
+        _somar(por_status.setdefault(status, _vazio()), grupo)
+        _somar(tipo_status.setdefault(tipo, {}).setdefault(status, _vazio()), grupo)
+        _somar(total, grupo)
+
+    return {
+        "gerado_em": datetime.now().replace(microsecond=0),
+        "total": total,
+        "por_tipo": _ordenado(por_tipo),
+        "por_localizacao": _ordenado(por_local),
+        "por_status": _ordenado(por_status),
+        "tipo_por_status": {tipo: _ordenado(v) for tipo, v in sorted(tipo_status.items())},
+    }
+
+
+def valorizacao():
+    """Relatório de valorização (do cache, se nenhum recurso mudou desde o último cálculo)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        chave = _versoes(cursor)
+        with _lock:
+            if _cache["chave"] == chave:
+                metricas.contar_cache("relatorios", True)
+                return _cache["dados"]
+        metricas.contar_cache("relatorios", False)
+        with metricas.medir("relatorio"):
+            dados = _calcular(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
+    with _lock:
+        _cache["chave"], _cache["dados"] = chave, dados
+    return dados
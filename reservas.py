@@ -0,0 +1,148 @@
+# reservas.py
+"""
+Expiração das reservas de estoque.
+
+A solicitação de baixa já retira a quantidade do estoque (reserva). Se ela
+fica em 'pendente' além de WAYNE_RESERVA_HORAS, expirar() muda o status para
+'expirado' e devolve a quantidade ao estoque.
+
+O trabalho é feito em lotes de WAYNE_RESERVA_LOTE solicitações, cada um na
+sua transação curta: um UPDATE condicional das solicitações, um UPDATE para
+todos os recursos do lote, as movimentações em lote e uma linha de auditoria
+por lote. Entre os lotes há uma pausa para não disputar o banco com as rotas.
+Se algo expirou, publica o evento `pendencias` (badge de baixas); rodando
+fora dos workers web, ele chega às páginas abertas por WAYNE_EVENTS_FILE.
+
+Uso (agendar, ou deixar rodando com --intervalo):
+    python reservas.py [--intervalo SEGUNDOS]
+ou enfileirar a tarefa `expirar_reservas` em jobs.py.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import estoque
+import eventos
+import jobs
+from db import get_connection
+
+HORAS = float(os.getenv("WAYNE_RESERVA_HORAS") or 72)
+LOTE = int(os.getenv("WAYNE_RESERVA_LOTE") or 200)
+PAUSA_LOTE = 0.05
+TENTATIVAS_LOTE = 3
+
+
+def _agora_banco(cursor):
+    # created_at é gravado pelo banco (CURRENT_TIMESTAMP): o corte usa o
+    # relógio dele, não o do processo (no SQLite é UTC)
+    cursor.execute("SELECT CURRENT_TIMESTAMP")
+    agora = cursor.fetchone()[0]
+    if isinstance(agora, str):
+        agora = datetime.strptime(agora, "%Y-%m-%d %H:%M:%S")
+    return agora
+
+
+def _expirar_lote(conn, cursor, corte, lote):
+    """
+    Expira até `lote` solicitações pendentes criadas antes de `corte`.
+    Devolve a lista de (id, recurso_id, quantidade) expiradas (vazia se acabou).
+    """
+    for _ in range(TENTATIVAS_LOTE):
+        cursor.execute("""
+            SELECT id, resource_id, quantity FROM resource_requests
+            WHERE status = 'pendente' AND created_at < %s
+            ORDER BY id
+            LIMIT %s
+        """, (corte, lote))
+        solicitacoes = [tuple(l) for l in cursor.fetchall()]
+        if not solicitacoes:
+            return []
+
+        ids = [s[0] for s in solicitacoes]
+        cursor.execute(f"""
+            UPDATE resource_requests
+            SET status = 'expirado', decided_at = CURRENT_TIMESTAMP
+            WHERE status = 'pendente' AND id IN ({", ".join(["%s"] * len(ids))})
+        """, ids)
+        if cursor.rowcount != len(ids):
+            # alguma foi aprovada/rejeitada entre o SELECT e o UPDATE: refaz o lote
+            conn.rollback()
+            continue
+
+        estoque.devolver_solicitacoes(cursor, solicitacoes, "expiracao")
+        recursos = sorted({s[1] for s in solicitacoes})
+        unidades = sum(s[2] for s in solicitacoes)
+        cursor.execute(
+            "INSERT INTO access_logs (user_id, action, details, quantity) VALUES (%s, %s, %s, %s)",
+            (None, "expirou reservas",
+             f"{len(ids)} solicitação(ões) pendentes desde antes de {corte:%Y-%m-%d %H:%M}: "
+             f"IDs {ids[0]}–{ids[-1]}, {len(recursos)} recurso(s), "
+             f"{unidades} unidade(s) devolvida(s)",
+             unidades)
+        )
+        conn.commit()
+        return solicitacoes
+    raise RuntimeError("Não foi possível expirar o lote: solicitações alteradas em paralelo.")
+
+
+def expirar(horas=None, lote=None, job=None):
+    """
+    Expira todas as reservas pendentes há mais de `horas` horas, em lotes.
+    Devolve {"solicitacoes": n, "lotes": n}.
+    """
+    horas = HORAS if horas is None else float(horas)
+    lote = lote or LOTE
+    if horas <= 0:
+        return {"solicitacoes": 0, "lotes": 0}
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    total = lotes = 0
+    try:
+        corte = _agora_banco(cursor) - timedelta(hours=horas)
+        while True:
+            expiradas = _expirar_lote(conn, cursor, corte, lote)
+            if not expiradas:
+                break
+            total += len(expiradas)
+            lotes += 1
+            if job is not None:
+                job.progresso(lotes, mensagem=f"{total} reserva(s) expirada(s)")
+            time.sleep(PAUSA_LOTE)
+        if total:
+            eventos.publicar_pendencias(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return {"solicitacoes": total, "lotes": lotes}
+
+
+@jobs.tarefa("expirar_reservas")
+def _tarefa_expirar(job):
+    return expirar(job.params.get("horas"), job.params.get("lote"), job=job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expira reservas de estoque pendentes há muito tempo")
+    parser.add_argument("--horas", type=float, default=HORAS,
+                        help="idade mínima da solicitação pendente (padrão: WAYNE_RESERVA_HORAS)")
+    parser.add_argument("--lote", type=int, default=LOTE)
+    parser.add_argument("--intervalo", type=float, default=0,
+                        help="repete a cada N segundos (0 = roda uma vez)")
+    args = parser.parse_args()
+
+    while True:
+        r = expirar(args.horas, args.lote)
+        print(f"{r['solicitacoes']} reserva(s) expirada(s) em {r['lotes']} lote(s)", file=sys.stderr)
+        if args.intervalo <= 0:
+            break
+        time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# resumos.py
+"""
+Resumo diário das solicitações de baixa (request_daily_rollups).
+
+Cada linha soma, por dia, tipo de recurso e faixa de valor, o que foi
+solicitado, aprovado e rejeitado, mais o tempo até a aprovação. As rotas de
+solicitar/aprovar/rejeitar chamam registrar_*() com o próprio cursor, antes
+do commit: o resumo muda na mesma transação da solicitação.
+
+- solicitado: conta no dia em que a solicitação foi criada;
+- aprovado/rejeitado: conta no dia da decisão (decided_at);
+- latência: segundos entre a criação e a aprovação final.
+
+A tela de tendências lê só esta tabela, nunca resource_requests.
+reconstruir() recalcula tudo a partir do histórico (depois de uma
+importação, ou em bancos anteriores ao resumo):
+    python resumos.py reconstruir [--desde AAAA-MM-DD]
+"""
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import jobs
+from db import get_connection, sql_upsert_soma
+
+TABELA = "request_daily_rollups"
+CHAVES = ("day", "resource_type_id", "value_band")
+COLUNAS = (
+    "requested_count", "requested_quantity", "requested_value",
+    "approved_count", "approved_quantity", "approved_value",
+    "rejected_count", "rejected_quantity", "rejected_value",
+    "latency_count", "latency_seconds",
+)
+
+# faixas de valor: o limite de 10.000 é o mesmo da regra de aprovação dupla
+FAIXAS = (
+    ("ate_1000", "até 1.000"),
+    ("1000_10000", "1.000 a 10.000"),
+    ("acima_10000", "acima de 10.000"),
+)
+
+LOTE_RECONSTRUCAO = 1000
+CENTAVOS = Decimal("0.01")
+
+
+def faixa(valor):
+    valor = Decimal(str(valor or 0))
+    if valor <= 1000:
+        return "ate_1000"
+    if valor <= 10000:
+        return "1000_10000"
+    return "acima_10000"
+
+
+def _dia(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _segundos(inicio, fim):
+    return max(int((fim - inicio).total_seconds()), 0)
+
+
+def _parametros(chave, valores):
+    dia, tipo_id, faixa_valor = chave
+    params = [_dia(dia).isoformat(), tipo_id, faixa_valor]
+    for coluna in COLUNAS:
+        valor = valores.get(coluna, 0)
+        params.append(float(valor) if coluna.endswith("_value") else int(valor))
+    return params
+
+
+def _somar(cursor, chave, **valores):
+    cursor.execute(sql_upsert_soma(cursor.dialect, TABELA, CHAVES, COLUNAS),
+                   _parametros(chave, valores))
+
+
+def _solicitacao(cursor, solicitacao_id):
+    cursor.execute("""
+        SELECT rr.quantity, rr.total_value, rr.created_at, rr.decided_at, r.type_id
+        FROM resource_requests rr
+        JOIN resources r ON r.id = rr.resource_id
+        WHERE rr.id = %s
+    """, (solicitacao_id,))
+    linha = cursor.fetchone()
+    if linha is None:
+        raise ValueError(f"Solicitação {solicitacao_id} não encontrada.")
+    if not isinstance(linha, dict):
+        linha = dict(zip(("quantity", "total_value", "created_at", "decided_at", "type_id"), linha))
+    return linha
+
+
+# =========================
+# ATUALIZAÇÃO INCREMENTAL
+# =========================
+
+def registrar_solicitacao(cursor, solicitacao_id):
+    """Conta uma solicitação recém-criada (chamar depois do INSERT, antes do commit)."""
+    s = _solicitacao(cursor, solicitacao_id)
+    _somar(cursor, (s["created_at"], s["type_id"], faixa(s["total_value"])),
+           requested_count=1,
+           requested_quantity=s["quantity"],
+           requested_value=s["total_value"])
+
+
+def registrar_aprovacao(cursor, solicitacao_id):
+    """Conta a aprovação final (status 'aprovado' e decided_at já gravados)."""
+    s = _solicitacao(cursor, solicitacao_id)
+    _somar(cursor, (s["decided_at"], s["type_id"], faixa(s["total_value"])),
+           approved_count=1,
+           approved_quantity=s["quantity"],
+           approved_value=s["total_value"],
+           latency_count=1,
+           latency_seconds=_segundos(s["created_at"], s["decided_at"]))
+
+
+def registrar_rejeicao(cursor, solicitacao_id, status_anterior, decidida_em_anterior):
+    """
+    Conta a rejeição (decided_at já gravado). Se a solicitação estava
+    aprovada, desfaz a aprovação no dia em que ela tinha sido contada.
+    """
+    s = _solicitacao(cursor, solicitacao_id)
+    banda = faixa(s["total_value"])
+    if status_anterior == "aprovado":
+        _somar(cursor, (decidida_em_anterior or s["created_at"], s["type_id"], banda),
+               approved_count=-1,
+               approved_quantity=-s["quantity"],
+               approved_value=-Decimal(str(s["total_value"])),
+               latency_count=-1 if decidida_em_anterior else 0,
+               latency_seconds=-_segundos(s["created_at"], decidida_em_anterior)
+               if decidida_em_anterior else 0)
+    _somar(cursor, (s["decided_at"], s["type_id"], banda),
+           rejected_count=1,
+           rejected_quantity=s["quantity"],
+           rejected_value=s["total_value"])
+
+
+# =========================
+# RECONSTRUÇÃO
+# =========================
+
+def reconstruir(desde=None, job=None):
+    """
+    Recalcula o resumo a partir de resource_requests (a partir do dia
+    `desde`, ou tudo). Lê as solicitações em lotes e agrega em memória;
+    as linhas do período são trocadas numa transação só.
+    Devolve quantas linhas de resumo foram gravadas.
+    """
+    desde = _dia(desde) if desde else None
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM resource_requests")
+        total = cursor.fetchone()[0]
+
+        # o período inclui solicitações criadas antes de `desde` mas decididas depois
+        cursor.execute("""
+            SELECT rr.quantity, rr.total_value, rr.status, rr.created_at, rr.decided_at, r.type_id
+            FROM resource_requests rr
+            JOIN resources r ON r.id = rr.resource_id
+        """)
+        resumo = {}
+        lidas = 0
+        while True:
+            lote = cursor.fetchmany(LOTE_RECONSTRUCAO)
+            if not lote:
+                break
+            for qtd, valor, status, criada, decidida, tipo_id in lote:
+                _acumular(resumo, desde, qtd, valor, status, criada, decidida, tipo_id)
+            lidas += len(lote)
+            if job is not None:
+                job.progresso(lidas, total, "lendo solicitações")
+
+        if desde:
+            cursor.execute(f"DELETE FROM {TABELA} WHERE day >= %s", (desde.isoformat(),))
+        else:
+            cursor.execute(f"DELETE FROM {TABELA}")
+        sql = sql_upsert_soma(cursor.dialect, TABELA, CHAVES, COLUNAS)
+        linhas = [_parametros(chave, valores) for chave, valores in sorted(resumo.items())]
+        for i in range(0, len(linhas), LOTE_RECONSTRUCAO):
+            cursor.executemany(sql, linhas[i:i + LOTE_RECONSTRUCAO])
+        conn.commit()
+        return len(linhas)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _acumular(resumo, desde, qtd, valor, status, criada, decidida, tipo_id):
+    valor = Decimal(str(valor or 0))
+    banda = faixa(valor)
+
+    def linha(quando):
+        dia = _dia(quando)
+        if desde and dia < desde:
+            return None
+        return resumo.setdefault((dia, tipo_id, banda), dict.fromkeys(COLUNAS, 0))
+
+    r = linha(criada)
+    if r is not None:
+        r["requested_count"] += 1
+        r["requested_quantity"] += qtd
+        r["requested_value"] += valor
+
+    if status == "aprovado":
+        r = linha(decidida or criada)
+        if r is not None:
+            r["approved_count"] += 1
+            r["approved_quantity"] += qtd
+            r["approved_value"] += valor
+            if decidida:
+                r["latency_count"] += 1
+                r["latency_seconds"] += _segundos(criada, decidida)
+    elif status == "rejeitado":
+        r = linha(decidida or criada)
+        if r is not None:
+            r["rejected_count"] += 1
+            r["rejected_quantity"] += qtd
+            r["rejected_value"] += valor
+
+
+@jobs.tarefa("reconstruir_resumos", tentativas=1)
+def _tarefa_reconstruir(job):
+    return {"linhas": reconstruir(job.params.get("desde"), job=job)}
+
+
+# =========================
+# CONSULTA (TENDÊNCIAS)
+# =========================
+
+def tendencias(dias=30):
+    """
+    Séries dos últimos `dias` dias, lidas só do resumo:
+    por dia, por tipo de recurso e tempo médio de aprovação por faixa de valor.
+    """
+    inicio = (date.today() - timedelta(days=dias - 1)).isoformat()
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT day, resource_type_id, value_band,
+                   {', '.join(COLUNAS)}
+            FROM {TABELA}
+            WHERE day >= %s
+            ORDER BY day
+        """, (inicio,))
+        linhas = cursor.fetchall()
+
+        cursor.execute("SELECT id, name FROM resource_types")
+        nomes = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+    por_dia, por_tipo, por_faixa = {}, {}, {}
+    total = _vazio()
+    for linha in linhas:
+        dia, tipo_id, banda = _dia(linha[0]), linha[1], linha[2]
+        valores = dict(zip(COLUNAS, linha[3:]))
+        for destino in (
+            por_dia.setdefault(dia, _vazio()),
+            por_tipo.setdefault(nomes.get(tipo_id, f"#{tipo_id}"), _vazio()),
+            por_faixa.setdefault(banda, _vazio()),
+            total,
+        ):
+            _somar_em(destino, valores)
+
+    rotulos = dict(FAIXAS)
+    return {
+        "dias": dias,
+        "inicio": date.fromisoformat(inicio),
+        "total": _fechar(total),
+        "por_dia": [{"dia": d, **_fechar(v)} for d, v in sorted(por_dia.items())],
+        "por_tipo": sorted(({"nome": n, **_fechar(v)} for n, v in por_tipo.items()),
+                           key=lambda l: (-l["requested_value"], l["nome"])),
+        "por_faixa": [{"faixa": rotulos[b], **_fechar(por_faixa[b])}
+                      for b, _ in FAIXAS if b in por_faixa],
+    }
+
+
+def _vazio():
+    return dict.fromkeys(COLUNAS, 0)
+
+
+def _somar_em(destino, valores):
+    for coluna in COLUNAS:
+        valor = valores[coluna] or 0
+        destino[coluna] += Decimal(str(valor)) if coluna.endswith("_value") else int(valor)
+
+
+def _fechar(valores):
+    """Arredonda os valores e calcula a latência média de aprovação (em horas)."""
+    fechado = {c: (Decimal(str(v)).quantize(CENTAVOS) if c.endswith("_value") else v)
+               for c, v in valores.items()}
+    n = valores["latency_count"]
+    fechado["latencia_media_horas"] = (
+        round(valores["latency_seconds"] / n / 3600, 1) if n else None
+    )
+    return fechado
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args == ["reconstruir"]:
+        desde = None
+    elif len(args) == 3 and args[:2] == ["reconstruir", "--desde"]:
+        desde = args[2]
+    else:
+        sys.exit("uso: python resumos.py reconstruir [--desde AAAA-MM-DD]")
+    print(f"{reconstruir(desde)} linha(s) de resumo gravada(s)")
@@ -0,0 +1,327 @@
+# servidor.py
+"""
+Servidor de produção: processos pré-forkados, cada um com um pool de threads.
+
+O processo mestre importa o app uma única vez (preload), prepara o banco,
+abre o socket e faz fork dos workers. Cada worker herda o app já carregado,
+aceita conexões no socket compartilhado e atende até --threads requisições
+ao mesmo tempo, com um pool de conexões SQLite do mesmo tamanho.
+
+Conexões de stream (SSE, `Accept: text/event-stream`) não ocupam esse pool:
+ao começar, o stream devolve a vaga e passa a contar num limite próprio
+(--sse-max por worker; acima dele responde 503). Ao parar o worker, os
+streams abertos são encerrados e o navegador reconecta em outro.
+
+Sinais aceitos pelo processo mestre:
+- SIGHUP: sobe uma nova geração de workers e encerra a antiga com calma
+  (as requisições em andamento terminam antes do worker sair).
+- SIGTERM / SIGINT: encerramento gracioso de todos os workers.
+
+Com --max-requests, cada worker sai depois de atender esse número de
+requisições (mais uma folga aleatória de até 10%, para não reciclarem
+todos juntos) e o mestre sobe outro no lugar.
+
+Uso:
+    python servidor.py --bind 0.0.0.0:8000 --workers 4 --threads 8 --max-requests 5000
+
+Precisa de os.fork (Linux/macOS). No Windows, use o wsgi.py com o waitress.
+"""
+import argparse
+import itertools
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+INTERVALO_MESTRE = 0.5
+SSE_MAX = 64
+
+
+class _Handler(WSGIRequestHandler):
+    # fecha conexões keep-alive ociosas para não prender threads do pool
+    timeout = 5
+    log_acessos = False
+
+    def log_request(self, code="-", size="-"):
+        if self.log_acessos:
+            super().log_request(code, size)
+
+
+def _fechar_depois(start_response):
+    """start_response que pede Connection: close (a conexão de stream não é reaproveitada)."""
+    def iniciar(status, headers, exc_info=None):
+        headers = [(k, v) for k, v in headers if k.lower() != "connection"]
+        headers.append(("Connection", "close"))
+        return start_response(status, headers, exc_info)
+    return iniciar
+
+
+class ServidorWorker(BaseWSGIServer):
+    """BaseWSGIServer do werkzeug atendendo conexões com um pool fixo de threads."""
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, sock, app, threads, max_requests=0, handler=_Handler,
+                 sse_max=SSE_MAX, ao_parar=None):
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, self._contar(app), handler=handler, fd=sock.fileno())
+        self.threads = threads
+        self.max_requests = max_requests
+        self.ao_parar = ao_parar
+        # threads para as requisições comuns mais uma por stream SSE aberto
+        self._pool = ThreadPoolExecutor(max_workers=threads + sse_max, thread_name_prefix="wayne")
+        # só aceita uma conexão nova quando há thread livre: o resto fica
+        # na fila do socket para os outros workers
+        self._livres = threading.BoundedSemaphore(threads)
+        self._streams = threading.BoundedSemaphore(sse_max) if sse_max else None
+        self._vaga = threading.local()
+        self._atendidas = itertools.count(1)
+        self._parando = False
+
+    def _contar(self, app):
+        def contador(environ, start_response):
+            n = next(self._atendidas)
+            if self.max_requests and n == self.max_requests:
+                self.parar()
+            if "text/event-stream" in environ.get("HTTP_ACCEPT", ""):
+                if self._parando or not self._virar_stream():
+                    start_response("503 Service Unavailable", [
+                        ("Content-Type", "text/plain; charset=utf-8"), ("Retry-After", "5"),
+                    ])
+                    return [b"Sem vaga para streams neste worker.\n"]
+                return app(environ, _fechar_depois(start_response))
+            return app(environ, start_response)
+        return contador
+
+    def _virar_stream(self):
+        """Troca a vaga do pool de requisições por uma vaga de stream (uma vez por conexão)."""
+        if self._vaga.stream:
+            return True
+        if self._streams is None or not self._streams.acquire(blocking=False):
+            return False
+        self._vaga.stream = True
+        self._livres.release()
+        return True
+
+    def get_request(self):
+        if not self._livres.acquire(timeout=1):
+            raise OSError("sem threads livres")
+        try:
+            return super().get_request()
+        except BaseException:
+            self._livres.release()
+            raise
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        self._vaga.stream = False
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            if self._vaga.stream:
+                self._streams.release()
+            else:
+                self._livres.release()
+
+    def parar(self):
+        """Para de aceitar conexões (pode ser chamado de qualquer thread)."""
+        if not self._parando:
+            self._parando = True
+            if self.ao_parar is not None:
+                self.ao_parar()
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def drenar(self, timeout):
+        """Espera as requisições em andamento por até `timeout` segundos."""
+        t = threading.Thread(target=self._pool.shutdown, daemon=True)
+        t.start()
+        t.join(timeout)
+        return not t.is_alive()
+
+    def server_close(self):
+        # o socket é compartilhado com os outros workers: não fecha aqui
+        pass
+
+
+def _rodar_worker(sock, app, args):
+    import db
+    import eventos
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    random.seed()
+    db.configurar_pool(args.pool or args.threads)
+
+    limite = args.max_requests
+    if limite:
+        limite += random.randint(0, limite // 10)
+
+    servidor = ServidorWorker(sock, app, args.threads, limite,
+                              sse_max=args.sse_max, ao_parar=eventos.encerrar)
+    signal.signal(signal.SIGTERM, lambda *_: servidor.parar())
+    servidor.serve_forever()
+    if not servidor.drenar(args.graceful_timeout):
+        print(f"[worker {os.getpid()}] requisições ainda abertas após "
+              f"{args.graceful_timeout}s, saindo assim mesmo", file=sys.stderr)
+
+
+class Mestre:
+    def __init__(self, sock, app, args):
+        self.sock = sock
+        self.app = app
+        self.args = args
+        self.workers = {}  # pid -> geração
+        self.geracao = 0
+        self._recarregar = False
+        self._parar = False
+
+    def _iniciar_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                _rodar_worker(self.sock, self.app, self.args)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                codigo = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(codigo)
+        self.workers[pid] = self.geracao
+
+    def _recolher(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            geracao = self.workers.pop(pid, None)
+            codigo = os.waitstatus_to_exitcode(status)
+            if codigo != 0 and geracao == self.geracao and not self._parar:
+                print(f"[mestre] worker {pid} saiu com código {codigo}", file=sys.stderr)
+                # evita laço apertado de fork se o worker morre ao subir
+                time.sleep(1)
+
+    def _sinalizar(self, pids, sinal):
+        for pid in pids:
+            try:
+                os.kill(pid, sinal)
+            except ProcessLookupError:
+                pass
+
+    def _encerrar(self):
+        self._sinalizar(list(self.workers), signal.SIGTERM)
+        prazo = time.monotonic() + self.args.graceful_timeout + 1
+        while self.workers and time.monotonic() < prazo:
+            self._recolher()
+            time.sleep(0.1)
+        self._sinalizar(list(self.workers), signal.SIGKILL)
+        while self.workers:
+            self._recolher()
+            time.sleep(0.05)
+
+    def rodar(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_recarregar", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_parar", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_parar", True))
+
+        while not self._parar:
+            self._recolher()
+
+            if self._recarregar:
+                self._recarregar = False
+                antigos = list(self.workers)
+                self.geracao += 1
+                print(f"[mestre] SIGHUP: subindo geração {self.geracao}", file=sys.stderr)
+                for _ in range(self.args.workers):
+                    self._iniciar_worker()
+                self._sinalizar(antigos, signal.SIGTERM)
+
+            atuais = sum(1 for g in self.workers.values() if g == self.geracao)
+            for _ in range(self.args.workers - atuais):
+                self._iniciar_worker()
+
+            time.sleep(INTERVALO_MESTRE)
+
+        print("[mestre] encerrando workers", file=sys.stderr)
+        self._encerrar()
+
+
+def _abrir_socket(bind, backlog):
+    host, _, porta = bind.rpartition(":")
+    host = host.strip("[]") or "0.0.0.0"
+    familia = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(familia, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, int(porta)))
+    sock.listen(backlog)
+    # não bloqueante: quando vários workers acordam para a mesma conexão,
+    # os que perderem a corrida voltam para o select em vez de travar no accept
+    sock.setblocking(False)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de produção pré-forkado")
+    parser.add_argument("--bind", default=os.getenv("WAYNE_BIND") or "127.0.0.1:8000")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WAYNE_WORKERS") or os.cpu_count() or 2))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WAYNE_THREADS") or 8),
+                        help="threads por worker")
+    parser.add_argument("--pool", type=int, default=int(os.getenv("WAYNE_SQLITE_POOL_MAX") or 0),
+                        help="conexões SQLite por worker (padrão: igual a --threads)")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("WAYNE_MAX_REQUESTS") or 0),
+                        help="recicla o worker após N requisições (0 = nunca)")
+    parser.add_argument("--sse-max", type=int, default=int(os.getenv("WAYNE_SSE_MAX") or SSE_MAX),
+                        help="streams SSE abertos por worker, fora do pool de threads (0 = recusa SSE)")
+    parser.add_argument("--graceful-timeout", type=float, default=30,
+                        help="segundos para terminar as requisições ao encerrar um worker")
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--access-log", action="store_true", help="loga cada requisição no stderr")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("servidor.py precisa de os.fork (Linux/macOS). No Windows use: waitress-serve wsgi:application")
+
+    _Handler.log_acessos = args.access_log
+
+    # preload: o app é importado uma vez aqui e herdado pelos workers
+    from wsgi import application
+    from app import precompilar_templates
+    import db
+    db.preparar_banco()
+    precompilar_templates()
+
+    if args.workers > 1 and not os.getenv("WAYNE_EVENTS_FILE"):
+        print("[mestre] aviso: sem WAYNE_EVENTS_FILE, os eventos ao vivo (SSE) "
+              "não são repassados entre workers", file=sys.stderr)
+    if args.workers > 1 and not os.getenv("WAYNE_IDEMPOTENCY_FILE"):
+        print("[mestre] aviso: sem WAYNE_IDEMPOTENCY_FILE, as respostas guardadas pelas "
+              "chaves de idempotência ficam em cada worker; um reenvio atendido por "
+              "outro worker executa a rota de novo", file=sys.stderr)
+
+    sock = _abrir_socket(args.bind, args.backlog)
+    print(f"[mestre {os.getpid()}] ouvindo em {args.bind} com {args.workers} workers "
+          f"x {args.threads} threads", file=sys.stderr)
+    Mestre(sock, application, args).rodar()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+-- Migrações para o banco MySQL existente (wayne_security).
+-- Rode em ordem; cada bloco indica a funcionalidade que depende dele.
+-- O backend SQLite já cria tudo isso em sql/sqlite_schema.sql.
+
+-- ---------------------------------------------------------------
+-- 001: versão por tabela (ETag da API JSON e invalidação de caches)
+-- ---------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS table_versions (
+    name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO table_versions (name) VALUES
+    ('resources'), ('resource_types'), ('resource_requests'), ('users');
+
+CREATE TRIGGER trg_resources_ai AFTER INSERT ON resources FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resources';
+CREATE TRIGGER trg_resources_au AFTER UPDATE ON resources FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resources';
+CREATE TRIGGER trg_resources_ad AFTER DELETE ON resources FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resources';
+
+CREATE TRIGGER trg_resource_types_ai AFTER INSERT ON resource_types FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resource_types';
+CREATE TRIGGER trg_resource_types_au AFTER UPDATE ON resource_types FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resource_types';
+CREATE TRIGGER trg_resource_types_ad AFTER DELETE ON resource_types FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resource_types';
+
+CREATE TRIGGER trg_resource_requests_ai AFTER INSERT ON resource_requests FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resource_requests';
+CREATE TRIGGER trg_resource_requests_au AFTER UPDATE ON resource_requests FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resource_requests';
+CREATE TRIGGER trg_resource_requests_ad AFTER DELETE ON resource_requests FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'resource_requests';
+
+CREATE TRIGGER trg_users_ai AFTER INSERT ON users FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+CREATE TRIGGER trg_users_au AFTER UPDATE ON users FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+CREATE TRIGGER trg_users_ad AFTER DELETE ON users FOR EACH ROW
+    UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+
+-- ---------------------------------------------------------------
+-- 002: versão por recurso (cache de fragmentos da lista de recursos)
+-- ---------------------------------------------------------------
+ALTER TABLE resources ADD COLUMN version INT NOT NULL DEFAULT 1;
+
+-- ---------------------------------------------------------------
+-- 003: fila de tarefas em segundo plano (jobs.py)
+-- ---------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    type VARCHAR(64) NOT NULL,
+    params TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    progress INT NOT NULL DEFAULT 0,
+    message VARCHAR(255),
+    result TEXT,
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    cancel_requested TINYINT NOT NULL DEFAULT 0,
+    created_by INT NULL,
+    worker VARCHAR(64),
+    created_at DATETIME NOT NULL,
+    run_after DATETIME NOT NULL,
+    started_at DATETIME NULL,
+    heartbeat_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    INDEX idx_jobs_fila (status, run_after),
+    INDEX idx_jobs_created_by (created_by, id),
+    FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
+);
+
+-- ---------------------------------------------------------------
+-- 004: razão de movimentações de estoque e snapshots (estoque.py)
+-- ---------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    resource_id INT NOT NULL,
+    delta INT NOT NULL,
+    quantity_after INT NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    request_id INT NULL,
+    user_id INT NULL,
+    created_at DATETIME NOT NULL,
+    INDEX idx_stock_movements_resource (resource_id, id),
+    INDEX idx_stock_movements_resource_data (resource_id, created_at),
+    FOREIGN KEY (resource_id) REFERENCES resources(id) ON DELETE CASCADE,
+    FOREIGN KEY (request_id) REFERENCES resource_requests(id) ON DELETE SET NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    resource_id INT NOT NULL,
+    taken_at DATETIME NOT NULL,
+    quantity INT NOT NULL,
+    movement_id BIGINT NOT NULL,
+    PRIMARY KEY (resource_id, taken_at),
+    FOREIGN KEY (resource_id) REFERENCES resources(id) ON DELETE CASCADE
+);
+
+-- ---------------------------------------------------------------
+-- 005: resumo diário das solicitações de baixa (resumos.py)
+-- ---------------------------------------------------------------
+ALTER TABLE resource_requests ADD COLUMN decided_at DATETIME NULL;
+
+CREATE TABLE IF NOT EXISTS request_daily_rollups (
+    day DATE NOT NULL,
+    resource_type_id INT NOT NULL,
+    value_band VARCHAR(20) NOT NULL,
+    requested_count INT NOT NULL DEFAULT 0,
+    requested_quantity INT NOT NULL DEFAULT 0,
+    requested_value DECIMAL(16,2) NOT NULL DEFAULT 0,
+    approved_count INT NOT NULL DEFAULT 0,
+    approved_quantity INT NOT NULL DEFAULT 0,
+    approved_value DECIMAL(16,2) NOT NULL DEFAULT 0,
+    rejected_count INT NOT NULL DEFAULT 0,
+    rejected_quantity INT NOT NULL DEFAULT 0,
+    rejected_value DECIMAL(16,2) NOT NULL DEFAULT 0,
+    latency_count INT NOT NULL DEFAULT 0,
+    latency_seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, resource_type_id, value_band)
+);
+
+-- ---------------------------------------------------------------
+-- 006: expiração das reservas pendentes (reservas.py)
+-- ---------------------------------------------------------------
+CREATE INDEX idx_resource_requests_status_created ON resource_requests (status, created_at);
+
+-- ---------------------------------------------------------------
+-- 007: campos estruturados dos logs de auditoria (explorador /logs)
+-- ---------------------------------------------------------------
+ALTER TABLE access_logs
+    ADD COLUMN entity_type VARCHAR(20) NULL,
+    ADD COLUMN entity_id INT NULL,
+    ADD COLUMN quantity INT NULL,
+    ADD COLUMN value DECIMAL(14,2) NULL;
+
+CREATE INDEX idx_access_logs_user ON access_logs (user_id, id);
+CREATE INDEX idx_access_logs_action ON access_logs (action, id);
+CREATE INDEX idx_access_logs_entity ON access_logs (entity_type, entity_id, id);
+-- o período de /logs vira uma faixa de ids por ORDER BY created_at, id LIMIT 1
+CREATE INDEX idx_access_logs_created_at ON access_logs (created_at, id);
+-- Logs anteriores: preencha as colunas a partir de `details` com
+--     python auditoria.py preencher
+
+-- ---------------------------------------------------------------
+-- 008: remove a versão de access_logs (só para quem já rodou o 001 antigo)
+-- Nenhum cache lê essa versão, e os triggers faziam cada registro de
+-- auditoria atualizar a mesma linha de table_versions.
+-- ---------------------------------------------------------------
+DROP TRIGGER IF EXISTS trg_access_logs_ai;
+DROP TRIGGER IF EXISTS trg_access_logs_ad;
+DELETE FROM table_versions WHERE name = 'access_logs';
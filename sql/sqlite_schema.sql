@@ -0,0 +1,191 @@
+-- Esquema do backend SQLite (WAYNE_DB_BACKEND=sqlite).
+-- Criado automaticamente na primeira conexão; mantém as mesmas tabelas
+-- e colunas que o app usa no MySQL.
+
+CREATE TABLE IF NOT EXISTS roles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    username TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    role_id INTEGER NOT NULL REFERENCES roles(id),
+    approved INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS resource_types (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS resources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    type_id INTEGER NOT NULL REFERENCES resource_types(id),
+    location TEXT,
+    status TEXT NOT NULL DEFAULT 'ativo',
+    price NUMERIC NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    image_url TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS resource_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    resource_id INTEGER NOT NULL REFERENCES resources(id) ON DELETE CASCADE,
+    requested_by INTEGER NOT NULL REFERENCES users(id),
+    quantity INTEGER NOT NULL,
+    total_value NUMERIC NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pendente',
+    manager_id INTEGER REFERENCES users(id),
+    admin_id INTEGER REFERENCES users(id),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    decided_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS access_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    action TEXT NOT NULL,
+    details TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    entity_type TEXT,
+    entity_id INTEGER,
+    quantity INTEGER,
+    value NUMERIC
+);
+
+CREATE INDEX IF NOT EXISTS idx_resources_created_at ON resources(created_at);
+CREATE INDEX IF NOT EXISTS idx_resource_requests_status ON resource_requests(status);
+CREATE INDEX IF NOT EXISTS idx_resource_requests_created_at ON resource_requests(created_at);
+CREATE INDEX IF NOT EXISTS idx_resource_requests_status_created ON resource_requests(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_access_logs_created_at ON access_logs(created_at);
+-- filtros do explorador de logs (/logs), todos terminando em id para a paginação
+CREATE INDEX IF NOT EXISTS idx_access_logs_user ON access_logs(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_access_logs_action ON access_logs(action, id);
+CREATE INDEX IF NOT EXISTS idx_access_logs_entity ON access_logs(entity_type, entity_id, id);
+
+INSERT OR IGNORE INTO roles (name) VALUES ('admin'), ('gerente'), ('funcionario');
+INSERT OR IGNORE INTO resource_types (name) VALUES ('Equipamento'), ('Veículo'), ('Dispositivo de segurança');
+
+-- Versão por tabela, incrementada por triggers a cada escrita.
+-- Usada para ETag e invalidação de caches sem precisar varrer as tabelas.
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO table_versions (name) VALUES
+    ('resources'), ('resource_types'), ('resource_requests'), ('users');
+
+CREATE TRIGGER IF NOT EXISTS trg_resources_ai AFTER INSERT ON resources
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resources'; END;
+CREATE TRIGGER IF NOT EXISTS trg_resources_au AFTER UPDATE ON resources
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resources'; END;
+CREATE TRIGGER IF NOT EXISTS trg_resources_ad AFTER DELETE ON resources
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resources'; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resource_types_ai AFTER INSERT ON resource_types
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resource_types'; END;
+CREATE TRIGGER IF NOT EXISTS trg_resource_types_au AFTER UPDATE ON resource_types
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resource_types'; END;
+CREATE TRIGGER IF NOT EXISTS trg_resource_types_ad AFTER DELETE ON resource_types
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resource_types'; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resource_requests_ai AFTER INSERT ON resource_requests
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resource_requests'; END;
+CREATE TRIGGER IF NOT EXISTS trg_resource_requests_au AFTER UPDATE ON resource_requests
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resource_requests'; END;
+CREATE TRIGGER IF NOT EXISTS trg_resource_requests_ad AFTER DELETE ON resource_requests
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'resource_requests'; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_ai AFTER INSERT ON users
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'users'; END;
+CREATE TRIGGER IF NOT EXISTS trg_users_au AFTER UPDATE ON users
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'users'; END;
+CREATE TRIGGER IF NOT EXISTS trg_users_ad AFTER DELETE ON users
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'users'; END;
+
+-- access_logs não tem versão: nenhum cache depende dela, e um trigger ali
+-- faria cada registro de auditoria disputar a mesma linha de table_versions.
+-- (remove o que bancos antigos criaram)
+DROP TRIGGER IF EXISTS trg_access_logs_ai;
+DROP TRIGGER IF EXISTS trg_access_logs_ad;
+DELETE FROM table_versions WHERE name = 'access_logs';
+
+-- Fila de tarefas em segundo plano (jobs.py)
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    params TEXT,
+    status TEXT NOT NULL DEFAULT 'pendente',
+    progress INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_by INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    worker TEXT,
+    created_at TIMESTAMP NOT NULL,
+    run_after TIMESTAMP NOT NULL,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_fila ON jobs(status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_by ON jobs(created_by, id);
+
+-- Razão de movimentações de estoque (estoque.py): uma linha por alteração
+-- de resources.quantity, gravada na mesma transação, e snapshots periódicos
+-- por recurso para consultar o estoque em qualquer data sem reprocessar tudo.
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    resource_id INTEGER NOT NULL REFERENCES resources(id) ON DELETE CASCADE,
+    delta INTEGER NOT NULL,
+    quantity_after INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    request_id INTEGER REFERENCES resource_requests(id) ON DELETE SET NULL,
+    user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_movements_resource ON stock_movements(resource_id, id);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_resource_data ON stock_movements(resource_id, created_at);
+
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    resource_id INTEGER NOT NULL REFERENCES resources(id) ON DELETE CASCADE,
+    taken_at TIMESTAMP NOT NULL,
+    quantity INTEGER NOT NULL,
+    movement_id INTEGER NOT NULL,
+    PRIMARY KEY (resource_id, taken_at)
+);
+
+-- Resumo diário das solicitações de baixa (resumos.py), atualizado na mesma
+-- transação das rotas de solicitar/aprovar/rejeitar. value_band separa as
+-- faixas de valor (a regra de aprovação muda acima de 10.000).
+CREATE TABLE IF NOT EXISTS request_daily_rollups (
+    day DATE NOT NULL,
+    resource_type_id INTEGER NOT NULL,
+    value_band TEXT NOT NULL,
+    requested_count INTEGER NOT NULL DEFAULT 0,
+    requested_quantity INTEGER NOT NULL DEFAULT 0,
+    requested_value NUMERIC NOT NULL DEFAULT 0,
+    approved_count INTEGER NOT NULL DEFAULT 0,
+    approved_quantity INTEGER NOT NULL DEFAULT 0,
+    approved_value NUMERIC NOT NULL DEFAULT 0,
+    rejected_count INTEGER NOT NULL DEFAULT 0,
+    rejected_quantity INTEGER NOT NULL DEFAULT 0,
+    rejected_value NUMERIC NOT NULL DEFAULT 0,
+    latency_count INTEGER NOT NULL DEFAULT 0,
+    latency_seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, resource_type_id, value_band)
+);
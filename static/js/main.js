@@ -1,2 +1,147 @@
 // static/js/main.js
 console.log("Sistema de Seguran?a Wayne carregado.");
+
+// ===== Atualizações ao vivo (SSE) =====
+// O servidor envia os eventos em /eventos; aqui só atualizamos o DOM,
+// sem recarregar a página.
+(function () {
+    const body = document.body;
+    const url = body.dataset.eventos;
+    if (!url || !window.EventSource) {
+        return;
+    }
+
+    const role = body.dataset.role;
+    const MAX_LOGS = 10;
+    const fonte = new EventSource(url);
+
+    function capitalizar(texto) {
+        texto = String(texto || "");
+        return texto.charAt(0).toUpperCase() + texto.slice(1).toLowerCase();
+    }
+
+    fonte.addEventListener("pendencias", function (e) {
+        const dados = JSON.parse(e.data);
+        const badge = document.getElementById("badge-pendencias");
+        if (!badge || !(role in dados)) {
+            return;
+        }
+        badge.textContent = dados[role];
+        badge.hidden = dados[role] <= 0;
+    });
+
+    fonte.addEventListener("status", function (e) {
+        const dados = JSON.parse(e.data);
+        const total = document.getElementById("kpi-total-recursos");
+        const qtdStatus = document.getElementById("kpi-status");
+        const lista = document.getElementById("lista-status");
+        const nomes = Object.keys(dados.por_status);
+
+        if (total) {
+            total.textContent = dados.total;
+        }
+        if (qtdStatus) {
+            qtdStatus.textContent = nomes.length;
+        }
+        if (!lista) {
+            return;
+        }
+
+        lista.replaceChildren();
+        nomes.forEach(function (status) {
+            const li = document.createElement("li");
+            li.className = "status-item";
+
+            const chip = document.createElement("span");
+            chip.className = "chip-status";
+            const ponto = document.createElement("span");
+            ponto.className = "chip-dot";
+            chip.append(ponto, " " + capitalizar(status));
+
+            const qtd = document.createElement("span");
+            qtd.textContent = dados.por_status[status];
+
+            li.append(chip, qtd);
+            lista.append(li);
+        });
+    });
+
+    fonte.addEventListener("log", function (e) {
+        const dados = JSON.parse(e.data);
+        const timeline = document.getElementById("timeline-logs");
+        if (!timeline) {
+            return;
+        }
+
+        timeline.querySelectorAll("[data-vazio]").forEach(function (li) {
+            li.remove();
+        });
+
+        const li = document.createElement("li");
+        li.className = "timeline-item";
+
+        const principal = document.createElement("div");
+        principal.className = "timeline-main";
+        const autor = document.createElement("strong");
+        autor.textContent = dados.user_name || "";
+        principal.append(autor, " — " + dados.action);
+        li.append(principal);
+
+        if (dados.details) {
+            const detalhes = document.createElement("div");
+            detalhes.className = "timeline-main";
+            detalhes.style.fontSize = "12px";
+            detalhes.textContent = dados.details;
+            li.append(detalhes);
+        }
+
+        const meta = document.createElement("div");
+        meta.className = "timeline-meta";
+        meta.textContent = dados.created_at;
+        li.append(meta);
+
+        timeline.prepend(li);
+        while (timeline.children.length > MAX_LOGS) {
+            timeline.lastElementChild.remove();
+        }
+
+        const kpi = document.getElementById("kpi-atividades");
+        if (kpi) {
+            kpi.textContent = timeline.children.length;
+        }
+    });
+})();
+
+// ===== Andamento das tarefas em segundo plano =====
+// Linhas com data-job consultam /api/jobs/<id> até a tarefa terminar;
+// ao terminar, a página recarrega para mostrar o botão de download.
+(function () {
+    const linhas = document.querySelectorAll("tr[data-job]");
+    if (!linhas.length) {
+        return;
+    }
+    const INTERVALO = 2000;
+
+    function acompanhar(linha) {
+        fetch(linha.dataset.job, { headers: { "Accept": "application/json" } })
+            .then(function (resp) { return resp.ok ? resp.json() : null; })
+            .then(function (job) {
+                if (!job) {
+                    return;
+                }
+                if (job.status !== "pendente" && job.status !== "executando") {
+                    window.location.reload();
+                    return;
+                }
+                linha.querySelector("[data-job-status]").textContent = job.status;
+                linha.querySelector("[data-job-progresso]").textContent =
+                    job.progress + "%" + (job.message ? " — " + job.message : "");
+                setTimeout(function () { acompanhar(linha); }, INTERVALO);
+            })
+            .catch(function () {
+                setTimeout(function () { acompanhar(linha); }, INTERVALO * 3);
+            });
+    }
+
+    linhas.forEach(acompanhar);
+})();
@@ -0,0 +1,11 @@
+# wsgi.py
+"""
+Ponto de entrada WSGI para produção.
+
+    python servidor.py                  # servidor pré-forkado do projeto
+    gunicorn wsgi:application           # ou qualquer servidor WSGI
+    waitress-serve wsgi:application     # (Windows)
+"""
+from app import create_app
+
+application = app = create_app()